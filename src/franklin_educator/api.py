@@ -0,0 +1,354 @@
+import os
+import re
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional
+
+from franklin import config as cfg
+from franklin.logger import logger
+
+from . import backend
+from . import trace
+
+# Connections kept open to GitLab, and pages fetched at the same time
+POOL_SIZE = 8
+
+# Lifetime in days of tokens made for API calls that need one
+TOKEN_DAYS = 1
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class GitLabClient():
+    """
+    Client for the GitLab REST API.
+
+    Connections are kept alive and shared by all threads, and the pages
+    of paginated listings are fetched concurrently.
+    """
+
+    def __init__(self, api_url: str, token: str=None, pool_size: int=POOL_SIZE) -> None:
+        """
+        Parameters
+        ----------
+        api_url :
+            Base url of the API, e.g. https://gitlab.au.dk/api/v4
+        token :
+            Access token sent with every request.
+        pool_size :
+            Connections kept open, and pages fetched at the same time.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.api_url = api_url.rstrip('/')
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if token:
+            self.session.headers['PRIVATE-TOKEN'] = token
+
+    def url(self, path: str) -> str:
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.api_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, **kwargs: Any) -> 'requests.Response':
+        """
+        Sends a request.
+
+        Parameters
+        ----------
+        method :
+            HTTP method.
+        path :
+            Path below the API url, or a full url.
+        **kwargs :
+            Passed on to requests.
+
+        Returns
+        -------
+        :
+            The response. Errors are not raised.
+        """
+        kwargs.setdefault('timeout', 10)
+        with trace.phase(f"GitLab API {method} {path}"):
+            return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path: str, **params: Any) -> Any:
+        """
+        Gets a resource.
+
+        Parameters
+        ----------
+        path :
+            Path below the API url.
+        **params :
+            Query parameters.
+
+        Returns
+        -------
+        :
+            Decoded JSON response.
+        """
+        response = self.request('GET', path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def post(self, path: str, data: Dict[str, Any]) -> Any:
+        """
+        Creates a resource.
+
+        Parameters
+        ----------
+        path :
+            Path below the API url.
+        data :
+            Attributes sent as JSON.
+
+        Returns
+        -------
+        :
+            Decoded JSON response.
+        """
+        response = self.request('POST', path, json=data)
+        response.raise_for_status()
+        return response.json()
+
+    def paginate(self, path: str, per_page: int=100, pages: List[Dict[str, Any]]=None, 
+                 **params: Any) -> List[Any]:
+        """
+        Gets all pages of a listing.
+
+        The first page tells how many pages there are, and the rest are
+        fetched concurrently. GitLab leaves out the page count for very
+        large listings, which are then read one page at a time.
+
+        Parameters
+        ----------
+        path :
+            Path below the API url.
+        per_page :
+            Items per page (at most 100).
+        pages :
+            If given, a dictionary is added for each page with its url, 
+            its validators (etag and last_modified) and the total number 
+            of items (total), for revalidating the listing later.
+        **params :
+            Query parameters.
+
+        Returns
+        -------
+        :
+            Items from all pages, in order.
+        """
+        def record(response):
+            if pages is not None:
+                pages.append(dict(url=response.url, etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get('Last-Modified'),
+                                  total=response.headers.get('X-Total')))
+            return response.json()
+
+        params['per_page'] = per_page
+        response = self.request('GET', path, params=dict(params, page=1))
+        response.raise_for_status()
+        items = record(response)
+        total_pages = response.headers.get('X-Total-Pages')
+        if total_pages:
+            def page(n):
+                response = self.request('GET', path, params=dict(params, page=n))
+                response.raise_for_status()
+                return response
+            with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+                for response in pool.map(page, range(2, int(total_pages) + 1)):
+                    items.extend(record(response))
+        else:
+            next_page = response.headers.get('X-Next-Page')
+            while next_page:
+                response = self.request('GET', path, params=dict(params, page=next_page))
+                response.raise_for_status()
+                items.extend(record(response))
+                next_page = response.headers.get('X-Next-Page')
+        return items
+
+
+def configured_token() -> Optional[str]:
+    """
+    Access token given by the user, if any.
+
+    Returns
+    -------
+    :
+        The GITLAB_TOKEN environment variable or franklin's configured token.
+    """
+    return os.environ.get('GITLAB_TOKEN') or getattr(cfg, 'gitlab_token', None)
+
+
+def client() -> GitLabClient:
+    """
+    API client shared by everything in franklin_educator.
+
+    Returns
+    -------
+    :
+        The client, made on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.api_url != cfg.gitlab_api_url.rstrip('/'):
+            _client = GitLabClient(cfg.gitlab_api_url, configured_token())
+        return _client
+
+
+def ssh_token(name: str='franklin', scopes: str='api', days: int=TOKEN_DAYS) -> str:
+    """
+    Makes a short-lived personal access token over ssh.
+
+    This uses the ssh key already set up for git, so the user needs no
+    separate token.
+
+    Parameters
+    ----------
+    name :
+        Name of the token in GitLab.
+    scopes :
+        Comma separated token scopes.
+    days :
+        Days before the token expires.
+
+    Returns
+    -------
+    :
+        The token.
+    """
+    from . import ssh
+    result = backend.run(['ssh', *ssh.ssh_options(), f'git@{cfg.gitlab_domain}',
+                          'personal_access_token', name, scopes, str(days)])
+    m = re.search(r'Token:\s+(\S+)', result.stdout.decode())
+    if m is None:
+        raise RuntimeError(f"Could not get an access token from {cfg.gitlab_domain}")
+    return m.group(1)
+
+
+def write_client() -> GitLabClient:
+    """
+    API client allowed to create projects.
+
+    Returns
+    -------
+    :
+        The shared client, given a token made over ssh if the user has
+        not configured one.
+    """
+    shared = client()
+    if 'PRIVATE-TOKEN' not in shared.session.headers:
+        logger.debug("Getting an access token over ssh")
+        token = ssh_token()
+        with _client_lock:
+            shared.session.headers['PRIVATE-TOKEN'] = token
+    return shared
+
+
+def registry_listing(pages: List[Dict[str, Any]]=None) -> Dict[Tuple[str, str], str]:
+    """
+    Docker images for the exercises in the GitLab group.
+
+    Parameters
+    ----------
+    pages :
+        If given, filled with the pages of the listing (see 
+        GitLabClient.paginate).
+
+    Returns
+    -------
+    :
+        Mapping of (course, exercise) to image url.
+    """
+    repositories = client().paginate(f'groups/{quote(cfg.gitlab_group, safe="")}/registry/repositories',
+                                     pages=pages)
+    listing = {}
+    for repository in repositories:
+        parts = repository['path'].split('/')
+        if len(parts) != 3:
+            # images that do not belong to an exercise
+            continue
+        _, course, exercise = parts
+        listing[(course, exercise)] = repository['location']
+    return listing
+
+
+def course_names(pages: List[Dict[str, Any]]=None) -> Dict[str, str]:
+    """
+    Courses in the GitLab group.
+
+    Parameters
+    ----------
+    pages :
+        If given, filled with the pages of the listing (see 
+        GitLabClient.paginate).
+
+    Returns
+    -------
+    :
+        Mapping of course name (the subgroup path) to full course name.
+    """
+    subgroups = client().paginate(f'groups/{quote(cfg.gitlab_group, safe="")}/subgroups', pages=pages)
+    return {group['path']: group['name'] for group in subgroups}
+
+
+def projects(since: str=None) -> List[Dict[str, Any]]:
+    """
+    Exercise projects in the GitLab group.
+
+    Parameters
+    ----------
+    since :
+        Only projects with activity after this time (ISO 8601).
+
+    Returns
+    -------
+    :
+        List of projects with course, name (the repository name), title
+        (the project description) and last_activity (ISO 8601).
+    """
+    params = dict(include_subgroups='true', simple='true', order_by='last_activity_at')
+    if since:
+        params['last_activity_after'] = since
+    result = []
+    for project in client().paginate(f'groups/{quote(cfg.gitlab_group, safe="")}/projects', **params):
+        parts = project['path_with_namespace'].split('/')
+        if len(parts) != 3:
+            continue
+        _, course, name = parts
+        result.append(dict(course=course, name=name, title=project.get('description') or None,
+                           last_activity=project.get('last_activity_at')))
+    return result
+
+
+def create_project(course: str, repo_name: str, description: str=None) -> Dict[str, Any]:
+    """
+    Creates an empty exercise project in a course group.
+
+    Parameters
+    ----------
+    course :
+        Course name.
+    repo_name :
+        Name of the new repository.
+    description :
+        Project description (the title of the exercise).
+
+    Returns
+    -------
+    :
+        The new project as returned by GitLab.
+    """
+    gitlab = write_client()
+    group = gitlab.get(f'groups/{quote(f"{cfg.gitlab_group}/{course}", safe="")}')
+    data = dict(name=repo_name, path=repo_name, namespace_id=group['id'])
+    if description:
+        data['description'] = description
+    return gitlab.post('projects', data)
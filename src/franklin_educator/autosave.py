@@ -0,0 +1,373 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, Tuple, Optional, Iterator
+
+from franklin.logger import logger
+
+from . import network
+from . import notebooks
+from .backend import GitBackend
+
+# With exercise edit --autosave, changes to tracked files are recorded as
+# checkpoint commits while Jupyter runs. The checkpoints are kept on a
+# private ref (refs/franklin/autosave/<branch>), so the branch itself is
+# left alone, and the index is kept staged. git up then only has to stage
+# what changed since the last checkpoint and make a single commit, which
+# replaces (squashes) the checkpoints. With --autosave-push, checkpoints are
+# also pushed to the branch franklin-autosave/<branch>, so the final push
+# only sends what changed since the last checkpoint.
+
+# Seconds without changes before a checkpoint is made
+DEBOUNCE = 5.0
+
+# Seconds at most between a change and its checkpoint while files keep changing
+MAX_DELAY = 60.0
+
+# Seconds between scans when the file system cannot be watched
+POLL_INTERVAL = 2.0
+
+# Directories and files whose changes never need a checkpoint
+IGNORED = {'.git', '.ipynb_checkpoints', '__pycache__', 'franklin.log'}
+
+# inotify event masks (see inotify(7))
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher():
+    """
+    Watches a directory tree for changes with Linux inotify.
+    """
+
+    def __init__(self, root: str) -> None:
+        """
+        Parameters
+        ----------
+        root :
+            Directory to watch, including subdirectories.
+        """
+        import ctypes
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._dirs = {}
+        for directory, subdirs, _ in os.walk(root):
+            subdirs[:] = [d for d in subdirs if d not in IGNORED]
+            self._watch(directory)
+
+    def _watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+        else:
+            logger.debug(f"Cannot watch {directory}")
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits for changes.
+
+        Parameters
+        ----------
+        timeout :
+            Seconds to wait at most.
+
+        Returns
+        -------
+        :
+            True if a file outside the ignored directories changed.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            raise
+        changed = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                changed = True
+                continue
+            name = os.fsdecode(name)
+            if name in IGNORED or wd not in self._dirs:
+                continue
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                for directory, subdirs, _ in os.walk(os.path.join(self._dirs[wd], name)):
+                    subdirs[:] = [d for d in subdirs if d not in IGNORED]
+                    self._watch(directory)
+            changed = True
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher():
+    """
+    Watches a directory tree for changes by comparing file times and sizes.
+    """
+
+    def __init__(self, root: str, interval: float=POLL_INTERVAL) -> None:
+        """
+        Parameters
+        ----------
+        root :
+            Directory to watch, including subdirectories.
+        interval :
+            Seconds between scans.
+        """
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for directory, subdirs, files in os.walk(self.root):
+            subdirs[:] = [d for d in subdirs if d not in IGNORED]
+            for name in files:
+                if name in IGNORED:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Waits for changes (see InotifyWatcher.wait).
+        """
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = snapshot != self._snapshot
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def watcher(root: str):
+    """
+    Watcher for a directory tree: inotify on Linux, otherwise polling.
+
+    Parameters
+    ----------
+    root :
+        Directory to watch.
+
+    Returns
+    -------
+    :
+        InotifyWatcher or PollingWatcher.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            logger.debug(f"inotify is not available, polling instead: {e!r}")
+    return PollingWatcher(root)
+
+
+def _branch(repo: GitBackend) -> str:
+    return repo.git('symbolic-ref', '--short', 'HEAD').strip()
+
+
+def checkpoint_ref(branch: str) -> str:
+    """
+    Ref holding the checkpoints of a branch.
+    """
+    return f'refs/franklin/autosave/{branch}'
+
+
+def checkpoint(repo_local_path: str) -> Optional[str]:
+    """
+    Records the tracked files as a checkpoint commit.
+
+    Changes are staged the way git up stages them (including stripping
+    notebooks), and the commit is made on the checkpoint ref on top of
+    the previous checkpoint or HEAD.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        The new commit, or None if nothing changed since the last checkpoint.
+    """
+    repo = GitBackend(repo_local_path)
+    ref = checkpoint_ref(_branch(repo))
+    repo.git('add', '-u')
+    notebooks.clean_staged(repo_local_path)
+    tree = repo.git('write-tree').strip()
+    parent = repo.git('rev-parse', '--verify', '-q', ref, check=False).strip() or 'HEAD'
+    if repo.git('rev-parse', f'{parent}^{{tree}}').strip() == tree:
+        return None
+    commit = repo.git('commit-tree', tree, '-p', parent, '-m',
+                      f"Checkpoint {time.strftime('%Y-%m-%d %H:%M:%S')}").strip()
+    repo.git('update-ref', ref, commit)
+    logger.debug(f"Checkpoint {commit} in {repo_local_path}")
+    return commit
+
+
+def push(repo_local_path: str) -> None:
+    """
+    Pushes the checkpoints to the branch franklin-autosave/<branch>.
+
+    The push asks GitLab not to run CI, so checkpoints do not start 
+    image builds.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    """
+    repo = GitBackend(repo_local_path)
+    branch = _branch(repo)
+    network.call(repo.git, 'push', '--quiet', '--force', '-o', 'ci.skip', 'origin',
+                 f'{checkpoint_ref(branch)}:refs/heads/franklin-autosave/{branch}')
+
+
+def finish(repo_local_path: str, remote: bool=True) -> None:
+    """
+    Drops the checkpoints once their changes are committed.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    remote :
+        Also delete pushed checkpoints on GitLab.
+    """
+    repo = GitBackend(repo_local_path)
+    # a single call in the common case where there are no checkpoints
+    refs = list(repo.records('for-each-ref', '--format=%(refname)%00', 'refs/franklin/autosave/',
+                             'refs/remotes/origin/franklin-autosave/'))
+    refs = [ref.strip() for ref in refs if ref.strip()]
+    if not refs:
+        return
+    branch = _branch(repo)
+    if checkpoint_ref(branch) in refs:
+        repo.git('update-ref', '-d', checkpoint_ref(branch))
+    if remote and f'refs/remotes/origin/franklin-autosave/{branch}' in refs:
+        try:
+            network.call(repo.git, 'push', '--quiet', '-o', 'ci.skip', 'origin', 
+                         '--delete', f'franklin-autosave/{branch}')
+        except subprocess.CalledProcessError as e:
+            logger.debug(f"Could not delete pushed checkpoints: {e.output.decode(errors='replace')}")
+
+
+class Autosave():
+    """
+    Makes checkpoint commits in a background thread as files change.
+    """
+
+    def __init__(self, repo_local_path: str, push: bool=False,
+                 debounce: float=DEBOUNCE, max_delay: float=MAX_DELAY) -> None:
+        """
+        Parameters
+        ----------
+        repo_local_path :
+            Path to the local repository.
+        push :
+            Push each checkpoint in the background.
+        debounce :
+            Seconds without changes before a checkpoint is made.
+        max_delay :
+            Seconds at most between a change and its checkpoint.
+        """
+        self.repo_local_path = str(repo_local_path)
+        self.push = push
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.checkpoints = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _checkpoint(self) -> None:
+        try:
+            if checkpoint(self.repo_local_path) is None:
+                return
+            self.checkpoints += 1
+            if self.push:
+                push(self.repo_local_path)
+        except subprocess.CalledProcessError as e:
+            logger.debug(f"Checkpoint failed: {e.output.decode(errors='replace')}")
+
+    def _run(self) -> None:
+        files = watcher(self.repo_local_path)
+        first_change = last_change = None
+        try:
+            while not self._stop.is_set():
+                if files.wait(timeout=0.5):
+                    last_change = time.monotonic()
+                    first_change = first_change or last_change
+                if first_change is None:
+                    continue
+                now = time.monotonic()
+                if now - last_change >= self.debounce or now - first_change >= self.max_delay:
+                    first_change = last_change = None
+                    self._checkpoint()
+        finally:
+            files.close()
+
+
+@contextmanager
+def watching(repo_local_path: str, push: bool=False) -> Iterator[Autosave]:
+    """
+    Makes checkpoint commits while the block runs.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    push :
+        Push each checkpoint in the background.
+
+    Yields
+    ------
+    :
+        The running Autosave.
+    """
+    autosave = Autosave(repo_local_path, push=push)
+    autosave.start()
+    try:
+        yield autosave
+    finally:
+        autosave.stop()
+        logger.debug(f"Made {autosave.checkpoints} checkpoints in {repo_local_path}")
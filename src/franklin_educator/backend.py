@@ -0,0 +1,590 @@
+import os
+import re
+import tempfile
+import threading
+import subprocess
+from subprocess import PIPE, DEVNULL
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Tuple, List, Dict, Optional, Any, Iterator
+
+from franklin.logger import logger
+
+from . import trace
+
+# Number of external processes started through this module. Shared by all
+# threads so bulk operations report a single total.
+_spawn_count = 0
+_spawn_lock = threading.Lock()
+
+# Environment variables added for every spawned process (see
+# ssh.enable_multiplexing)
+extra_env = {}
+
+
+def spawned() -> int:
+    """
+    Number of processes spawned through the backend so far.
+
+    Returns
+    -------
+    :
+        Process count.
+    """
+    return _spawn_count
+
+
+def _count_spawn() -> None:
+    global _spawn_count
+    with _spawn_lock:
+        _spawn_count += 1
+
+
+@contextmanager
+def count_processes(label: str):
+    """
+    Logs the number of processes spawned while the context is active.
+
+    Parameters
+    ----------
+    label :
+        Name of the command reported in the log.
+    """
+    start = spawned()
+    try:
+        yield
+    finally:
+        logger.debug(f"{label}: spawned {spawned() - start} processes")
+
+
+def spawn(cmd: List[str], **kwargs) -> subprocess.Popen:
+    """
+    Starts an external process.
+
+    Parameters
+    ----------
+    cmd :
+        Command as a list of arguments.
+    **kwargs :
+        Passed on to subprocess.Popen.
+
+    Returns
+    -------
+    :
+        Process handle.
+    """
+    logger.debug(' '.join(map(str, cmd)))
+    if extra_env:
+        kwargs['env'] = {**(kwargs.get('env') or os.environ), **extra_env}
+    _count_spawn()
+    proc = subprocess.Popen([str(x) for x in cmd], **kwargs)
+    trace.started(proc)
+    return proc
+
+
+def run(cmd: List[str], check: bool=True, input: bytes=None,
+        env: Dict[str, str]=None, cwd: str=None) -> subprocess.CompletedProcess:
+    """
+    Runs an external command to completion and captures its output.
+
+    Parameters
+    ----------
+    cmd :
+        Command as a list of arguments.
+    check :
+        Raise CalledProcessError on non-zero exit status.
+    input :
+        Bytes written to the standard input of the process.
+    env :
+        Environment for the process.
+    cwd :
+        Working directory for the process.
+
+    Returns
+    -------
+    :
+        Completed process with stdout and stderr as bytes.
+    """
+    # stderr goes to a file rather than a pipe: a shared ssh connection
+    # left running in the background may hold on to the stderr of the
+    # process that started it, so the pipe would not close.
+    with tempfile.TemporaryFile() as stderr_file:
+        proc = spawn(cmd, stdin=PIPE if input is not None else DEVNULL,
+                     stdout=PIPE, stderr=stderr_file, env=env, cwd=cwd)
+        stdout, _ = proc.communicate(input)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    trace.finished(proc, len(stdout) + len(stderr))
+    result = subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
+    if check and proc.returncode:
+        # stdout and stderr are joined so e.output shows what went wrong
+        raise subprocess.CalledProcessError(proc.returncode, proc.args,
+                                            output=stdout + stderr, stderr=stderr)
+    return result
+
+
+def spawn_detached(cmd: List[str], cwd: str=None) -> subprocess.Popen:
+    """
+    Starts a process that keeps running after franklin exits.
+
+    Parameters
+    ----------
+    cmd :
+        Command as a list of arguments.
+    cwd :
+        Working directory for the process.
+
+    Returns
+    -------
+    :
+        Process handle.
+    """
+    kwargs = dict(stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL, cwd=cwd)
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    return spawn(cmd, **kwargs)
+
+
+def run_interactive(cmd: List[str], cwd: str=None) -> int:
+    """
+    Runs an external command attached to the terminal.
+
+    Parameters
+    ----------
+    cmd :
+        Command as a list of arguments.
+    cwd :
+        Working directory for the process.
+
+    Returns
+    -------
+    :
+        Exit status.
+    """
+    proc = spawn(cmd, cwd=cwd)
+    proc.wait()
+    trace.finished(proc)
+    return proc.returncode
+
+
+class GitConfigError(Exception):
+    """Raised when a config file cannot be handled in-process."""
+    pass
+
+
+_section_re = re.compile(r'^\s*\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]\s*(?:[#;].*)?$')
+_key_re = re.compile(r'^\s*([A-Za-z][A-Za-z0-9-]*)\s*(?:=(.*))?$')
+_escapes = {'n': '\n', 't': '\t', 'b': '\b'}
+
+
+def _parse_value(raw: str) -> str:
+    out, pending, quoted = [], '', False
+    i = 0
+    while i < len(raw):
+        c = raw[i]
+        if c == '"':
+            quoted = not quoted
+        elif c == '\\':
+            i += 1
+            if i == len(raw):
+                raise GitConfigError('Line continuation')
+            out.append(pending + _escapes.get(raw[i], raw[i]))
+            pending = ''
+        elif c in '#;' and not quoted:
+            break
+        elif c.isspace() and not quoted:
+            # whitespace outside quotes only counts when followed by more value
+            if out:
+                pending += c
+        else:
+            out.append(pending + c)
+            pending = ''
+        i += 1
+    return ''.join(out)
+
+
+def _format_value(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+    escaped = escaped.replace('\n', '\\n').replace('\t', '\\t')
+    if value != value.strip() or '#' in value or ';' in value:
+        return f'"{escaped}"'
+    return escaped
+
+
+def _split_key(key: str) -> Tuple[str, Optional[str], str]:
+    section, _, rest = key.partition('.')
+    subsection, _, name = rest.rpartition('.')
+    if not name:
+        raise GitConfigError(f"Invalid config key: {key}")
+    return section.lower(), subsection or None, name.lower()
+
+
+class GitConfig():
+    """
+    Reads and writes a git config file without starting git.
+
+    Files using constructs the parser does not handle (line continuations,
+    keys on header lines) raise GitConfigError, and callers fall back to
+    ``git config``. So do reads from files with include or includeIf
+    sections, as the value may come from an included file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Parameters
+        ----------
+        path :
+            Path to the config file (usually .git/config).
+        """
+        self.path = Path(path)
+
+    def _entries(self, lines: List[str]) -> List[Tuple[Tuple[str, Optional[str]], Optional[str], int]]:
+        # one tuple of ((section, subsection), key name, line number) per
+        # header and key line
+        entries = []
+        section = None
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped or stripped[0] in '#;':
+                continue
+            if stripped.startswith('['):
+                m = _section_re.match(line)
+                if m is None:
+                    raise GitConfigError(f"Cannot parse {self.path}:{i+1}")
+                name, sub = m.group(1), m.group(2)
+                if sub is None and '.' in name:
+                    # legacy [section.subsection] syntax
+                    name, sub = name.split('.', 1)
+                    sub = sub.lower()
+                elif sub is not None:
+                    sub = re.sub(r'\\(.)', r'\1', sub)
+                section = (name.lower(), sub)
+                entries.append((section, None, i))
+                continue
+            m = _key_re.match(line)
+            if m is None or section is None:
+                raise GitConfigError(f"Cannot parse {self.path}:{i+1}")
+            entries.append((section, m.group(1).lower(), i))
+        return entries
+
+    def _read_lines(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        return lines
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Value of a config key.
+
+        Parameters
+        ----------
+        key :
+            Key in git's dotted notation, e.g. 'merge.tool'.
+
+        Returns
+        -------
+        :
+            The last value set for the key or None if it is not set.
+        """
+        section, sub, name = _split_key(key)
+        lines = self._read_lines()
+        value = None
+        for sec, k, i in self._entries(lines):
+            if sec[0] in ('include', 'includeif'):
+                raise GitConfigError(f"{self.path} includes other files")
+            if sec == (section, sub) and k == name:
+                m = _key_re.match(lines[i])
+                value = 'true' if m.group(2) is None else _parse_value(m.group(2))
+        return value
+
+    def update(self, settings: Dict[str, str]) -> int:
+        """
+        Sets config keys, leaving keys that already have the value alone.
+
+        Parameters
+        ----------
+        settings :
+            Mapping of dotted keys to values.
+
+        Returns
+        -------
+        :
+            Number of keys written.
+        """
+        lines = self._read_lines()
+        changed = 0
+        for key, value in settings.items():
+            section, sub, name = _split_key(key)
+            entries = self._entries(lines)
+            last_key = None
+            last_in_section = None
+            for sec, k, i in entries:
+                if sec == (section, sub):
+                    last_in_section = i
+                    if k == name:
+                        last_key = i
+            new_line = f'\t{name} = {_format_value(value)}\n'
+            if last_key is not None:
+                m = _key_re.match(lines[last_key])
+                if m.group(2) is not None and _parse_value(m.group(2)) == value:
+                    continue
+                lines[last_key] = new_line
+            elif last_in_section is not None:
+                lines.insert(last_in_section + 1, new_line)
+            else:
+                header = f'[{section}]\n' if sub is None else \
+                    '[{} "{}"]\n'.format(section, sub.replace('\\', '\\\\').replace('"', '\\"'))
+                lines.extend([header, new_line])
+            changed += 1
+        if changed:
+            self._write(lines)
+        return changed
+
+    def _write(self, lines: List[str]) -> None:
+        # same locking protocol as git itself
+        lock = str(self.path) + '.lock'
+        try:
+            fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            raise GitConfigError(f"{lock} exists")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(lock, self.path)
+        except BaseException:
+            if os.path.exists(lock):
+                os.remove(lock)
+            raise
+
+
+class CatFile():
+    """
+    Long-lived ``git cat-file --batch`` session for reading objects.
+    """
+
+    def __init__(self, repo_local_path: str) -> None:
+        """
+        Parameters
+        ----------
+        repo_local_path :
+            Path to the local repository.
+        """
+        self._proc = spawn(['git', '-C', repo_local_path, 'cat-file', '--batch'],
+                           stdin=PIPE, stdout=PIPE, stderr=DEVNULL)
+        self._lock = threading.Lock()
+        self._bytes_read = 0
+
+    def read(self, rev: str) -> Optional[bytes]:
+        """
+        Reads the contents of an object.
+
+        Parameters
+        ----------
+        rev :
+            Object name, e.g. 'HEAD:exercise.ipynb' or a blob hash.
+
+        Returns
+        -------
+        :
+            Object contents or None if the object does not exist.
+        """
+        with self._lock:
+            self._proc.stdin.write(rev.encode() + b'\n')
+            self._proc.stdin.flush()
+            header = self._proc.stdout.readline()
+            if not header or header.rstrip().endswith(b' missing'):
+                return None
+            size = int(header.split()[2])
+            data = self._proc.stdout.read(size)
+            self._bytes_read += len(header) + size + 1
+            self._proc.stdout.read(1) # trailing newline
+            return data
+
+    def close(self) -> None:
+        """
+        Ends the session.
+        """
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc.stdout.close()
+            trace.finished(self._proc, self._bytes_read)
+
+
+class GitBackend():
+    """
+    Git access for a single local repository.
+
+    All git processes for the repository are started through this class,
+    config is read and written in-process, and object reads share a
+    single ``git cat-file --batch`` process.
+    """
+
+    def __init__(self, repo_local_path: str) -> None:
+        """
+        Parameters
+        ----------
+        repo_local_path :
+            Path to the local repository.
+        """
+        self.repo_local_path = str(repo_local_path)
+        self._cat_file = None
+
+    def __enter__(self) -> 'GitBackend':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def git_dir(self) -> str:
+        return os.path.join(self.repo_local_path, '.git')
+
+    def git(self, *args: str, check: bool=True, input: bytes=None,
+            env: Dict[str, str]=None) -> str:
+        """
+        Runs a git command in the repository.
+
+        Parameters
+        ----------
+        *args :
+            Arguments to git.
+        check :
+            Raise CalledProcessError on non-zero exit status.
+        input :
+            Bytes written to the standard input of git.
+        env :
+            Environment for git.
+
+        Returns
+        -------
+        :
+            Standard output of the command.
+        """
+        result = run(['git', '-C', self.repo_local_path, *args],
+                     check=check, input=input, env=env)
+        return result.stdout.decode()
+
+    def records(self, *args: str, chunk_size: int=1 << 16) -> Iterator[str]:
+        """
+        Runs a git command with NUL terminated output and yields the records as they arrive.
+
+        Parameters
+        ----------
+        *args :
+            Arguments to git, which must include -z or an equivalent.
+        chunk_size :
+            Bytes read from git at a time.
+
+        Yields
+        ------
+        :
+            Output records without the terminating NUL.
+        """
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = spawn(['git', '-C', self.repo_local_path, *args],
+                         stdin=DEVNULL, stdout=PIPE, stderr=stderr_file)
+            size = 0
+            try:
+                tail = b''
+                for chunk in iter(lambda: proc.stdout.read(chunk_size), b''):
+                    size += len(chunk)
+                    *complete, tail = (tail + chunk).split(b'\0')
+                    for record in complete:
+                        yield record.decode(errors='surrogateescape')
+                if tail:
+                    yield tail.decode(errors='surrogateescape')
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+                trace.finished(proc, size)
+            if returncode:
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+                raise subprocess.CalledProcessError(returncode, proc.args, output=stderr, stderr=stderr)
+
+    def returncode(self, *args: str) -> int:
+        """
+        Runs a git command in the repository and returns its exit status.
+
+        Parameters
+        ----------
+        *args :
+            Arguments to git.
+
+        Returns
+        -------
+        :
+            Exit status.
+        """
+        return run(['git', '-C', self.repo_local_path, *args], check=False).returncode
+
+    def config_update(self, settings: Dict[str, str]) -> int:
+        """
+        Sets repository config keys that do not already have the given values.
+
+        Parameters
+        ----------
+        settings :
+            Mapping of dotted keys to values.
+
+        Returns
+        -------
+        :
+            Number of keys written.
+        """
+        config_path = os.path.join(self.git_dir, 'config')
+        if os.path.isfile(config_path):
+            try:
+                return GitConfig(config_path).update(settings)
+            except GitConfigError as e:
+                logger.debug(f"Falling back to git config: {e}")
+        for key, value in settings.items():
+            self.git('config', key, value)
+        return len(settings)
+
+    def config_get(self, key: str) -> Optional[str]:
+        """
+        Value of a repository config key.
+
+        Parameters
+        ----------
+        key :
+            Key in git's dotted notation, e.g. 'remote.origin.url'.
+
+        Returns
+        -------
+        :
+            Value or None if the key is not set.
+        """
+        config_path = os.path.join(self.git_dir, 'config')
+        if os.path.isfile(config_path):
+            try:
+                return GitConfig(config_path).get(key)
+            except GitConfigError as e:
+                logger.debug(f"Falling back to git config: {e}")
+        value = self.git('config', '--get', key, check=False).strip()
+        return value or None
+
+    @property
+    def cat_file(self) -> CatFile:
+        """
+        Shared ``git cat-file --batch`` session, started on first use.
+        """
+        if self._cat_file is None:
+            self._cat_file = CatFile(self.repo_local_path)
+        return self._cat_file
+
+    def close(self) -> None:
+        """
+        Ends any open sessions.
+        """
+        if self._cat_file is not None:
+            self._cat_file.close()
+            self._cat_file = None
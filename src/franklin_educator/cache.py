@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Dict, Callable, Any, Optional
+
+from franklin import config as cfg
+from franklin.logger import logger
+
+from . import api
+from . import trace
+
+# Seconds before a cached listing is revalidated against GitLab
+REGISTRY_TTL = 15 * 60
+COURSES_TTL = 24 * 60 * 60
+
+# Background revalidations currently running, keyed by cache name
+_revalidating = {}
+_revalidating_lock = threading.Lock()
+
+
+def cache_dir(*parts: str) -> Path:
+    """
+    Directory for franklin's local caches, created if needed.
+
+    Parameters
+    ----------
+    *parts :
+        Subdirectory below the cache root.
+
+    Returns
+    -------
+    :
+        Path to the directory.
+    """
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        root = Path(os.environ['LOCALAPPDATA']) / 'franklin' / 'cache'
+    else:
+        root = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'franklin'
+    path = root.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_json(path: Path, data: Any) -> None:
+    """
+    Writes JSON atomically so concurrent readers never see a partial file.
+
+    Parameters
+    ----------
+    path :
+        File to write.
+    data :
+        JSON serializable data.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_json(path: Path) -> Optional[Any]:
+    """
+    Reads a JSON file written by write_json.
+
+    Parameters
+    ----------
+    path :
+        File to read.
+
+    Returns
+    -------
+    :
+        Data or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _page_unchanged(page: Dict[str, Any]) -> bool:
+    # Conditional request for one page of a listing. GitLab keeps the
+    # X-Total header on a 304, which shows if items were added to or 
+    # removed from later pages.
+    headers = {}
+    if page.get('etag'):
+        headers['If-None-Match'] = page['etag']
+    if page.get('last_modified'):
+        headers['If-Modified-Since'] = page['last_modified']
+    response = api.client().request('GET', page['url'], headers=headers)
+    return response.status_code == 304 and \
+        response.headers.get('X-Total', page.get('total')) == page.get('total')
+
+
+def _unchanged(url: str, pages: List[Dict[str, Any]]) -> bool:
+    # A listing is unchanged only if every one of its pages is. Listings
+    # with a page without validators cannot be revalidated.
+    import requests
+    if not pages or not all(page.get('etag') or page.get('last_modified') for page in pages):
+        return False
+    try:
+        with ThreadPoolExecutor(max_workers=api.POOL_SIZE) as pool:
+            return all(pool.map(_page_unchanged, pages))
+    except requests.RequestException as e:
+        logger.debug(f"Revalidation of {url} failed: {e}")
+        return False
+
+
+def _revalidate(path: Path, url: str, fetch: Callable[[List[Dict[str, Any]]], Any], 
+                entry: Dict) -> Any:
+    with trace.phase(f"GitLab API {url}"):
+        return _revalidate_untraced(path, url, fetch, entry)
+
+
+def _revalidate_untraced(path: Path, url: str, fetch: Callable[[List[Dict[str, Any]]], Any], 
+                         entry: Dict) -> Any:
+    # Conditional requests for the pages of the listing. If none of them
+    # changed only the timestamp is refreshed, otherwise the full listing
+    # is fetched again.
+    if entry and _unchanged(url, entry.get('pages')):
+        logger.debug(f"{url} not modified")
+        entry['fetched'] = time.time()
+        write_json(path, entry)
+        return entry['data']
+    pages = []
+    data = fetch(pages)
+    write_json(path, dict(fetched=time.time(), data=data, pages=pages))
+    return data
+
+
+def _revalidate_in_background(name: str, path: Path, url: str,
+                              fetch: Callable[[], Any], entry: Dict) -> None:
+    def target():
+        try:
+            _revalidate(path, url, fetch, entry)
+        except Exception as e:
+            logger.debug(f"Background revalidation of {name} failed: {e!r}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.pop(name, None)
+    with _revalidating_lock:
+        if name in _revalidating:
+            return
+        thread = threading.Thread(target=target, daemon=True)
+        _revalidating[name] = thread
+    thread.start()
+
+
+def cached(name: str, url: str, fetch: Callable[[], Any], ttl: int,
+           refresh: bool=False, offline: bool=False) -> Any:
+    """
+    Listing from GitLab cached on disk.
+
+    A fresh cache entry is returned directly. A stale entry is also
+    returned directly, while it is revalidated in the background using 
+    conditional requests for all pages of the listing.
+
+    Parameters
+    ----------
+    name :
+        Name of the cache entry.
+    url :
+        GitLab API url the listing is based on (used in logs and traces).
+    fetch :
+        Function returning the full (JSON serializable) listing. It is
+        passed a list to fill with the pages of the listing (see 
+        api.GitLabClient.paginate). Without validators for every page, 
+        the listing is fetched again once the cache entry is stale.
+    ttl :
+        Seconds a cache entry is considered fresh.
+    refresh :
+        Bypass the cache and fetch the listing.
+    offline :
+        Only use the cache, never the network.
+
+    Returns
+    -------
+    :
+        The listing, or None if offline and nothing is cached.
+    """
+    path = cache_dir('listings') / (name.replace('/', '%2F') + '.json')
+    entry = None if refresh else read_json(path)
+    if offline:
+        return entry['data'] if entry else None
+    if entry is None:
+        return _revalidate(path, url, fetch, {})
+    if time.time() - entry['fetched'] > ttl:
+        _revalidate_in_background(name, path, url, fetch, entry)
+    return entry['data']
+
+
+def registry_listing(refresh: bool=False, offline: bool=False) -> Dict[Tuple[str, str], str]:
+    """
+    Docker images for the exercises available on GitLab.
+
+    Parameters
+    ----------
+    refresh :
+        Bypass the cache.
+    offline :
+        Only use the cache. The listing is empty if nothing is cached.
+
+    Returns
+    -------
+    :
+        Mapping of (course, exercise) to image url.
+    """
+    registry = f'{cfg.gitlab_api_url}/groups/{cfg.gitlab_group}/registry/repositories'
+    def fetch(pages):
+        import requests
+        try:
+            listing = api.registry_listing(pages)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code not in (401, 403):
+                raise
+            # the registry may need credentials only franklin has, and
+            # the listing can then not be revalidated
+            from franklin import gitlab
+            pages.clear()
+            listing = gitlab.get_registry_listing(registry)
+        return [[course, exercise, image] for (course, exercise), image in listing.items()]
+    rows = cached(f'registry-{cfg.gitlab_group}', registry, fetch, REGISTRY_TTL, refresh, offline)
+    return {(course, exercise): image for course, exercise, image in rows or []}
+
+
+def course_names(refresh: bool=False) -> Dict[str, str]:
+    """
+    Courses in the GitLab group.
+
+    Parameters
+    ----------
+    refresh :
+        Bypass the cache.
+
+    Returns
+    -------
+    :
+        Mapping of course name (the subgroup path) to full course name.
+    """
+    url = f'{cfg.gitlab_api_url}/groups/{cfg.gitlab_group}/subgroups'
+    return cached(f'courses-{cfg.gitlab_group}', url, api.course_names, COURSES_TTL, refresh)
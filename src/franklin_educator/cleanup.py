@@ -0,0 +1,160 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Set
+
+from .backend import GitBackend
+
+# Threads used to remove files. Removal is dominated by file system
+# latency, so this helps most on network and Windows file systems.
+REMOVE_WORKERS = 8
+
+
+def worktree_state(repo_local_path: str, ignore: Set[str]=frozenset()) -> str:
+    """
+    Classifies the working tree of a repository.
+
+    Uses the machine readable output of git status, so the result does
+    not depend on the language git is set up with.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    ignore :
+        Paths (relative to the repository) whose unstaged changes are 
+        deliberately not committed, e.g. notebook outputs.
+
+    Returns
+    -------
+    :
+        'clean' if there are no changes, 'untracked' if the only changes 
+        are untracked files, and 'modified' if tracked files are changed.
+    """
+    state = 'clean'
+    records = GitBackend(repo_local_path).records('status', '--porcelain=v2', '-z')
+    for record in records:
+        kind = record[:1]
+        if kind == '1' and ignore:
+            # 1 XY sub mH mI mW hH hI path
+            fields = record.split(' ', 8)
+            if fields[1][0] == '.' and fields[8] in ignore:
+                continue
+        if kind in ('1', '2', 'u'):
+            # stop reading as soon as the answer is known
+            records.close()
+            return 'modified'
+        if kind == '?':
+            state = 'untracked'
+    return state
+
+
+def _empty(path: str, removed: Set[str]) -> bool:
+    # empty once the paths in removed are gone
+    return all(os.path.join(path, name) in removed for name in os.listdir(path))
+
+
+def _prune_empty_dirs(repo_local_path: str, dirs: Set[str], dry_run: bool, 
+                      removed_files: Set[str]) -> List[str]:
+    # Removes directories left empty, deepest first, moving on to the parent
+    # of each directory removed. Only directories that held removed files
+    # (or their ancestors) are ever looked at.
+    root = os.path.normpath(repo_local_path)
+    removed = []
+    pending = set(os.path.normpath(d) for d in dirs)
+    while pending:
+        path = max(pending, key=lambda p: p.count(os.sep))
+        pending.discard(path)
+        if path == root or not path.startswith(root + os.sep):
+            continue
+        if dry_run:
+            if not _empty(path, removed_files):
+                continue
+            removed_files.add(path)
+        else:
+            try:
+                os.rmdir(path)
+            except OSError:
+                # not empty
+                continue
+        removed.append(path)
+        pending.add(os.path.dirname(path))
+    return removed
+
+
+def remove_tracked_files(repo_local_path: str, dry_run: bool=False) -> List[str]:
+    """
+    Removes tracked files, the directories they leave empty, and the .git directory.
+
+    Untracked files are left alone. The repository directory itself is
+    removed if nothing is left in it.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    dry_run :
+        Only report what would be removed.
+
+    Returns
+    -------
+    :
+        Paths removed (or that would be removed).
+    """
+    repo_local_path = str(repo_local_path)
+    removed = []
+    parents = set()
+    def remove(path):
+        if not dry_run:
+            os.remove(path)
+    with ThreadPoolExecutor(max_workers=REMOVE_WORKERS) as pool:
+        futures = []
+        for line in GitBackend(repo_local_path).records('ls-files', '-z'):
+            path = os.path.join(repo_local_path, *(line.split('/')))
+            # files outside a sparse checkout are tracked but not present
+            if not os.path.lexists(path):
+                continue
+            parents.add(os.path.dirname(path))
+            removed.append(path)
+            futures.append(pool.submit(remove, path))
+        for future in futures:
+            future.result()
+
+    removed.extend(_prune_empty_dirs(repo_local_path, parents, dry_run, set(removed)))
+
+    path = os.path.join(repo_local_path, '.git')
+    if os.path.exists(path):
+        removed.append(path)
+        if not dry_run:
+            shutil.rmtree(path)
+    if dry_run:
+        if _empty(repo_local_path, set(removed)):
+            removed.append(repo_local_path)
+    elif os.path.exists(repo_local_path) and not os.listdir(repo_local_path):
+        os.rmdir(repo_local_path)
+        removed.append(repo_local_path)
+    return removed
+
+
+def list_repository(repo_local_path: str) -> List[str]:
+    """
+    Lists all files and directories in a repository directory.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Paths, including the .git directory but not its contents.
+    """
+    paths = []
+    for root, dirs, files in os.walk(repo_local_path):
+        if '.git' in dirs:
+            dirs.remove('.git')
+            paths.append(os.path.join(root, '.git'))
+        paths.extend(os.path.join(root, name) for name in dirs + files)
+    paths.append(str(repo_local_path))
+    return paths
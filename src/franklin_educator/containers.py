@@ -0,0 +1,146 @@
+import time
+from datetime import datetime
+import threading
+from subprocess import PIPE, STDOUT
+from typing import Optional
+
+from franklin.logger import logger
+
+from . import backend
+from . import trace
+
+
+def docker_ready() -> bool:
+    """
+    Checks if the Docker daemon answers.
+
+    Returns
+    -------
+    :
+        True if Docker is running.
+    """
+    try:
+        return backend.run(['docker', 'info'], check=False).returncode == 0
+    except OSError:
+        return False
+
+
+def wait_for_docker(timeout: float=120, interval: float=0.5) -> bool:
+    """
+    Waits for the Docker daemon to answer.
+
+    Parameters
+    ----------
+    timeout :
+        Seconds to wait before giving up.
+    interval :
+        Seconds between checks.
+
+    Returns
+    -------
+    :
+        True if Docker became ready within the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while not docker_ready():
+        if time.monotonic() > deadline:
+            logger.debug("Docker did not become ready")
+            return False
+        time.sleep(interval)
+    return True
+
+
+def image_created(image_url: str) -> Optional[float]:
+    """
+    Time a local Docker image was built.
+
+    Parameters
+    ----------
+    image_url :
+        Image URL.
+
+    Returns
+    -------
+    :
+        Unix timestamp, or None if the image is not available locally.
+    """
+    try:
+        result = backend.run(['docker', 'image', 'inspect', '--format', '{{.Created}}', image_url], check=False)
+    except OSError:
+        return None
+    if result.returncode:
+        return None
+    # e.g. 2025-03-01T10:11:12.123456789Z, which has more digits than 
+    # fromisoformat accepts
+    created = result.stdout.decode().strip()
+    date, _, fraction = created.rstrip('Z').partition('.')
+    try:
+        return datetime.fromisoformat(date + '+00:00').timestamp()
+    except ValueError:
+        return None
+
+
+class ImagePull():
+    """
+    Pulls a Docker image in the background.
+    """
+
+    def __init__(self, image_url: str) -> None:
+        """
+        Parameters
+        ----------
+        image_url :
+            Image URL.
+        """
+        self.image_url = image_url
+        self.layers = {}
+        self.output = []
+        self._proc = backend.spawn(['docker', 'pull', image_url], stdout=PIPE, stderr=STDOUT)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        # without a terminal, docker prints one line per layer status change,
+        # e.g. "a1b2c3: Pull complete", after a "main: Pulling from ..." 
+        # line naming the tag
+        for line in self._proc.stdout:
+            line = line.decode(errors='replace').strip()
+            self.output.append(line)
+            layer, sep, state = line.partition(': ')
+            if sep and ' ' not in layer and layer not in ('Digest', 'Status') \
+                    and not state.startswith('Pulling from'):
+                self.layers[layer] = state
+        self._proc.stdout.close()
+
+    def status(self) -> str:
+        """
+        Short description of how far the pull has come.
+
+        Returns
+        -------
+        :
+            Status text.
+        """
+        if self._proc.poll() is not None:
+            return 'done' if self._proc.returncode == 0 else 'failed'
+        if not self.layers:
+            return 'starting'
+        done = sum(state in ('Pull complete', 'Already exists') for state in self.layers.values())
+        return f"{done}/{len(self.layers)} layers"
+
+    def wait(self) -> bool:
+        """
+        Waits for the pull to finish.
+
+        Returns
+        -------
+        :
+            True if the image was pulled.
+        """
+        self._reader.join()
+        self._proc.wait()
+        trace.finished(self._proc, sum(len(line) for line in self.output))
+        if self._proc.returncode:
+            logger.debug('\n'.join(self.output))
+            return False
+        return True
@@ -1,6 +1,9 @@
 import time
 import sys
+import functools
+import threading
 import re
+import json
 import tempfile
 import click
 import subprocess
@@ -8,50 +11,91 @@ from subprocess import DEVNULL, STDOUT, PIPE
 import os
 import shutil
 from pathlib import Path, PurePosixPath, PureWindowsPath
-from typing import Tuple, List, Dict, Callable, Any
-import webbrowser
-import pyperclip
+from typing import Tuple, List, Dict, Set, Callable, Any
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 import platform
-from pkg_resources import iter_entry_points
-from click_plugins import with_plugins
-import importlib_resources
 
 from franklin import config as cfg
 from franklin import utils
 from franklin import terminal as term
 from franklin import logger
-from franklin import gitlab
-from franklin import jupyter
-from franklin import docker
-from franklin import update
 from franklin import options
 from franklin.logger import logger
 
+from . import api
+from . import autosave
+from . import backend
+from . import cache
+from . import cleanup
+from . import containers
+from . import index
+from . import mirrors
+from . import network
+from . import notebooks
+from . import partial
+from . import pipeline
+from . import plugins
+from . import ssh
+from . import status
+from . import sync
+from . import templates
+from . import trace
+from . import uploads
+from . import validation
+from . import warm
+from .backend import GitBackend
+
 def check_ssh_set_up():
-    cmd = f'ssh -T git@{cfg.gitlab_domain} <<<yes'
-    logger.debug(cmd)
-    term.echo(f"Checking encrypted connection to GitLab")
-    utils.run_cmd(cmd, check=False)
-    cmd = f'ssh -T git@g{cfg.gitlab_domain}'
-    logger.debug(cmd)
-    cmd = f'ssh -T git@{cfg.gitlab_domain}'
-    output = utils.run_cmd(cmd)
-    if output.startswith('Welcome to GitLab'):
+    if ssh.connection_ok():
         return True
-    return False
+    term.echo(f"Checking encrypted connection to GitLab")
+    return ssh.check_connection()
+
+
+def gitlab_ssh(func: Callable) -> Callable:
+    """
+    Decorator for commands that reach GitLab over ssh.
+
+    The git processes started by the command share ssh connections, and 
+    the user is helped to set up an ssh key if GitLab cannot be reached.
+    Commands registered as plugins of other groups (e.g. franklin 
+    exercise) do not run the callback of the git group, so they need 
+    this themselves.
+
+    Parameters
+    ----------
+    func :
+        Command function.
+
+    Returns
+    -------
+    :
+        Decorated function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        ssh.enable_multiplexing()
+        if not check_ssh_set_up():
+            ssh_keygen()
+        return func(*args, **kwargs)
+    return wrapper
 
 
 def ssh_keygen():
     """
     Generate an ssh key pair.
     """
+    import webbrowser
+    import pyperclip
+
     path = Path.home() / '.ssh/id_rsa'
     if platform.system() == 'Windows':
         path = PureWindowsPath(path)
         
     if not path.exists():
         logger.debug(f"Generating ssh key pair at {path}")
-        utils.run_cmd(f"ssh-keygen -q -t rsa -N '' -f {path} <<<y")
+        backend.run(['ssh-keygen', '-q', '-t', 'rsa', '-N', '', '-f', str(path)], input=b'y\n')
 
     with open(path.with_suffix('.pub')) as f:
         public_key = f.read()
@@ -82,58 +126,96 @@ def config_local_repo(repo_local_path: str) -> None:
     repo_local_path : 
         Path to the local repository.
     """
-
-    if utils.system() == 'Windows':
-        subprocess.check_call(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} config pull.rebase false'))
-        subprocess.check_call(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} config merge.tool vscode'))
-        subprocess.check_call(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} config mergetool.vscode.cmd "code --wait --merge $REMOTE $LOCAL $BASE $MERGED"'))
-        subprocess.check_call(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} config diff.tool vscode'))
-        subprocess.check_call(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} config difftool.vscode.cmd "code --wait --diff $LOCAL $REMOTE"'))
-    else:
-        subprocess.check_call(utils.fmt_cmd(f'git -C {repo_local_path} config pull.rebase false'))
-        subprocess.check_call(utils.fmt_cmd(f"git -C {repo_local_path} config merge.tool vscode"))
-        subprocess.check_call(utils.fmt_cmd(f"git -C {repo_local_path} config mergetool.vscode.cmd 'code --wait --merge $REMOTE $LOCAL $BASE $MERGED'"))
-        subprocess.check_call(utils.fmt_cmd(f"git -C {repo_local_path} config diff.tool vscode"))
-        subprocess.check_call(utils.fmt_cmd(f"git -C {repo_local_path} config difftool.vscode.cmd 'code --wait --diff $LOCAL $REMOTE'"))
+    GitBackend(repo_local_path).config_update({
+        'pull.rebase': 'false',
+        'merge.tool': 'vscode',
+        'mergetool.vscode.cmd': 'code --wait --merge $REMOTE $LOCAL $BASE $MERGED',
+        'diff.tool': 'vscode',
+        'difftool.vscode.cmd': 'code --wait --diff $LOCAL $REMOTE',
+    })
 
 
-def git_safe_pull(repo_local_path: str) -> bool:
+def git_safe_pull(repo_local_path: str, interactive: bool=True) -> bool:
     """
     Pulls changes from the remote repository and checks for merge conflicts.
 
+    The remote is fetched once, and the local branch is fast-forwarded 
+    or, if both sides have new commits, merged (see sync.pull).
+
     Parameters
     ----------
     repo_local_path : 
         Path to the local repository.
+    interactive : 
+        Whether to report conflicts and launch the mergetool.
 
     Returns
     -------
     :
         True if there is a merge conflict, False otherwise.
     """
-
-    merge_conflict = False
+    secho = _echo(interactive)
     try:
-        # output = subprocess.check_output(utils._cmd(f'git -C {PurePosixPath(repo_local_path)} pull')).decode()
-        subprocess.run(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} diff --name-only --diff-filter=U --relative'), stdout=DEVNULL, stderr=STDOUT, check=True)
-    except subprocess.CalledProcessError as e:        
-        print(e.output.decode())
+        result = sync.pull(repo_local_path)
+    except subprocess.CalledProcessError as e:
+        if not interactive:
+            raise
+        print(e.output.decode(errors='replace'))
+        raise click.Abort()
+    if result['objects']:
+        secho(f"Downloaded {result['objects']} objects ({_format_size(result['bytes'])}) "
+              "from GitLab.", fg='green')
+
+    if result['state'] == 'blocked':
+        _report_blocked(result['conflicts'], secho)
+        return True
+
+    if result['state'] != 'conflicted':
+        return False
+
+    if not interactive:
+        logger.debug(f"Merge conflicts in {repo_local_path}: {result['conflicts']}")
+        return True
+
+    _resolve_conflicts(repo_local_path, result['conflicts'])
+    return True
 
-        # merge conflict
-        output = subprocess.check_output(utils.fmt_cmd(f'git -C {PurePosixPath(repo_local_path)} diff --name-only --diff-filter=U --relative')).decode()
 
-        term.echo('Changes to the following files conflict with changes to the gitlab versions of the same files:')
-        term.echo(output)
-        term.echo("Please resolve any conflicts and then run the command again.")
-        term.echo("For more information on resolving conflicts, see:")
-        term.echo("https://munch-group/franklin/git.html#resolving-conflicts", fg='blue')
-        click.pause("Press Enter to launch vscode's mergetool")
+def _report_blocked(paths: List[str], secho: Callable) -> None:
+    secho("Changes on GitLab would overwrite local changes to these files:", fg='red')
+    for path in paths:
+        secho(f"  {path}", fg='red')
+    secho("Upload your changes first, or undo them.", fg='red')
 
-        gitlab.launch_mergetool(repo_local_path)
 
-        merge_conflict = True
+def _resolve_conflicts(repo_local_path: str, paths: List[str]) -> None:
+    # tells the user about merge conflicts and launches the mergetool
+    term.echo('Changes to the following files conflict with changes to the gitlab versions of the same files:')
+    for path in paths:
+        term.echo(f"  {path}")
+    term.echo("Please resolve any conflicts and then run the command again.")
+    term.echo("For more information on resolving conflicts, see:")
+    term.echo("https://munch-group/franklin/git.html#resolving-conflicts", fg='blue')
+    click.pause("Press Enter to launch vscode's mergetool")
 
-    return merge_conflict
+    from franklin import gitlab
+    gitlab.launch_mergetool(repo_local_path)
+
+
+def report_conflicts(repo_local_path: str) -> None:
+    """
+    Tells the user why a non-interactive update of a local repository 
+    stopped, and launches the mergetool if there are merge conflicts.
+
+    Parameters
+    ----------
+    repo_local_path : 
+        Path to the local repository.
+    """
+    if merge_in_progress(repo_local_path):
+        _resolve_conflicts(repo_local_path, sync.conflicted_paths(repo_local_path))
+    else:
+        _report_blocked(sync.blocking_paths(repo_local_path), term.secho)
 
 
 def merge_in_progress(repo_local_path: str) -> bool:
@@ -164,7 +246,7 @@ def launch_mergetool(repo_local_path: str) -> None:
         Path to the local repository
     """
     try:
-        output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} mergetool')).decode()
+        GitBackend(repo_local_path).git('mergetool')
     except subprocess.CalledProcessError as e:        
         print(e.output.decode())   
 
@@ -172,70 +254,329 @@ def launch_mergetool(repo_local_path: str) -> None:
 def finish_any_merge_in_progress(repo_local_path):
     if merge_in_progress(repo_local_path):
         try:
-            output = subprocess.check_output(utils.fmt_cmd(f'git -C repo_local_path merge --continue --no-edit')).decode()
+            GitBackend(repo_local_path).git('merge', '--continue', '--no-edit')
             term.secho("Merge continued.", fg='green')
         except subprocess.CalledProcessError as e:
             print(e.output.decode())
             term.secho("You have merge conflicts. Please resolve the conflicts and then run the command again.", fg='red')
             click.pause("Press Enter to launch vscode's mergetool")
+            from franklin import gitlab
             gitlab.launch_mergetool(repo_local_path)
             return
 
 
-def git_down() -> None:
+def pick_course(refresh: bool=False) -> Tuple[str, str]:
     """
-    "Downloads" an exercise from GitLab.
+    Asks the user to pick a course.
+
+    Parameters
+    ----------
+    refresh : 
+        Bypass the cached list of courses.
+
+    Returns
+    -------
+    :
+        Course name and full course name.
     """
+    index.ensure(refresh)
+    names = index.courses() or cache.course_names(refresh)
+    courses = sorted(names, key=lambda c: names[c].lower())
+    term.echo()
+    for i, course in enumerate(courses, 1):
+        term.echo(f"  {i:>2}: {names[course]}")
+    term.echo()
+    choice = click.prompt("Select course", type=click.IntRange(1, len(courses)))
+    course = courses[choice - 1]
+    return course, names[course]
 
-    # get images for available exercises
-    registry = f'{cfg.gitlab_api_url}/groups/{cfg.gitlab_group}/registry/repositories'
-    exercises_images = gitlab.get_registry_listing(registry)
 
-    # pick course and exercise
-    (course, _), (exercise, _) = gitlab.select_exercise(exercises_images)
+def _format_size(n_bytes: int) -> str:
+    return f"{n_bytes / 1024**2:.1f} MB" if n_bytes >= 1024**2 else f"{n_bytes / 1024:.0f} kB"
 
-    # url for cloning the repository
+
+def _echo(interactive: bool) -> Callable:
+    # in non-interactive (bulk) mode progress goes to the log, and the
+    # caller prints a summary instead
+    if interactive:
+        return term.secho
+    return lambda text='', **kwargs: logger.debug(text)
+
+
+def local_repository_path(exercise: str, directory: str=None) -> str:
+    """
+    Path of the local clone of an exercise.
+
+    Parameters
+    ----------
+    exercise : 
+        Exercise name as listed in the registry.
+    directory : 
+        Directory the exercise is cloned into. Defaults to the current 
+        working directory.
+
+    Returns
+    -------
+    :
+        Path to the local repository, which may not exist yet. If 
+        directory is itself a clone of the exercise, that is returned.
+    """
+    if directory is None:
+        directory = os.getcwd()
     repo_name = exercise.split('/')[-1]
-    clone_url = f'git@gitlab.au.dk:{cfg.gitlab_group}/{course}/{repo_name}.git'
-    repo_local_path = os.path.join(os.getcwd(), repo_name)
+    repo_local_path = os.path.join(directory, repo_name)
     if utils.system() == 'Windows':
         repo_local_path = PureWindowsPath(repo_local_path)
 
     # check if we are in an already cloned repo
-    os.path.dirname(os.path.realpath(__file__))
-    if os.path.basename(os.getcwd()) == repo_name and os.path.exists('.git'):
-        repo_local_path = os.path.join(os.getcwd())
+    if os.path.basename(directory) == repo_name and os.path.exists(os.path.join(directory, '.git')):
+        repo_local_path = directory
+    return repo_local_path
+
+
+def sync_exercise(course: str, exercise: str, directory: str=None, 
+                  interactive: bool=True, partial_clone: bool=False) -> Tuple[str, str]:
+    """
+    Clones an exercise repository or updates an existing clone.
+
+    Parameters
+    ----------
+    course : 
+        Course name.
+    exercise : 
+        Exercise name as listed in the registry.
+    directory : 
+        Directory to clone into. Defaults to the current working directory.
+    interactive : 
+        Whether to prompt the user. If False, existing clones are updated
+        without asking, progress is logged rather than printed, and a 
+        failed clone or pull raises CalledProcessError with git's output.
+    partial_clone : 
+        Make a blob-filtered, shallow clone even if the exercise does 
+        not ask for one in its franklin.yml.
+
+    Returns
+    -------
+    :
+        Status ('cloned', 'updated' or 'conflicted') and path to the local repository.
+    """
+    secho = _echo(interactive)
+
+    # url for cloning the repository
+    repo_name = exercise.split('/')[-1]
+    clone_url = exercise_url(course, repo_name)
+    repo_local_path = local_repository_path(exercise, directory)
 
     # Finish any umcompleted merge
-    finish_any_merge_in_progress(repo_local_path)
+    if interactive:
+        finish_any_merge_in_progress(repo_local_path)
+    elif merge_in_progress(repo_local_path):
+        return 'conflicted', repo_local_path
 
     # update or clone the repository
-    if os.path.exists(repo_local_path):
-        term.secho(f"The repository '{repo_name}' already exists at {repo_local_path}.")
-        if click.confirm('\nDo you want to update the existing repository?', default=True):
-            merge_conflict = git_safe_pull(repo_local_path)
+    full_clone_bytes = None
+    if os.path.exists(repo_local_path) and not network.clone_incomplete(repo_local_path):
+        secho(f"The repository '{repo_name}' already exists at {repo_local_path}.")
+        if not interactive or click.confirm('\nDo you want to update the existing repository?', default=True):
+            merge_conflict = git_safe_pull(repo_local_path, interactive=interactive)
             if merge_conflict:
-                return
+                return 'conflicted', repo_local_path
             else:
-                term.secho(f"Local repository updated.", fg='green')
+                secho(f"Local repository updated.", fg='green')
+                outcome = 'updated'
         else:
             raise click.Abort()
     else:
+        clone_settings = partial.clone_settings(clone_url, force=partial_clone)
         try:
-            output = subprocess.check_output(utils.fmt_cmd(f'git clone {clone_url}')).decode()
+            if clone_settings:
+                transferred = partial.clone(clone_url, str(repo_local_path), clone_settings)
+            elif not mirrors.clone(clone_url, str(repo_local_path)):
+                full_clone_bytes = partial.objects_size(repo_local_path)
         except subprocess.CalledProcessError as e:
-            term.secho(f"Failed to clone repository: {e.output.decode()}", fg='red')
+            if not interactive:
+                raise
+            secho(f"Failed to clone repository: {e.output.decode()}", fg='red')
             raise click.Abort()
-        term.secho(f"Local repository updated.", fg='green')
+        secho(f"Local repository updated.", fg='green')
+        if clone_settings and interactive:
+            partial.report(clone_url, transferred)
+        outcome = 'cloned'
+
+    # the exercise may declare how it should be cloned next time
+    partial.remember(clone_url, repo_local_path, full_clone_bytes)
 
     config_local_repo(repo_local_path)
+    mirrors.update_from_clone(repo_local_path)
+
+    return outcome, repo_local_path
+
+
+def _choose_exercise(matches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # numbered menu of search results
+    term.echo()
+    for i, row in enumerate(matches, 1):
+        title = f"  {row['title']}" if row['title'] else ''
+        term.echo(f"  {i:>2}: {row['course']}/{row['exercise']}{title}")
+    term.echo()
+    choice = click.prompt("Select exercise", type=click.IntRange(1, len(matches)))
+    return matches[choice - 1]
+
+
+def select_exercise(refresh: bool=False, find: str=None, name: str=None) -> Tuple[str, str, str]:
+    """
+    Asks the user to pick an exercise.
+
+    Exercises are read from the local exercise index, so no network 
+    requests are needed unless the index is empty or refreshed.
+
+    Parameters
+    ----------
+    refresh : 
+        Update the exercise index first.
+    find : 
+        Search words. Only matching exercises are offered, and a single 
+        match is selected without asking.
+    name : 
+        Exercise name, optionally prefixed by the course ("course/exercise"),
+        selected without asking.
+
+    Returns
+    -------
+    :
+        Course name, exercise name and image url.
+    """
+    index.ensure(refresh)
+
+    if name is not None or find is not None:
+        matches = index.lookup(name) if name is not None else index.search(find)
+        if not matches:
+            term.secho(f"No exercises match '{name if name is not None else find}'", fg='red')
+            raise click.Abort()
+        if len(matches) == 1:
+            row = matches[0]
+            term.echo(f"Selected {row['course']}/{row['exercise']}")
+        else:
+            row = _choose_exercise(matches)
+        return row['course'], row['exercise'], row['image']
+
+    # get images for available exercises
+    exercises_images = index.images()
+
+    # pick course and exercise
+    from franklin import gitlab
+    (course, _), (exercise, _) = gitlab.select_exercise(exercises_images)
+
+    return course, exercise, exercises_images[(course, exercise)]
+
+
+def git_down(refresh: bool=False, partial_clone: bool=False, find: str=None, 
+             name: str=None) -> Tuple[str, str]:
+    """
+    "Downloads" an exercise from GitLab.
+
+    Parameters
+    ----------
+    refresh : 
+        Update the exercise index first.
+    partial_clone : 
+        Make a blob-filtered, shallow clone.
+    find : 
+        Search words narrowing the exercises offered (see select_exercise).
+    name : 
+        Name of the exercise to download (see select_exercise).
+
+    Returns
+    -------
+    :
+        Image url and path to the local repository.
+    """
+
+    course, exercise, image = select_exercise(refresh, find=find, name=name)
+
+    outcome, repo_local_path = sync_exercise(course, exercise, partial_clone=partial_clone)
+    if outcome == 'conflicted':
+        return
 
-    image = exercises_images[(course, exercise)]
     return image, repo_local_path
 
 
+def _report_removal(paths: List[str]) -> None:
+    term.echo("The following would be removed:")
+    for path in paths:
+        term.echo(f"  {path}")
+
+
+def _report_cleaning(cleaning: Dict[str, Any], secho: Callable) -> None:
+    if cleaning['cleaned']:
+        secho(f"Removed outputs from {len(cleaning['cleaned'])} notebooks "
+              f"({_format_size(cleaning['saved'])} less to upload).", fg='green')
+    for path in cleaning['large']:
+        if path in cleaning['skipped']:
+            secho(f"{path} is larger than the size limit and is not uploaded.", fg='red')
+        else:
+            secho(f"{path} is larger than the size limit.", fg='red')
+
+
+def _report_validation(results: List[Dict[str, Any]], secho: Callable) -> None:
+    for result in results:
+        timing = 'cached' if result['cached'] else f"{result['seconds']:.1f}s"
+        if result['ok']:
+            secho(f"  {result['path']}: ok ({timing})", fg='green')
+        elif result['environment']:
+            secho(f"  {result['path']}: could not run here ({timing}): {result['error']}", fg='yellow')
+        else:
+            secho(f"  {result['path']}: failed ({timing}): {result['error']}", fg='red')
+    if any(result['environment'] for result in results):
+        secho("Notebooks are run in the local Python environment, not the exercise image, "
+              "so missing kernels and packages do not stop the upload.", fg='yellow')
+
+
+def _remove_local_files(repo_local_path: str, dry_run: bool, secho: Callable,
+                        ignore: Set[str]=frozenset()) -> None:
+    # removes the local repository after upload, if that loses no work
+    if status.commits_ahead(repo_local_path) != 0:
+        secho("There are local commits that are not uploaded to GitLab. "
+              "Local repository will not be removed.", fg='red')
+        return
+    try:
+        state = cleanup.worktree_state(repo_local_path, ignore=ignore)
+    except subprocess.CalledProcessError as e:    
+        print(e.output.decode())
+        raise click.Abort()
+
+    if state == 'clean':
+        if dry_run:
+            _report_removal(cleanup.list_repository(repo_local_path))
+        else:
+            shutil.rmtree(repo_local_path)
+            secho("Local files removed.", fg='green')
+
+    elif state == 'untracked':
+
+        if merge_in_progress(repo_local_path):
+            secho("A merge is in progress. Local repository will not be removed.", fg='red')
+            return
+
+        # Instead of deleting the repository dir, we prune all tracked files and 
+        # and resulting empty directories - in case there are 
+        path = os.path.join(repo_local_path, 'franklin.log')
+        if os.path.exists(path) and not dry_run:
+            os.remove(path)
+        removed = cleanup.remove_tracked_files(repo_local_path, dry_run=dry_run)
+        if dry_run:
+            _report_removal(removed)
+        else:
+            secho(f"Local files removed.", fg='green')
 
-def git_up(repo_local_path: str, remove_tracked_files: bool) -> None:
+    else:
+        # term.secho("There are uncommitted changes. Please commit or stash them before removing local files.", fg='red')
+        secho("There are local changes to repository files. Local repository will not be removed.", fg='red')
+
+
+def git_up(repo_local_path: str, remove_tracked_files: bool, message: str=None, 
+           dry_run: bool=False, background: bool=False, validate: str=None,
+           validation_pool: Executor=None) -> str:
     """
     "Uploads" an exercise to GitLab.
 
@@ -245,64 +586,149 @@ def git_up(repo_local_path: str, remove_tracked_files: bool) -> None:
         Path to the local repository.
     remove_tracked_files : 
         Whether to remove the tracked files after uploading
+    message : 
+        Commit message. If given, the user is not prompted for anything 
+        and progress is logged rather than printed.
+    dry_run : 
+        Report which local files would be removed instead of removing them.
+    background : 
+        Commit locally and leave the push (and the removal of local files)
+        to the background upload worker.
+    validate : 
+        Run the changed notebooks before committing: 'off', 'warn' or 
+        'block' (do not commit if a notebook fails). Defaults to the 
+        validate setting in franklin.yml.
+    validation_pool : 
+        Process pool shared by concurrent uploads to run notebooks in.
+
+    Returns
+    -------
+    :
+        Status of the upload: 'pushed', 'queued', 'unchanged', 'conflicted' 
+        or 'failed'.
     """
+    interactive = message is None
+    secho = _echo(interactive)
 
     if not os.path.exists(repo_local_path):
-        term.secho(f"{repo_local_path} does not exist", fg='red')
-        return
+        secho(f"{repo_local_path} does not exist", fg='red')
+        return 'failed'
     if not os.path.exists(os.path.join(repo_local_path, '.git')):
-        term.secho(f"{repo_local_path} is not a git repository", fg='red')
-        return
+        secho(f"{repo_local_path} is not a git repository", fg='red')
+        return 'failed'
+
+    # nothing changed and nothing left to push, so there is no need to 
+    # configure, fetch, or stage anything
+    if not merge_in_progress(repo_local_path) and \
+            not status.has_changes_to_upload(repo_local_path):
+        secho("No changes to your local files.", fg='yellow')
+        if remove_tracked_files:
+            _remove_local_files(repo_local_path, dry_run, secho)
+        return 'unchanged'
 
     config_local_repo(repo_local_path)
 
-    # Fetch the latest changes from the remote repository
-    output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} fetch')).decode()
+    repo = GitBackend(repo_local_path)
 
     # Finish any umcompleted merge
-    finish_any_merge_in_progress(repo_local_path)
+    if interactive:
+        finish_any_merge_in_progress(repo_local_path)
+    elif merge_in_progress(repo_local_path):
+        return 'conflicted'
 
-    term.secho("\nChecking for changes to local files.", fg='red')
+    secho("\nChecking for changes to local files.", fg='red')
 
     # add
     try:
-        output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} add -u')).decode()
+        repo.git('add', '-u')
     except subprocess.CalledProcessError as e:        
         print(e.output.decode())
         raise click.Abort()
-    
+
+    # strip notebook outputs and hold back large files as the repository says
     try:
-        staged_changes = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} diff --cached')).decode()
+        cleaning = notebooks.clean_staged(repo_local_path)
     except subprocess.CalledProcessError as e:        
         print(e.output.decode())
         raise click.Abort()
+    _report_cleaning(cleaning, secho)
+    
+    # exit status 1 means there are staged changes, and git stops 
+    # comparing at the first one rather than producing the full diff
+    try:
+        repo.git('diff', '--cached', '--quiet')
+        staged_changes = False
+    except subprocess.CalledProcessError as e:        
+        if e.returncode != 1:
+            print(e.output.decode())
+            raise click.Abort()
+        staged_changes = True
     
     if staged_changes:
 
+        # run the changed notebooks (in the local Python environment, not 
+        # the exercise image, so only failures of the notebooks themselves
+        # block the upload)
+        validate, cell_timeout = validation.mode(repo_local_path, validate)
+        if validate != 'off':
+            secho("Running changed notebooks.", fg='yellow')
+            with trace.phase('validate'):
+                results = validation.validate_staged(repo_local_path, timeout=cell_timeout,
+                                                     pool=validation_pool)
+            _report_validation(results, secho)
+            if validate == 'block' and any(not result['ok'] and not result['environment'] 
+                                           for result in results):
+                secho("Notebooks failed to run. Fix them and upload again.", fg='red')
+                return 'failed'
+
         # commit
-        msg = click.prompt("Files changed. Enter short description of the nature of the changes made", default="an update", show_default=True)
+        if interactive:
+            message = click.prompt("Files changed. Enter short description of the nature of the changes made", default="an update", show_default=True)
         try:
-            output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} commit -m "{msg}"')).decode()
+            repo.git('commit', '-m', message)
         except subprocess.CalledProcessError as e:        
             print(e.output.decode())
             raise click.Abort()
+
+    # commits from an earlier git up that were not pushed (e.g. still in
+    # the upload queue) are pushed too, even if nothing new is staged
+    if staged_changes or status.commits_ahead(repo_local_path):
+
+        if background:
+            # the commit replaces any autosave checkpoints, and the upload
+            # worker deletes pushed ones once the commit is pushed
+            autosave.finish(repo_local_path, remote=False)
+            uploads.enqueue(repo_local_path, remove_tracked_files and not dry_run, 
+                            ignore=cleaning['cleaned'])
+            secho("Changes committed. They are uploaded to GitLab in the background "
+                  "(see 'franklin git queue').", fg='yellow')
+            return 'queued'
         
         # pull
         # term.secho("Pulling changes from the remote repository.", fg='yellow')
-        merge_conflict = git_safe_pull(repo_local_path)
+        merge_conflict = git_safe_pull(repo_local_path, interactive=interactive)
         if merge_conflict:
-            sys.exit(1)
+            return 'conflicted'
         
         # push
         try:
-            output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} push')).decode()
+            network.call(repo.git, 'push')
         except subprocess.CalledProcessError as e:        
             print(e.output.decode())
             raise click.Abort()
 
-        term.secho(f"Changes uploaded to GitLab.", fg='yellow')
+        secho(f"Changes uploaded to GitLab.", fg='yellow')
+        outcome = 'pushed'
+
+        # the commit replaces any autosave checkpoints
+        autosave.finish(repo_local_path)
+
+        # keep the local mirror current so the next clone fetches less
+        mirrors.update_from_clone(repo_local_path)
     else:
-        term.secho("No changes to your local files.", fg='yellow')
+        secho("No changes to your local files.", fg='yellow')
+        outcome = 'unchanged'
+        autosave.finish(repo_local_path)
 
     # # Check the status to see if there are any upstream changes
     # status_output = subprocess.check_output(utils._cmd(f'git -C {repo_local_path} status')).decode()
@@ -313,88 +739,332 @@ def git_up(repo_local_path: str, remove_tracked_files: bool) -> None:
 
 
     if remove_tracked_files:
+        _remove_local_files(repo_local_path, dry_run, secho, ignore=set(cleaning['cleaned']))
 
-        try:
-            # output = subprocess.check_output(utils._cmd(f'git -C {repo_local_path} diff-index --quiet HEAD')).decode()
-            output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} status')).decode()
-        except subprocess.CalledProcessError as e:        
-            print(e.output.decode())
-            raise click.Abort()
+    return outcome
 
-        if 'nothing to commit, working tree clean' in output:
-            shutil.rmtree(repo_local_path)
-            term.secho("Local files removed.", fg='green')
 
-        elif 'nothing added to commit but untracked files present' in output:
+def find_exercise_repositories(directory: str, max_depth: int=2) -> List[str]:
+    """
+    Finds local clones of exercise repositories.
 
-            if merge_in_progress(repo_local_path):
-                term.secho("A merge is in progress. Local repository will not be removed.", fg='red')
-                return
+    Parameters
+    ----------
+    directory : 
+        Directory to search.
+    max_depth : 
+        How many directory levels below `directory` to search.
 
-            # Instead of deleting the repository dir, we prune all tracked files and 
-            # and resulting empty directories - in case there are 
-            path = os.path.join(repo_local_path, 'franklin.log')
-            if os.path.exists(path):
-                os.remove(path)
-            output = subprocess.check_output(utils.fmt_cmd(f'git -C {repo_local_path} ls-files')).decode()
-            tracked_dirs = set()
-            for line in output.splitlines():
-                path = os.path.join(repo_local_path, *(line.split('/')))
-                tracked_dirs.add(os.path.dirname(path))
-                os.remove(path)
-            # traverse repo bottom up and remove empty directories
-            subdirs = reversed([x[0] for x in os.walk(repo_local_path) if os.path.isdir(x[0])])
-            for subdir in subdirs:
-                if not os.listdir(subdir) and subdir in tracked_dirs:
-                    os.rmdir(subdir)
-            path = os.path.join(repo_local_path, '.git')
-            if os.path.exists(path):
-                shutil.rmtree(path)
-            if os.path.exists(repo_local_path) and not os.listdir(repo_local_path):
-                os.rmdir(repo_local_path)
-
-            term.secho(f"Local files removed.", fg='green')
+    Returns
+    -------
+    :
+        Paths to the local repositories.
+    """
+    remote_prefix = f'{cfg.gitlab_domain}:{cfg.gitlab_group}/'
+    repos = []
+    def search(path, depth):
+        if os.path.isdir(os.path.join(path, '.git')):
+            url = GitBackend(path).config_get('remote.origin.url')
+            if url and remote_prefix in url:
+                repos.append(path)
+            # do not descend into repositories
+            return
+        if depth == max_depth:
+            return
+        with os.scandir(path) as it:
+            subdirs = sorted(e.path for e in it if e.is_dir(follow_symlinks=False) and not e.name.startswith('.'))
+        for subdir in subdirs:
+            search(subdir, depth + 1)
+    search(str(directory), 0)
+    return repos
+
+
+def _run_all(func: Callable, jobs: Dict[str, Any], max_workers: int) -> Dict[str, str]:
+    # runs func on each job in a bounded thread pool and collects statuses
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(func, job): name for name, job in jobs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.debug(f"{name} failed: {e!r}")
+                results[name] = 'failed'
+    return results
+
+
+def print_summary(results: Dict[str, str]) -> None:
+    """
+    Prints a table of repositories and the outcome for each of them.
 
+    Parameters
+    ----------
+    results : 
+        Mapping of repository name to status.
+    """
+    colors = dict(pushed='green', cloned='green', updated='green', created='green', prewarmed='green', queued='yellow',
+                  conflicted='red', failed='red')
+    width = max([len(name) for name in results] + [10])
+    term.echo()
+    for name, outcome in sorted(results.items()):
+        if outcome in colors:
+            term.secho(f"  {name:<{width}}  {outcome}", fg=colors[outcome])
         else:
-            # term.secho("There are uncommitted changes. Please commit or stash them before removing local files.", fg='red')
-            term.secho("There are local changes to repository files. Local repository will not be removed.", fg='red')
-            return
-    
+            term.echo(f"  {name:<{width}}  {outcome}")
+    counts = {}
+    for outcome in results.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    term.echo()
+    term.echo(', '.join(f"{n} {outcome}" for outcome, n in sorted(counts.items())))
+
+
+def git_up_all(directory: str, remove_tracked_files: bool, message: str, 
+               max_workers: int=8, background: bool=False, validate: str=None) -> Dict[str, str]:
+    """
+    "Uploads" all exercise repositories found under a directory.
+
+    Parameters
+    ----------
+    directory : 
+        Directory with local exercise repositories.
+    remove_tracked_files : 
+        Whether to remove the tracked files after uploading
+    message : 
+        Commit message used for all repositories. Any "{repo}" in the 
+        message is replaced by the repository name.
+    max_workers : 
+        Maximum number of repositories processed at the same time.
+    background : 
+        Commit locally and push in the background.
+    validate : 
+        Notebook validation mode (see git_up).
+
+    Returns
+    -------
+    :
+        Mapping of repository name to upload status.
+    """
+    jobs = {os.path.basename(path): path for path in find_exercise_repositories(directory)}
+    if not jobs:
+        term.secho(f"No exercise repositories found in {directory}", fg='red')
+        return {}
+    term.echo(f"Uploading {len(jobs)} repositories")
+    # one process pool for all repositories, so validating them at the
+    # same time runs no more kernels than there are CPUs
+    with validation.validation_pool() as pool:
+        def upload(path):
+            msg = message.replace('{repo}', os.path.basename(path))
+            return git_up(path, remove_tracked_files, message=msg, background=background, 
+                          validate=validate, validation_pool=pool)
+        results = _run_all(upload, jobs, max_workers)
+    print_summary(results)
+    return results
+
+
+def git_down_all(course: str=None, directory: str=None, max_workers: int=8, 
+                 refresh: bool=False, partial_clone: bool=False) -> Dict[str, str]:
+    """
+    "Downloads" all exercises for a course.
+
+    Parameters
+    ----------
+    course : 
+        Course name. The user is asked to pick one if not given.
+    directory : 
+        Directory to clone into. Defaults to the current working directory.
+    max_workers : 
+        Maximum number of repositories processed at the same time.
+    refresh : 
+        Bypass the cached registry listing.
+    partial_clone : 
+        Make blob-filtered, shallow clones.
+
+    Returns
+    -------
+    :
+        Mapping of repository name to download status.
+    """
+    if course is None:
+        course, _ = pick_course(refresh)
+    exercises_images = cache.registry_listing(refresh)
+    jobs = {exercise.split('/')[-1]: exercise 
+            for (c, exercise) in exercises_images if c == course}
+    if not jobs:
+        term.secho(f"No exercises found for course '{course}'", fg='red')
+        return {}
+    term.echo(f"Downloading {len(jobs)} repositories")
+    def download(exercise):
+        outcome, _ = sync_exercise(course, exercise, directory, interactive=False, 
+                                   partial_clone=partial_clone)
+        return outcome
+    results = _run_all(download, jobs, max_workers)
+    print_summary(results)
+    return results
+
+
+def prewarm(course: str=None, refresh: bool=False, images: bool=True, 
+            max_workers: int=8, max_pulls: int=3) -> Dict[str, str]:
+    """
+    Fills the local caches with all exercises for a course.
+
+    The repositories are mirrored (see mirrors.prewarm) and the exercise
+    images pulled, so that later "git down" and "exercise edit" runs 
+    only fetch what has changed since.
 
-def git_status() -> None:
+    Parameters
+    ----------
+    course : 
+        Course name. The user is asked to pick one if not given.
+    refresh : 
+        Bypass the cached registry listing.
+    images : 
+        Also pull the exercise images.
+    max_workers : 
+        Maximum number of repositories fetched at the same time.
+    max_pulls : 
+        Maximum number of images pulled at the same time.
+
+    Returns
+    -------
+    :
+        Mapping of exercise name to status.
+    """
+    if course is None:
+        course, _ = pick_course(refresh)
+    # refreshing here also leaves the listing in the cache for later runs
+    exercises_images = cache.registry_listing(refresh=True)
+    jobs = {exercise.split('/')[-1]: (exercise, image) 
+            for (c, exercise), image in exercises_images.items() if c == course}
+    if not jobs:
+        term.secho(f"No exercises found for course '{course}'", fg='red')
+        return {}
+    if images and not containers.docker_ready():
+        term.secho("Docker is not running, so images are not pulled.", fg='red')
+        images = False
+
+    term.echo(f"Prewarming {len(jobs)} exercises")
+    pulls = threading.Semaphore(max_pulls)
+    def prewarm_exercise(job):
+        exercise, image_url = job
+        mirrors.prewarm(exercise_url(course, exercise.split('/')[-1]))
+        if images:
+            with pulls:
+                if not containers.ImagePull(image_url).wait():
+                    return 'failed'
+        return 'prewarmed'
+    results = _run_all(prewarm_exercise, jobs, max_workers)
+    mirrors.evict()
+    print_summary(results)
+    return results
+
+
+def git_status(repo_local_path: str=None, as_json: bool=False) -> Dict[str, Any]:
     """Displays the status of the local repository.
+
+    Parameters
+    ----------
+    repo_local_path : 
+        Path to the local repository. Defaults to the current working directory.
+    as_json : 
+        Print the status as JSON.
+
+    Returns
+    -------
+    :
+        The status as returned by status.repo_status with merge_in_progress added.
     """
-    pass
+    if repo_local_path is None:
+        repo_local_path = os.getcwd()
+    if not os.path.exists(os.path.join(repo_local_path, '.git')):
+        term.secho(f"{repo_local_path} is not a git repository", fg='red')
+        return
 
-@with_plugins(iter_entry_points('franklin.git.plugins'))
-@click.group(cls=utils.AliasedGroup)
+    repo_status = status.repo_status(repo_local_path)
+    repo_status['merge_in_progress'] = merge_in_progress(repo_local_path)
+
+    if as_json:
+        click.echo(json.dumps(repo_status, indent=2))
+        return repo_status
+
+    branch = repo_status['branch']
+    if repo_status['upstream']:
+        branch += f" (ahead {repo_status['ahead']}, behind {repo_status['behind']})"
+    term.echo(f"Branch: {branch}")
+    if repo_status['merge_in_progress']:
+        term.secho("A merge is in progress.", fg='red')
+    for key, label, color in [('conflicted', 'Conflicting files', 'red'), 
+                              ('modified', 'Changed files', 'yellow'), 
+                              ('untracked', 'New files (not in git)', None)]:
+        if repo_status[key]:
+            term.echo(f"{label}:")
+            for path in repo_status[key]:
+                if color:
+                    term.secho(f"  {path}", fg=color)
+                else:
+                    term.echo(f"  {path}")
+    if not (repo_status['modified'] or repo_status['untracked'] or repo_status['conflicted']):
+        term.secho("No changes to local files.", fg='green')
+    image = repo_status['image']
+    if image and image['stale']:
+        term.secho("The local exercise image is older than the latest changes on GitLab.", fg='yellow')
+    return repo_status
+
+@click.group(cls=plugins.LazyPluginGroup, plugin_group='franklin.git.plugins')
 def git():
     """GitLab commands.
     """
-    pass
+    ssh.enable_multiplexing()
 
-@git.command()
+@git.command('status')
+@click.option('-d', '--directory', default=None)
+@click.option('--json', 'as_json', is_flag=True, help='Output status as JSON.')
 @utils.crash_report
-def status():
+@trace.profiled
+def _status(directory, as_json):
     """Status of local repository.
     """
-    git_status()
+    git_status(directory, as_json)
 
 @git.command()
+@click.option('--all', 'all_exercises', is_flag=True, help='Download all exercises for a course.')
+@click.option('--course', default=None, help='Course to download exercises for (with --all).')
+@click.option('-d', '--directory', default=None)
+@click.option('-j', '--jobs', default=8, show_default=True, help='Repositories processed in parallel (with --all).')
+@click.option('--refresh', is_flag=True, help='Bypass the cached exercise listing.')
+@click.option('--partial', 'partial_clone', is_flag=True, help='Clone without history and file contents not needed.')
+@click.option('--find', default=None, help='Only offer exercises matching these words.')
+@click.option('--name', default=None, help='Exercise to download, as "exercise" or "course/exercise".')
 @utils.crash_report
-def down():
+@trace.profiled
+def down(all_exercises, course, directory, jobs, refresh, partial_clone, find, name):
     """Safely git clone or pull from the remote repository.
     
     Convenience function for adding, committing, and pushing changes to the remote repository.    
     """
-    git_down()
+    # also run as franklin exercise down, without the git group callback
+    ssh.enable_multiplexing()
+    with backend.count_processes('git down'):
+        if all_exercises:
+            git_down_all(course, directory, max_workers=jobs, refresh=refresh, 
+                         partial_clone=partial_clone)
+        else:
+            git_down(refresh, partial_clone, find=find, name=name)
 
 
 @git.command()
 @click.option('-d', '--directory', default=None)
 @click.option('--remove/--no-remove', default=True, show_default=True)
+@click.option('--all', 'all_repos', is_flag=True, help='Upload all exercise repositories in the directory.')
+@click.option('-m', '--message', default=None, help='Commit message. "{repo}" is replaced by the repository name.')
+@click.option('-j', '--jobs', default=8, show_default=True, help='Repositories processed in parallel (with --all).')
+@click.option('--dry-run', is_flag=True, help='Report which local files would be removed instead of removing them.')
+@click.option('--background', is_flag=True, help='Commit now and push in the background.')
+@click.option('--validate', type=click.Choice(validation.MODES), default=None, 
+              help='Run changed notebooks before committing. Defaults to the validate setting in franklin.yml.')
 @utils.crash_report
-def up(directory, remove):
+@trace.profiled
+def up(directory, remove, all_repos, message, jobs, dry_run, background, validate):
     """Safely add, commit, push and remove if possible.
     """
     if not check_ssh_set_up():
@@ -403,7 +1073,43 @@ def up(directory, remove):
         directory = os.getcwd()
     if utils.system() == 'Windows':
         directory = PureWindowsPath(directory)
-    git_up(directory, remove)
+    with backend.count_processes('git up'):
+        if all_repos:
+            if message is None:
+                message = click.prompt("Enter short description of the changes made (used for all repositories)", default="an update", show_default=True)
+            results = git_up_all(directory, remove, message, max_workers=jobs, 
+                                 background=background, validate=validate)
+            if {'conflicted', 'failed'} & set(results.values()):
+                sys.exit(1)
+        elif git_up(directory, remove, message=message, dry_run=dry_run, 
+                    background=background, validate=validate) in ('conflicted', 'failed'):
+            sys.exit(1)
+
+
+@git.command()
+@click.option('--retry', is_flag=True, help='Queue failed uploads again.')
+@utils.crash_report
+def queue(retry):
+    """Uploads waiting to be pushed in the background.
+    """
+    if retry:
+        term.echo(f"{uploads.retry_failed()} failed uploads queued again.")
+    jobs = uploads.jobs()
+    if not jobs:
+        term.echo("No uploads in the queue.")
+        return
+    for job in jobs:
+        if job['state'] == 'failed':
+            term.secho(f"  {job['path']}  failed after {job['attempts']} attempts", fg='red')
+            if job['last_error'] == 'conflict':
+                term.echo("    Conflicts with changes on GitLab. Run 'franklin git up' in the repository to resolve them.")
+            elif job['last_error']:
+                term.echo(f"    {job['last_error'].splitlines()[-1]}")
+        else:
+            wait = max(0, job['next_attempt'] - time.time())
+            term.secho(f"  {job['path']}  pending, next attempt in {wait:.0f}s", fg='yellow')
+    if any(job['state'] == 'pending' for job in jobs) and not uploads.worker_running():
+        uploads.start_worker()
 
 @git.command()
 @utils.crash_report
@@ -417,96 +1123,188 @@ def ui():
     if not check_ssh_set_up():
         ssh_keygen()
 
-    subprocess.run(utils.fmt_cmd(f'gitui'), check=False)
+    backend.run_interactive(utils.fmt_cmd(f'gitui'))
 
 
 @click.group(cls=utils.AliasedGroup)
 def exercise():
     """Convenience command for full edit workflow.
     """
-    if not check_ssh_set_up():
-        ssh_keygen()
 
 
-def create_repository_from_template(course, repo_name):
+def exercise_url(course: str, repo_name: str) -> str:
+    return f'git@{cfg.gitlab_domain}:{cfg.gitlab_group}/{course}/{repo_name}.git'
+
+
+def create_repository_from_template(course, repo_name, title=None):
+    """
+    Creates an exercise repository on GitLab from the exercise template.
+
+    The template commit is built first, so no project is left empty on
+    GitLab if that fails. The project is then created through the 
+    GitLab API and the commit pushed to it.
+
+    Parameters
+    ----------
+    course : 
+        Course name.
+    repo_name : 
+        Name of the new repository.
+    title : 
+        Title of the exercise (the project description).
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        template_repo = os.path.join(tmp_dir, 'template.git')
+        templates.build_template_repository(template_repo)
+        api.create_project(course, repo_name, description=title)
+        templates.push_new_repository(template_repo, exercise_url(course, repo_name))
+
 
-    repo_dir = os.path.join(tempfile.gettempdir(), repo_name)
-    repo_template_files = [p.name for p in importlib_resources.files().joinpath('data/repo_templates/exercise').iterdir()]
+def create_exercises_from_manifest(manifest: str, refresh: bool=False, 
+                                   max_workers: int=4) -> Dict[str, str]:
+    """
+    Creates the exercise repositories listed in a manifest.
 
-    os.makedirs(repo_dir, exist_ok=False)
-    for path in repo_template_files:
-        if path.is_file():
-            shutil.copy(path, os.path.join(repo_dir, path.name))
-        # else:
-        #     shutil.copytree(path, os.path.join(repo_dir, path.name))
+    The template commit is built once. The projects are then created
+    through the GitLab API and the commit pushed to them, a bounded 
+    number at a time.
 
-    utils.run_cmd('git -C repo init --initial-branch=main')
-    utils.run_cmd(f'git -C repo remote add origin git@{cfg.gitlab_domain}:{cfg.gitlab_group}/{course}/{repo_name}.git')
-    utils.run_cmd('git -C repo add .')
-    utils.run_cmd('git -C repo commit -m "Initial commit"')
-    utils.run_cmd('git -C repo push -u origin main')
+    Parameters
+    ----------
+    manifest : 
+        Path to the manifest (see templates.read_manifest).
+    refresh : 
+        Bypass the cached course listing.
+    max_workers : 
+        Maximum number of repositories created at the same time.
 
-    shutil.rmtree(repo_dir)
+    Returns
+    -------
+    :
+        Mapping of course/repository to status.
+    """
+    try:
+        exercises = templates.read_manifest(manifest)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    courses = cache.course_names(refresh)
+    unknown = sorted(set(course for course, _, _ in exercises if course not in courses))
+    if unknown:
+        raise click.ClickException(f"Unknown courses in {manifest}: {', '.join(unknown)}")
+
+    term.echo(f"Creating {len(exercises)} exercise repositories")
+    network.spread_start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        template_repo = os.path.join(tmp_dir, 'template.git')
+        templates.build_template_repository(template_repo)
+        jobs = {f'{course}/{name}': (course, name, title) for course, name, title in exercises}
+        def create(job):
+            course, name, title = job
+            api.create_project(course, name, description=title)
+            network.call(templates.push_new_repository, template_repo, exercise_url(course, name))
+            return 'created'
+        results = _run_all(create, jobs, max_workers)
+    print_summary(results)
+    return results
 
 
 @exercise.command('create')
+@click.option('--refresh', is_flag=True, help='Bypass the cached course listing.')
+@click.option('--from', 'manifest', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='Create all exercises listed in a YAML manifest.')
+@click.option('-j', '--jobs', default=4, show_default=True, help='Repositories created in parallel (with --from).')
 @utils.crash_report
-def create_exercise():
+@gitlab_ssh
+def create_exercise(refresh, manifest, jobs):
     """
     Create a new exercise repository for a course.
 
-    Parameters
-    ----------
-    course : 
-        Course name.
-    new_repo_name : 
-        Name of the new repository.
+    With --from, the exercises listed in a manifest are created without 
+    prompting. The manifest is a YAML file like this:
+
+    \b
+    course: mycourse
+    exercises:
+      - exercise1
+      - name: exercise2
+        title: Exercise 2
     """
+    if manifest is not None:
+        results = create_exercises_from_manifest(manifest, refresh, max_workers=jobs)
+        if 'failed' in results.values():
+            sys.exit(1)
+        return
 
-    course, danish_course_name = gitlab.pick_course()
+    course, danish_course_name = pick_course(refresh)
 
     term.echo(f"You will creating a new exercise for course:\n'{danish_course_name}'")
     click.confirm(f"Do you want to continue?", default=True)
 
-    def validate_repo_name(name):
-        return name and name[0].isalpha() and re.match(r'^[\w-]+$', name) is not None
-
     repo_name = None
-    while not validate_repo_name(repo_name):
+    while not templates.valid_repo_name(repo_name):
         repo_name = click.prompt("Enter the name of the new exercise repository. The name must start with a letter and can only contain letters, numbers, underscores and dashes:")
-        if not validate_repo_name(repo_name):
+        if not templates.valid_repo_name(repo_name):
             term.secho("Invalid repository name. Please try again.", fg='red')
 
-    create_repository_from_template(course, repo_name)
+    title = click.prompt('Enter the (brief) title of the exercise. To hide the exercise from students, include "HIDDEN" in the title')
 
-    term.secho(f"Created new repository", fg='green')
+    create_repository_from_template(course, repo_name, title)
 
-    term.echo(f"The GitLab settings page will open in your browser.")
-    term.echo(f'You only need to add the (brief) title of the exercise in the "Project description" field and click "save"')
-    term.echo(f'(If you want to hide the exercise from students, you add "HIDDEN" to the title.)')
+    term.secho(f"Created new repository", fg='green')
     term.echo('')
     term.echo('You can now use the "franklin exercise edit" command to edit the exercise.')
-    time.sleep(2)
 
-    repo_settings_gitlab_url = f'https://git@{cfg.gitlab_domain}:{cfg.gitlab_group}/{course}/{repo_name}/edit'
 
-    webbrowser.open(repo_settings_gitlab_url, new=1)
+@click.command('prewarm')
+@click.option('--course', default=None, help='Course to prewarm. You are asked to pick one if not given.')
+@click.option('--images/--no-images', default=True, show_default=True, help='Also pull the exercise images.')
+@click.option('-j', '--jobs', default=8, show_default=True, help='Repositories fetched in parallel.')
+@click.option('--refresh', is_flag=True, help='Bypass the cached course listing.')
+@utils.crash_report
+@trace.profiled
+def prewarm_course(course, images, jobs, refresh):
+    """Download all exercises and images for a course ahead of time.
 
+    Run this before a lab session (e.g. from a scheduled job). Later 
+    "exercise edit" and "git down" runs then reuse the local copies and 
+    only download what has changed since.
+    """
+    ssh.enable_multiplexing()
+    with backend.count_processes('exercise prewarm'):
+        results = prewarm(course, refresh, images=images, max_workers=jobs)
+    if 'failed' in results.values():
+        sys.exit(1)
 
-    # ssh git@gitlab.au.dk personal_access_token GITLAB-API-TMP api,write_repository 1
 
-    # s = requests.Session()
-    # s.headers.update({'PRIVATE-TOKEN': '<token>'})
-    # url = f'{GITLAB_API_URL}/projects?name={new_repo_name}&namespace_id={GITLAB_GROUP}%2F{course_name}'
-    # r  = s.post(url, headers={ "Content-Type" : "application/json"})
-    # if not r.ok:
-    #     r.raise_for_status()
-    # term.secho(f"New repository '{new_repo_name}' created for '{course_name}'.", fg='green')
+def _edit_in_warm_container(container: Dict[str, Any], repo_local_path: str) -> None:
+    # opens JupyterLab in a warm container and waits for the user to finish
+    import webbrowser
+    address = warm.url(container, repo_local_path)
+    webbrowser.open(address)
+    term.echo(f"JupyterLab is running at {address}")
+    term.secho("Press Q when you are done editing.", fg='green')
+    while click.getchar().lower() != 'q':
+        pass
 
 
 @exercise.command('edit')
+@click.option('--refresh', is_flag=True, help='Bypass the cached exercise listing.')
+@click.option('--partial', 'partial_clone', is_flag=True, help='Clone without history and file contents not needed.')
+@click.option('--background', is_flag=True, help='Push changes in the background when Jupyter is closed.')
+@click.option('--validate', type=click.Choice(validation.MODES), default=None, 
+              help='Run changed notebooks before committing. Defaults to the validate setting in franklin.yml.')
+@click.option('--warm', 'keep_warm', is_flag=True, help='Keep the Jupyter container running for the next edit cycle.')
+@click.option('--idle', 'idle_minutes', default=warm.IDLE_MINUTES, show_default=True, 
+              help='Minutes a warm container is kept after the edit cycle (with --warm).')
+@click.option('--find', default=None, help='Only offer exercises matching these words.')
+@click.option('--name', default=None, help='Exercise to edit, as "exercise" or "course/exercise".')
+@click.option('--autosave', 'autosave_changes', is_flag=True, help='Record changes as local checkpoint commits while Jupyter runs.')
+@click.option('--autosave-push', is_flag=True, help='Also push the checkpoints in the background (implies --autosave).')
 @utils.crash_report
-def edit_cycle():
+@trace.profiled
+@gitlab_ssh
+def edit_cycle(refresh, partial_clone, background, validate, keep_warm, idle_minutes, find, name,
+               autosave_changes, autosave_push):
     """Edit exercise in JupyterLab
 
     The command runs a full cycle of downloading the exercise from GitLab,
@@ -516,10 +1314,11 @@ def edit_cycle():
     The workflow goes through the following steps:
 
     \b
-    1. Clone the exercise from GitLab.
-    2. Download the exercise docker image.
-    3. Start the docker container.
-    4. Launch Jupyter in the local repository folder.
+    1. Select the exercise.
+    2. Clone the exercise from GitLab while Docker starts.
+    3. Download the exercise docker image.
+    4. Start the docker container and launch Jupyter in the local 
+       repository folder.
     5. [The user can now edit the exercise in JupyterLab]
     6. When Jupyter is shut down (by pressing Q), modified files 
        will be added to git.
@@ -529,28 +1328,124 @@ def edit_cycle():
        of the exercise docker image is generated.
     9. The local repository is removed to avoid future merge conflicts.
 
+    With --warm, the container is kept running for a while after the 
+    cycle, and the next cycle with the same exercise image uses it instead 
+    of starting a new one. The exercise is then cloned into franklin's 
+    workspace directory, the only directory the container can see.
+
+    With --autosave, saved changes are recorded as checkpoint commits 
+    while Jupyter runs, so step 6 has less left to do. The checkpoints 
+    are replaced by the single commit made in step 8.
+
     NB: Problems may arise if an exercise has more than one ongoing/incomplete 
     edit-cycle at the same time. The best way to avoid this is to complete
     each edit-cycle in one sitting.
     """
-    utils.check_internet_connection()
-
-    if not os.environ.get('DEVEL', None):
-        update.update_client()
-
-    utils.check_free_disk_space()
-
-    logger.debug('Starting Docker Desktop')
-    docker.failsafe_start_docker_desktop()
-    time.sleep(2)
-
-    with utils.DelayedKeyboardInterrupt():
-        image_url, repo_local_path = git_down()
-        jupyter.launch_jupyter(image_url, cwd=os.path.basename(repo_local_path))
-        git_up(repo_local_path, remove_tracked_files=True)
+    from franklin import docker
+    from franklin import jupyter
+    from franklin import update
+
+    def update_client():
+        if not os.environ.get('DEVEL', None):
+            update.update_client()
+
+    def start_docker():
+        logger.debug('Starting Docker Desktop')
+        docker.failsafe_start_docker_desktop()
+        containers.wait_for_docker()
+
+    with utils.DelayedKeyboardInterrupt(), backend.count_processes('exercise edit'):
+        # selection is the only interactive step, so it goes first and the
+        # remaining start-up steps run concurrently
+        with trace.phase('select'):
+            course, exercise, image_url = select_exercise(refresh, find=find, name=name)
+
+        # exercises edited in a warm container are cloned into its 
+        # workspace, the only directory the container can see
+        directory = str(warm.workspace()) if keep_warm else None
+
+        # questions about an existing clone are asked here, as the clone
+        # task runs in the background with the progress line showing
+        existing = local_repository_path(exercise, directory)
+        if os.path.exists(existing) and not network.clone_incomplete(existing):
+            finish_any_merge_in_progress(existing)
+            if merge_in_progress(existing):
+                return
+            term.echo(f"The repository '{os.path.basename(existing)}' already exists at {existing}.")
+            if not click.confirm('\nDo you want to update the existing repository?', default=True):
+                raise click.Abort()
+
+        # the image is pulled while the repository is cloned, as the two
+        # are usually the largest downloads
+        image_pull = None
+        def pull_image():
+            nonlocal image_pull
+            image_pull = containers.ImagePull(image_url)
+
+        clone_done = threading.Event()
+        def clone():
+            try:
+                return sync_exercise(course, exercise, directory=directory, 
+                                     partial_clone=partial_clone, interactive=False)
+            except subprocess.CalledProcessError as e:
+                # the task runs without output, so git's error is shown here
+                raise click.ClickException(f"Failed to update the local repository:\n"
+                                           f"{e.output.decode(errors='replace').strip()}")
+            finally:
+                clone_done.set()
+
+        repo_objects = existing
+        def clone_status():
+            if clone_done.is_set():
+                return 'done'
+            return f"{partial.objects_size(repo_objects) / 1024**2:.1f} MB"
+        def image_status():
+            return image_pull.status() if image_pull else 'waiting for Docker'
+
+        with pipeline.progress({'Repository': clone_status, 'Image': image_status}):
+            results = pipeline.run_tasks({
+                'internet': (utils.check_internet_connection, []),
+                'update': (update_client, ['internet']),
+                'disk': (utils.check_free_disk_space, []),
+                'docker': (start_docker, []),
+                'pull': (pull_image, ['docker']),
+                'clone': (clone, ['internet']),
+            })
+            clone_outcome, repo_local_path = results['clone']
+            with trace.phase('image'):
+                image_pull.wait()
+        if clone_outcome == 'conflicted':
+            report_conflicts(repo_local_path)
+            return
+        term.secho(f"Local repository {clone_outcome}.", fg='green')
+        container = None
+        if keep_warm:
+            term.echo(f"The exercise is in {repo_local_path}")
+            with trace.phase('container'):
+                container = warm.acquire(image_url)
+        try:
+            if autosave_changes or autosave_push:
+                session = autosave.watching(repo_local_path, push=autosave_push)
+            else:
+                session = nullcontext()
+            with trace.phase('jupyter'), session:
+                if container is not None:
+                    _edit_in_warm_container(container, repo_local_path)
+                else:
+                    jupyter.launch_jupyter(image_url, cwd=os.path.basename(repo_local_path))
+            with trace.phase('upload'):
+                outcome = git_up(repo_local_path, remove_tracked_files=True, background=background, 
+                                 validate=validate)
+        finally:
+            if container is not None:
+                warm.release(container, idle_minutes)
+        if outcome == 'conflicted':
+            term.secho("There was a merge conflict. Please resolve it and run 'franklin git up'.", fg='red')
+            sys.exit(1)
+        if outcome == 'failed':
+            term.secho("Your changes were not uploaded. Fix the problems above and run 'franklin git up'.", fg='red')
+            sys.exit(1)
 
-        # term.secho("There was a merge conflict. Please resolve it and run 'franklin git up.", fg='red')
-        
 
 # ###########################################################
 # # Group alias "exercise" the status, down and up  commands 
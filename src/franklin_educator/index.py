@@ -0,0 +1,269 @@
+import re
+import time
+import sqlite3
+import threading
+from difflib import SequenceMatcher
+from contextlib import closing
+from typing import Tuple, List, Dict, Any, Optional
+
+from franklin.logger import logger
+
+from . import api
+from . import cache
+from .cache import cache_dir
+
+# Seconds before the index is updated in the background
+INDEX_TTL = cache.REGISTRY_TTL
+
+# Similarity needed for a query word to match a misspelled word
+FUZZY_RATIO = 0.75
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS courses (
+    course TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exercises (
+    course TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    image TEXT,
+    title TEXT,
+    last_activity TEXT,
+    PRIMARY KEY (course, exercise)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+_updating = None
+_updating_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    db = sqlite3.connect(cache_dir() / 'exercises.sqlite', timeout=10)
+    db.row_factory = sqlite3.Row
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _meta(db: sqlite3.Connection, key: str) -> Optional[str]:
+    row = db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return row['value'] if row else None
+
+
+def _set_meta(db: sqlite3.Connection, key: str, value: Any) -> None:
+    db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+
+def update(full: bool=False) -> None:
+    """
+    Updates the index from GitLab.
+
+    Images come from the registry listing and course names from the
+    course listing, both revalidated with conditional requests. Titles
+    and last activity times come from the projects, of which only those
+    active since the last update are fetched. Only rows that changed are
+    written.
+
+    Parameters
+    ----------
+    full :
+        Fetch all projects, not only those active since the last update.
+    """
+    images = cache.registry_listing(refresh=True)
+    try:
+        courses = cache.course_names(refresh=True)
+    except Exception as e:
+        # course names and titles only make the index nicer to search
+        logger.debug(f"Could not list courses: {e!r}")
+        courses = {}
+    with closing(_connect()) as db, db:
+        since = None if full else _meta(db, 'projects_since')
+        try:
+            projects = api.projects(since)
+        except Exception as e:
+            logger.debug(f"Could not list projects: {e!r}")
+            projects = []
+
+        known = {(row['course'], row['exercise']): row['image']
+                 for row in db.execute('SELECT course, exercise, image FROM exercises')}
+        for key in known.keys() - images.keys():
+            if known[key] is not None:
+                db.execute('UPDATE exercises SET image = NULL WHERE course = ? AND exercise = ?', key)
+        for (course, exercise), image in images.items():
+            if known.get((course, exercise), '') != image:
+                db.execute('INSERT INTO exercises (course, exercise, image) VALUES (?, ?, ?) '
+                           'ON CONFLICT (course, exercise) DO UPDATE SET image = excluded.image',
+                           (course, exercise, image))
+        for project in projects:
+            db.execute('INSERT INTO exercises (course, exercise, title, last_activity) VALUES (?, ?, ?, ?) '
+                       'ON CONFLICT (course, exercise) DO UPDATE SET '
+                       'title = excluded.title, last_activity = excluded.last_activity',
+                       (project['course'], project['name'], project['title'], project['last_activity']))
+        for course, name in courses.items():
+            db.execute('INSERT OR REPLACE INTO courses (course, name) VALUES (?, ?)', (course, name))
+
+        latest = max((p['last_activity'] for p in projects if p['last_activity']), default=since)
+        if latest:
+            _set_meta(db, 'projects_since', latest)
+        _set_meta(db, 'updated', time.time())
+
+
+def _update_in_background() -> None:
+    global _updating
+    def target():
+        global _updating
+        try:
+            update()
+        except Exception as e:
+            logger.debug(f"Background update of the exercise index failed: {e!r}")
+        finally:
+            with _updating_lock:
+                _updating = None
+    with _updating_lock:
+        if _updating is not None:
+            return
+        _updating = threading.Thread(target=target, daemon=True)
+    _updating.start()
+
+
+def ensure(refresh: bool=False) -> None:
+    """
+    Makes sure the index can be used.
+
+    An empty index is filled before returning. A stale one is used as it
+    is and updated in the background.
+
+    Parameters
+    ----------
+    refresh :
+        Update the index before returning.
+    """
+    with closing(_connect()) as db:
+        updated = _meta(db, 'updated')
+    if refresh or updated is None:
+        update()
+    elif time.time() - float(updated) > INDEX_TTL:
+        _update_in_background()
+
+
+def exercises() -> List[Dict[str, Any]]:
+    """
+    Exercises with an image, from the index.
+
+    Returns
+    -------
+    :
+        List of exercises with course, course_name, exercise, image,
+        title and last_activity, most recently active first.
+    """
+    with closing(_connect()) as db:
+        rows = db.execute('SELECT e.course, c.name AS course_name, e.exercise, e.image, '
+                          'e.title, e.last_activity FROM exercises e '
+                          'LEFT JOIN courses c ON c.course = e.course '
+                          'WHERE e.image IS NOT NULL '
+                          'ORDER BY e.last_activity DESC, e.course, e.exercise').fetchall()
+    return [dict(row) for row in rows]
+
+
+def images() -> Dict[Tuple[str, str], str]:
+    """
+    Docker images for the exercises, from the index.
+
+    Returns
+    -------
+    :
+        Mapping of (course, exercise) to image url.
+    """
+    return {(row['course'], row['exercise']): row['image'] for row in exercises()}
+
+
+def courses() -> Dict[str, str]:
+    """
+    Courses from the index.
+
+    Returns
+    -------
+    :
+        Mapping of course name to full course name.
+    """
+    with closing(_connect()) as db:
+        return {row['course']: row['name'] for row in db.execute('SELECT course, name FROM courses')}
+
+
+def lookup(name: str) -> List[Dict[str, Any]]:
+    """
+    Exercises with a given name.
+
+    Parameters
+    ----------
+    name :
+        Exercise name, optionally prefixed by the course, e.g.
+        "regression" or "mycourse/regression".
+
+    Returns
+    -------
+    :
+        Matching exercises (more than one if the name is used in
+        several courses).
+    """
+    course, _, exercise = name.rpartition('/')
+    return [row for row in exercises()
+            if row['exercise'].lower() == exercise.lower()
+            and (not course or row['course'].lower() == course.lower())]
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.split(r'[\W_]+', text.lower()) if word]
+
+
+def _score(query: List[str], row: Dict[str, Any]) -> float:
+    # every query word must occur in the course, exercise name or title,
+    # as a whole word (3), part of a word (2) or misspelled (1)
+    text = ' '.join(filter(None, [row['course'], row['course_name'], row['exercise'], row['title']])).lower()
+    words = _words(text)
+    score = 0.0
+    for token in query:
+        if token in words:
+            score += 3
+        elif token in text:
+            score += 2
+        else:
+            best = 0.0
+            for word in words:
+                matcher = SequenceMatcher(None, token, word)
+                if matcher.real_quick_ratio() >= FUZZY_RATIO and matcher.quick_ratio() >= FUZZY_RATIO:
+                    best = max(best, matcher.ratio())
+            if best < FUZZY_RATIO:
+                return 0.0
+            score += best
+    if ' '.join(query) == ' '.join(_words(row['exercise'])):
+        score += 10
+    return score
+
+
+def search(query: str, limit: int=20) -> List[Dict[str, Any]]:
+    """
+    Finds exercises by fuzzy matching against courses, names and titles.
+
+    Parameters
+    ----------
+    query :
+        Search words. Words may be misspelled or only part of a word.
+    limit :
+        Maximum number of results.
+
+    Returns
+    -------
+    :
+        Matching exercises (see exercises), best match first.
+    """
+    words = _words(query)
+    if not words:
+        return []
+    scored = [(score, row) for row in exercises() if (score := _score(words, row)) > 0]
+    # sorted is stable, so equal scores keep the most recently active first
+    scored.sort(key=lambda item: -item[0])
+    return [row for _, row in scored[:limit]]
@@ -0,0 +1,242 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import Tuple, List
+
+from franklin.logger import logger
+
+from . import backend
+from . import network
+from . import partial
+from .backend import GitBackend
+from .cache import cache_dir
+
+# Total size of the mirror cache before least recently used mirrors are evicted
+MIRROR_CACHE_SIZE = 5 * 1024**3
+
+# Touched whenever a mirror is used, so eviction can find the least recently used
+_STAMP = 'franklin-last-used'
+
+
+def course_and_repo(clone_url: str) -> Tuple[str, str]:
+    """
+    Course and repository name from the url of an exercise repository.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository, e.g. git@gitlab.au.dk:group/course/repo.git
+
+    Returns
+    -------
+    :
+        Course name ('_' if the url has none) and repository name.
+    """
+    if '://' in clone_url:
+        path = urlparse(clone_url).path
+    else:
+        path = clone_url.split(':', 1)[-1]
+    parts = path.strip('/').split('/')
+    repo_name = parts[-1].removesuffix('.git')
+    course = parts[-2] if len(parts) > 1 else '_'
+    return course, repo_name
+
+
+def mirror_path(clone_url: str) -> Path:
+    """
+    Path to the local mirror of a remote repository.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+
+    Returns
+    -------
+    :
+        Path to the bare mirror repository (which may not exist yet).
+    """
+    course, repo_name = course_and_repo(clone_url)
+    return cache_dir('mirrors', course) / f'{repo_name}.git'
+
+
+def _touch(mirror: Path) -> None:
+    (mirror / _STAMP).touch()
+
+
+def clone(clone_url: str, repo_local_path: str) -> bool:
+    """
+    Clones a repository, reusing objects from the local mirror if there is one.
+
+    The clone is made from the mirror, with objects hardlinked where
+    possible, and then only objects that are new on the remote are
+    fetched. Because objects are linked rather than borrowed through
+    alternates, removing a mirror never breaks existing clones.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    repo_local_path :
+        Path of the new local repository.
+
+    Returns
+    -------
+    :
+        True if the clone was made from the mirror.
+    """
+    mirror = mirror_path(clone_url)
+    if not (mirror / 'HEAD').exists() or network.clone_incomplete(repo_local_path):
+        network.clone(clone_url, repo_local_path)
+        return False
+
+    _touch(mirror)
+    logger.debug(f"Cloning from mirror {mirror}")
+    try:
+        backend.run(['git', 'clone', '--local', str(mirror), repo_local_path])
+        repo = GitBackend(repo_local_path)
+        repo.git('remote', 'set-url', 'origin', clone_url)
+        network.call(repo.git, 'fetch', '--prune', 'origin')
+        repo.git('merge', '--ff-only', '@{upstream}')
+    except subprocess.CalledProcessError as e:
+        # the mirror is just a cache, so clone from the remote instead
+        logger.debug(f"Clone from mirror {mirror} failed: {e.output.decode(errors='replace')}")
+        shutil.rmtree(repo_local_path, ignore_errors=True)
+        network.clone(clone_url, repo_local_path)
+        return False
+    return True
+
+
+def update_from_clone(repo_local_path: str) -> None:
+    """
+    Updates (or creates) the mirror of a repository from a local clone.
+
+    Only local operations are involved. Failures are logged and ignored,
+    since the mirror is just a cache.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    """
+    repo = GitBackend(repo_local_path)
+    clone_url = repo.config_get('remote.origin.url')
+    if not clone_url or partial.is_partial(repo_local_path):
+        return
+    mirror = mirror_path(clone_url)
+    try:
+        if not (mirror / 'HEAD').exists():
+            # made next to the final location so a failure leaves no 
+            # half-made mirror behind
+            tmp = mirror.with_name(mirror.name + '.tmp')
+            shutil.rmtree(tmp, ignore_errors=True)
+            try:
+                # objects are hardlinked, and the local branches copied by 
+                # the clone are replaced by the remote branches below
+                backend.run(['git', 'clone', '--bare', '--local', os.path.abspath(repo_local_path), str(tmp)])
+                _update_refs(GitBackend(tmp), repo)
+                os.replace(tmp, mirror)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            _update_refs(GitBackend(mirror), repo)
+        _touch(mirror)
+    except subprocess.CalledProcessError as e:
+        logger.debug(f"Could not update mirror {mirror}: {e.output.decode()}")
+        return
+    evict(keep=mirror)
+
+
+def _update_refs(mirror: GitBackend, repo: GitBackend) -> None:
+    # The mirror only gets the remote-tracking branches of the clone, so
+    # local commits that may never be pushed do not end up in clones made
+    # from the mirror (where they would prevent fast-forwards).
+    mirror.git('fetch', '--prune', os.path.abspath(repo.repo_local_path),
+               '+refs/remotes/origin/*:refs/heads/*', '^refs/remotes/origin/HEAD')
+    head = repo.git('symbolic-ref', '--quiet', 'refs/remotes/origin/HEAD', check=False).strip()
+    if head.startswith('refs/remotes/origin/'):
+        mirror.git('symbolic-ref', 'HEAD', 'refs/heads/' + head[len('refs/remotes/origin/'):])
+
+
+def prewarm(clone_url: str) -> str:
+    """
+    Creates or updates the mirror of a repository directly from the remote.
+
+    Used to fill the cache ahead of time, so later clones of the
+    repository only fetch what has changed since.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+
+    Returns
+    -------
+    :
+        'cloned' if the mirror was created, 'updated' if it existed.
+    """
+    mirror = mirror_path(clone_url)
+    if (mirror / 'HEAD').exists():
+        network.call(GitBackend(mirror).git, 'fetch', '--prune', clone_url, '+refs/heads/*:refs/heads/*')
+        status = 'updated'
+    else:
+        # cloned next to the final location so a failed clone leaves no
+        # half-made mirror behind
+        tmp = mirror.with_name(mirror.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            network.call(backend.run, ['git', 'clone', '--bare', '--quiet', clone_url, str(tmp)])
+            os.replace(tmp, mirror)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        status = 'cloned'
+    _touch(mirror)
+    return status
+
+
+def _tree_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def evict(max_size: int=MIRROR_CACHE_SIZE, keep: Path=None) -> List[Path]:
+    """
+    Removes least recently used mirrors until the cache is below a size limit.
+
+    Parameters
+    ----------
+    max_size :
+        Maximum total size of mirrors in bytes.
+    keep :
+        Mirror that is never evicted (usually the one just used).
+
+    Returns
+    -------
+    :
+        Paths of the removed mirrors.
+    """
+    mirrors = []
+    for mirror in cache_dir('mirrors').glob('*/*.git'):
+        stamp = mirror / _STAMP
+        last_used = stamp.stat().st_mtime if stamp.exists() else 0
+        mirrors.append((last_used, mirror, _tree_size(mirror)))
+    total = sum(size for _, _, size in mirrors)
+    removed = []
+    for _, mirror, size in sorted(mirrors):
+        if total <= max_size:
+            break
+        if keep is not None and mirror == keep:
+            continue
+        logger.debug(f"Evicting mirror {mirror}")
+        shutil.rmtree(mirror, ignore_errors=True)
+        total -= size
+        removed.append(mirror)
+    return removed
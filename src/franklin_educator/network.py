@@ -0,0 +1,294 @@
+import os
+import re
+import time
+import random
+import threading
+import subprocess
+from typing import List, Callable, Any
+
+from franklin import config as cfg
+from franklin.logger import logger
+
+from . import backend
+from .backend import GitBackend
+
+# Upper bound in seconds of the random delay before the first network
+# operation of a process, which spreads out clients started at the same
+# time. Off for interactive commands, where it is only felt as latency.
+START_JITTER = 0.0
+
+# Start delay bound for batch work, which enables it with spread_start
+BATCH_JITTER = 1.0
+
+# Network operations running at the same time in one process
+CONCURRENCY = 4
+
+# Attempts at an operation that fails with a transient error, and the
+# delay before the first retry, doubled for every attempt
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 30.0
+
+# git and ssh messages that mean the operation may succeed if tried again
+TRANSIENT = re.compile('|'.join([
+    r'Connection (reset|refused|timed out|closed)',
+    r'kex_exchange_identification',
+    r'ssh_exchange_identification',
+    r'Could not resolve host',
+    r'Temporary failure in name resolution',
+    r'Operation timed out',
+    r'remote end hung up unexpectedly',
+    r'early EOF',
+    r'unexpected disconnect',
+    r'RPC failed',
+    r'returned error: (429|500|502|503|504)',
+    r'[Tt]oo many (connections|requests)',
+    r'Broken pipe',
+]))
+
+# Messages that mean retrying will not help, even if a transient message
+# is also printed
+PERMANENT = re.compile('|'.join([
+    r'Permission denied',
+    r'[Rr]epository not found',
+    r'does not appear to be a git repository',
+    r'\[rejected\]',
+    r'non-fast-forward',
+]))
+
+# Written in the git directory while a clone is being made step by step
+_INCOMPLETE = 'franklin-incomplete-clone'
+
+_slots = None
+_slots_lock = threading.Lock()
+_jittered = False
+_start_jitter = START_JITTER
+
+
+def _setting(name: str, default: float) -> float:
+    # FRANKLIN_NETWORK_<NAME> in the environment, then franklin's config
+    value = os.environ.get(f'FRANKLIN_NETWORK_{name.upper()}')
+    if value is None:
+        value = getattr(cfg, f'network_{name}', None)
+    return default if value is None else float(value)
+
+
+def concurrency() -> int:
+    """
+    Network operations allowed at the same time.
+
+    Returns
+    -------
+    :
+        The FRANKLIN_NETWORK_CONCURRENCY environment variable or the
+        network_concurrency setting in franklin's config, if given, and
+        otherwise CONCURRENCY.
+    """
+    return max(1, int(_setting('concurrency', CONCURRENCY)))
+
+
+def spread_start(jitter: float=BATCH_JITTER) -> None:
+    """
+    Enables a random delay before the first network operation of the
+    process, for batch work such as creating exercises from a manifest
+    or the background upload worker.
+
+    Parameters
+    ----------
+    jitter :
+        Upper bound of the delay in seconds. The FRANKLIN_NETWORK_JITTER
+        environment variable and the network_jitter setting in franklin's
+        config take precedence.
+    """
+    global _start_jitter
+    _start_jitter = jitter
+
+
+def _wait_for_start() -> None:
+    global _jittered
+    with _slots_lock:
+        if _jittered:
+            return
+        _jittered = True
+    delay = random.uniform(0, _setting('jitter', _start_jitter))
+    if delay:
+        logger.debug(f"Waiting {delay:.2f}s before the first network operation")
+        time.sleep(delay)
+
+
+def _slot() -> threading.BoundedSemaphore:
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(concurrency())
+        return _slots
+
+
+def is_transient(error: subprocess.CalledProcessError) -> bool:
+    """
+    Checks if a failed git command is worth trying again.
+
+    Parameters
+    ----------
+    error :
+        The error raised by backend.run.
+
+    Returns
+    -------
+    :
+        True if the output points to a dropped or refused connection or
+        an overloaded server.
+    """
+    output = (error.output or b'').decode(errors='replace')
+    return bool(TRANSIENT.search(output)) and not PERMANENT.search(output)
+
+
+def backoff(attempt: int) -> float:
+    """
+    Seconds to wait before trying again.
+
+    Parameters
+    ----------
+    attempt :
+        Number of failed attempts so far.
+
+    Returns
+    -------
+    :
+        Exponentially growing delay with full jitter, so clients that
+        failed together do not retry together.
+    """
+    return random.uniform(0, min(RETRY_DELAY * 2 ** (attempt - 1), MAX_RETRY_DELAY))
+
+
+def call(func: Callable, *args: Any, attempts: int=MAX_ATTEMPTS, **kwargs: Any) -> Any:
+    """
+    Runs a network operation, retrying it on transient errors.
+
+    The first operation in a process waits a random start delay if
+    enabled (see spread_start), and no more operations than the concurrency limit run at the same time.
+
+    Parameters
+    ----------
+    func :
+        Function running git, e.g. backend.run or GitBackend.git, which
+        raises CalledProcessError on failure.
+    *args :
+        Passed on to func.
+    attempts :
+        Attempts before giving up.
+    **kwargs :
+        Passed on to func.
+
+    Returns
+    -------
+    :
+        What func returns.
+    """
+    _wait_for_start()
+    for attempt in range(1, attempts + 1):
+        try:
+            with _slot():
+                return func(*args, **kwargs)
+        except subprocess.CalledProcessError as e:
+            if attempt == attempts or not is_transient(e):
+                raise
+            delay = backoff(attempt)
+            logger.debug(f"Transient network error, retrying in {delay:.1f}s: "
+                         f"{e.output.decode(errors='replace').strip()}")
+            time.sleep(delay)
+
+
+def clone_incomplete(repo_local_path: str) -> bool:
+    """
+    Checks if a directory holds a clone that was interrupted.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        True if clone should be run again to finish it.
+    """
+    return os.path.exists(os.path.join(repo_local_path, '.git', _INCOMPLETE))
+
+
+def _default_branch(clone_url: str) -> str:
+    output = call(backend.run, ['git', 'ls-remote', '--symref', clone_url, 'HEAD']).stdout.decode()
+    m = re.search(r'^ref: refs/heads/(\S+)\tHEAD', output, re.MULTILINE)
+    return m.group(1) if m else None
+
+
+def _clone_in_steps(clone_url: str, repo_local_path: str, options: List[str]) -> None:
+    # The same as git clone, but every step is kept when a later one
+    # fails, so running it again continues where it stopped.
+    checkout, fetch_options, config = True, [], {}
+    for option in options:
+        if option == '--no-checkout':
+            checkout = False
+        elif option.startswith('--filter='):
+            blob_filter = option.split('=', 1)[1]
+            config.update({'remote.origin.promisor': 'true',
+                           'remote.origin.partialclonefilter': blob_filter})
+            fetch_options.append(option)
+        elif option.startswith('--depth='):
+            fetch_options.append(option)
+        else:
+            raise ValueError(f"Clone option {option} is not supported")
+
+    branch = _default_branch(clone_url)
+    repo = GitBackend(repo_local_path)
+    if not os.path.exists(repo.git_dir):
+        backend.run(['git', 'init', '-q', f'--initial-branch={branch or "main"}', repo_local_path])
+        repo.git('remote', 'add', 'origin', clone_url)
+    open(os.path.join(repo.git_dir, _INCOMPLETE), 'w').close()
+    repo.config_update(config)
+    if branch is not None:
+        call(repo.git, 'fetch', '--quiet', *fetch_options, 'origin')
+        repo.git('update-ref', f'refs/heads/{branch}', f'refs/remotes/origin/{branch}')
+        repo.git('symbolic-ref', 'HEAD', f'refs/heads/{branch}')
+        repo.git('branch', '--quiet', f'--set-upstream-to=origin/{branch}', branch)
+        repo.git('remote', 'set-head', 'origin', branch)
+        if checkout:
+            # fetches the blobs of a partial clone
+            call(repo.git, 'reset', '--quiet', '--hard')
+    os.remove(os.path.join(repo.git_dir, _INCOMPLETE))
+
+
+def clone(clone_url: str, repo_local_path: str, *options: str) -> None:
+    """
+    Clones a repository, retrying on transient errors without starting over.
+
+    The first attempt is a plain git clone. If that fails with a
+    transient error, or a clone in the directory was interrupted before,
+    the clone is made in steps (an empty repository, a fetch and a
+    checkout) that are each retried and kept when a later step fails.
+    Git discards a pack that is only partly received, but the objects
+    of completed steps, e.g. the commits and trees of a blob-filtered
+    clone, are not fetched again.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    repo_local_path :
+        Path of the new local repository.
+    *options :
+        Options for git clone: --no-checkout, --filter=<filter> and
+        --depth=<depth> are supported.
+    """
+    repo_local_path = str(repo_local_path)
+    if not clone_incomplete(repo_local_path):
+        try:
+            call(backend.run, ['git', 'clone', '--quiet', *options, clone_url, repo_local_path],
+                 attempts=1)
+            return
+        except subprocess.CalledProcessError as e:
+            if not is_transient(e):
+                raise
+            logger.debug(f"Clone of {clone_url} failed, continuing in steps")
+            time.sleep(backoff(1))
+    _clone_in_steps(clone_url, repo_local_path, list(options))
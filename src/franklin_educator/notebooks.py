@@ -0,0 +1,190 @@
+import os
+import json
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Any, Optional
+
+from franklin.logger import logger
+
+from . import settings
+from .backend import GitBackend
+
+# Threads cleaning notebooks at the same time
+CLEAN_WORKERS = 8
+
+# Defaults for the notebooks and large_files settings in franklin.yml.
+# Notebooks are committed as they are unless a repository opts in:
+# outputs may be part of the exercise (e.g. figures shown to students),
+# and cleaning only changes the staged copy, so a notebook that has been
+# run would never match the commit again.
+DEFAULT_POLICY = dict(
+    strip_outputs=False,
+    strip_execution_count=False,
+    keep_outputs=[],
+    max_file_size=10 * 1024**2,
+    large_files='warn',
+)
+
+
+def policy(repo_local_path: str) -> Dict[str, Any]:
+    """
+    Notebook cleaning policy of an exercise repository.
+
+    Read from franklin.yml, e.g.::
+
+        notebooks:
+          strip_outputs: true
+          strip_execution_count: true
+          keep_outputs: ['*-solution.ipynb']
+        max_file_size: 10000000
+        large_files: warn
+
+    large_files is 'warn' (commit large files but warn about them) or
+    'skip' (leave changes to large files out of the commit).
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Policy with defaults filled in.
+    """
+    repo_settings = settings.load(repo_local_path)
+    result = dict(DEFAULT_POLICY)
+    notebooks = repo_settings.get('notebooks')
+    if isinstance(notebooks, dict):
+        result.update({k: v for k, v in notebooks.items() if k in DEFAULT_POLICY})
+    for key in ('max_file_size', 'large_files'):
+        if key in repo_settings:
+            result[key] = repo_settings[key]
+    if result['large_files'] not in ('warn', 'skip'):
+        logger.debug(f"Unknown large_files setting {result['large_files']!r}, using 'warn'")
+        result['large_files'] = 'warn'
+    return result
+
+
+def strip(notebook: Dict[str, Any], outputs: bool=True, execution_count: bool=True) -> bool:
+    """
+    Removes outputs and execution counts from code cells in place.
+
+    Parameters
+    ----------
+    notebook :
+        Notebook as loaded from JSON.
+    outputs :
+        Remove cell outputs.
+    execution_count :
+        Remove execution counts.
+
+    Returns
+    -------
+    :
+        True if the notebook was changed.
+    """
+    changed = False
+    for cell in notebook.get('cells', []):
+        if cell.get('cell_type') != 'code':
+            continue
+        if outputs and cell.get('outputs'):
+            cell['outputs'] = []
+            changed = True
+        if execution_count:
+            if cell.get('execution_count') is not None:
+                cell['execution_count'] = None
+                changed = True
+            for output in cell.get('outputs', []):
+                if output.get('execution_count') is not None:
+                    output['execution_count'] = None
+                    changed = True
+    return changed
+
+
+def _dumps(notebook: Dict[str, Any]) -> bytes:
+    # same layout as Jupyter writes, so only the stripped parts show up in diffs
+    return (json.dumps(notebook, sort_keys=True, indent=1, ensure_ascii=False) + '\n').encode()
+
+
+def _clean(repo: GitBackend, path: str, rules: Dict[str, Any]) -> Optional[Tuple[str, int, int]]:
+    # Writes a stripped copy of a notebook as a blob. Returns the blob id and
+    # the sizes before and after, or None if there is nothing to strip.
+    with open(os.path.join(repo.repo_local_path, path), 'rb') as f:
+        original = f.read()
+    try:
+        notebook = json.loads(original)
+    except ValueError:
+        logger.debug(f"{path} is not valid JSON, committed as is")
+        return None
+    outputs = rules['strip_outputs'] and \
+        not any(fnmatch.fnmatch(path, pattern) for pattern in rules['keep_outputs'])
+    if not strip(notebook, outputs=outputs, execution_count=rules['strip_execution_count']):
+        return None
+    cleaned = _dumps(notebook)
+    blob = repo.git('hash-object', '-w', '--no-filters', '--stdin', input=cleaned).strip()
+    return blob, len(original), len(cleaned)
+
+
+def clean_staged(repo_local_path: str) -> Dict[str, Any]:
+    """
+    Applies the notebook policy to the changes staged for commit.
+
+    Staged notebooks are stripped in parallel and the stripped versions
+    replace them in the index. The files in the working tree keep their
+    outputs. Staged files larger than the size limit are reported, and
+    left out of the commit if the policy says so.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Dictionary with the notebooks stripped ('cleaned'), the bytes
+        saved ('saved'), the files above the size limit ('large') and
+        the files left out of the commit ('skipped').
+    """
+    rules = policy(repo_local_path)
+    repo = GitBackend(repo_local_path)
+    staged = list(repo.records('diff', '--cached', '--name-only', '--diff-filter=AM', '-z'))
+
+    sizes = {}
+    for path in staged:
+        try:
+            sizes[path] = os.path.getsize(os.path.join(repo_local_path, path))
+        except OSError:
+            pass
+
+    notebooks = [p for p in staged if p.endswith('.ipynb')]
+    stripped = {}
+    with ThreadPoolExecutor(max_workers=CLEAN_WORKERS) as pool:
+        for path, result in zip(notebooks, pool.map(lambda p: _clean(repo, p, rules), notebooks)):
+            if result is not None:
+                blob, before, after = result
+                stripped[path] = (blob, before - after)
+                sizes[path] = after
+
+    # the limit applies to what would be uploaded
+    limit = rules['max_file_size']
+    large = [path for path in staged if limit and sizes.get(path, 0) > limit]
+    skipped = large if rules['large_files'] == 'skip' else []
+    if skipped:
+        repo.git('reset', '-q', '--', *skipped)
+
+    cleaned = [path for path in stripped if path not in skipped]
+    if cleaned:
+        # the stripped blobs keep the modes of the staged entries
+        modes = {}
+        for record in repo.records('ls-files', '--stage', '-z', '--', *cleaned):
+            info, path = record.split('\t', 1)
+            modes[path] = info.split()[0]
+        index_info = ''.join(f'{modes.get(path, "100644")} {stripped[path][0]}\t{path}\0' 
+                             for path in cleaned)
+        repo.git('update-index', '-z', '--index-info', input=index_info.encode())
+    saved = sum(stripped[path][1] for path in cleaned)
+    if cleaned:
+        logger.debug(f"Stripped {len(cleaned)} notebooks, saving {saved} bytes")
+    return dict(cleaned=cleaned, saved=saved, large=large, skipped=skipped)
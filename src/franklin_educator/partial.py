@@ -0,0 +1,193 @@
+import os
+import threading
+from typing import Dict, Any, Optional
+
+from franklin import terminal as term
+from franklin.logger import logger
+
+from . import network
+from . import settings
+from .backend import GitBackend
+from .cache import cache_dir, read_json, write_json
+
+# Clone settings used with --partial when the exercise does not declare any.
+# An exercise declares its own in the "clone" section of franklin.yml:
+#
+#   clone:
+#     partial: true
+#     depth: 1
+#     sparse:
+#       - exercise.ipynb
+#       - README.md
+DEFAULT_CLONE_SETTINGS = dict(partial=True, depth=1, sparse=[])
+
+_known_lock = threading.Lock()
+
+
+def _known_path():
+    return cache_dir() / 'clones.json'
+
+
+def _known() -> Dict[str, Dict[str, Any]]:
+    # per clone url: the clone settings last seen in the exercise and the
+    # number of bytes a full clone transferred
+    return read_json(_known_path()) or {}
+
+
+def _update_known(clone_url: str, **values: Any) -> None:
+    with _known_lock:
+        known = _known()
+        known.setdefault(clone_url, {}).update(values)
+        write_json(_known_path(), known)
+
+
+def clone_settings(clone_url: str, force: bool=False) -> Optional[Dict[str, Any]]:
+    """
+    Settings for a partial clone of an exercise.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    force :
+        Make a partial clone even if the exercise does not ask for it.
+
+    Returns
+    -------
+    :
+        Clone settings, or None if a full clone should be made.
+    """
+    declared = _known().get(clone_url, {}).get('clone') or {}
+    if not force and not declared.get('partial'):
+        return None
+    return {**DEFAULT_CLONE_SETTINGS, **declared, 'partial': True}
+
+
+def is_partial(repo_local_path: str) -> bool:
+    """
+    Checks if a repository is a partial or shallow clone.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        True if objects or history are missing from the clone.
+    """
+    if os.path.exists(os.path.join(repo_local_path, '.git', 'shallow')):
+        return True
+    return GitBackend(repo_local_path).config_get('remote.origin.promisor') == 'true'
+
+
+def objects_size(repo_local_path: str) -> int:
+    """
+    Size of the object database of a repository.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Size in bytes.
+    """
+    size = 0
+    for root, _, files in os.walk(os.path.join(repo_local_path, '.git', 'objects')):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+
+def clone(clone_url: str, repo_local_path: str, clone_settings: Dict[str, Any]) -> int:
+    """
+    Makes a blob-filtered, optionally shallow and sparse, clone.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    repo_local_path :
+        Path of the new local repository.
+    clone_settings :
+        Settings as returned by clone_settings.
+
+    Returns
+    -------
+    :
+        Number of bytes transferred.
+    """
+    options = ['--filter=blob:none', '--no-checkout']
+    if clone_settings.get('depth'):
+        options.append(f"--depth={clone_settings['depth']}")
+    network.clone(clone_url, repo_local_path, *options)
+
+    repo = GitBackend(repo_local_path)
+    sparse = clone_settings.get('sparse') or []
+    if sparse:
+        # the settings file is always checked out so later clones can read it
+        repo.git('sparse-checkout', 'set', '--no-cone', settings.SETTINGS_FILE, *sparse)
+    branch = repo.git('symbolic-ref', '--short', 'HEAD').strip()
+    # fetches the blobs that are checked out
+    network.call(repo.git, 'checkout', branch)
+    return objects_size(repo_local_path)
+
+
+def remember(clone_url: str, repo_local_path: str, full_clone_bytes: int=None) -> None:
+    """
+    Records the clone settings declared by an exercise for future clones.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    repo_local_path :
+        Path to the local repository.
+    full_clone_bytes :
+        Bytes transferred by a full clone of the repository, if one was made.
+    """
+    values = dict(clone=settings.load(repo_local_path).get('clone') or {})
+    if full_clone_bytes is not None:
+        values['full_clone_bytes'] = full_clone_bytes
+    _update_known(clone_url, **values)
+
+
+def report(clone_url: str, transferred: int) -> None:
+    """
+    Prints the bytes transferred by a partial clone compared to a full clone.
+
+    Parameters
+    ----------
+    clone_url :
+        Url of the remote repository.
+    transferred :
+        Bytes transferred by the partial clone.
+    """
+    full = _known().get(clone_url, {}).get('full_clone_bytes')
+    msg = f"Partial clone transferred {transferred / 1024**2:.1f} MB"
+    if full:
+        msg += f" (full clone: {full / 1024**2:.1f} MB)"
+    term.secho(msg, fg='green')
+
+
+def ensure_merge_base(repo_local_path: str) -> None:
+    """
+    Deepens a shallow clone if the merge base with upstream is missing.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    """
+    if not os.path.exists(os.path.join(repo_local_path, '.git', 'shallow')):
+        return
+    repo = GitBackend(repo_local_path)
+    if repo.returncode('merge-base', 'HEAD', '@{upstream}') == 0:
+        return
+    logger.debug(f"Fetching full history for {repo_local_path}")
+    # commits and trees only, since the blob filter still applies
+    network.call(repo.git, 'fetch', '--unshallow')
@@ -0,0 +1,108 @@
+import sys
+import shutil
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Tuple, List, Dict, Callable, Any
+
+import click
+
+from franklin.logger import logger
+
+from . import trace
+
+
+def _traced(name: str, func: Callable) -> Any:
+    with trace.phase(name):
+        return func()
+
+
+def run_tasks(tasks: Dict[str, Tuple[Callable, List[str]]], 
+              max_workers: int=None) -> Dict[str, Any]:
+    """
+    Runs tasks concurrently, each starting when the tasks it depends on are done.
+
+    If a task raises, tasks that have not started are skipped, running 
+    tasks are allowed to finish, and the first exception is re-raised.
+
+    Parameters
+    ----------
+    tasks :
+        Mapping of task name to a function taking no arguments and the
+        names of the tasks it depends on.
+    max_workers :
+        Maximum number of tasks running at the same time. Defaults to the 
+        number of tasks.
+
+    Returns
+    -------
+    :
+        Mapping of task name to the value returned by its function.
+    """
+    for name, (_, deps) in tasks.items():
+        for dep in deps:
+            if dep not in tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+
+    results = {}
+    error = None
+    pending = dict(tasks)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+        while pending or running:
+            if error is None:
+                for name, (func, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        logger.debug(f"Starting task {name}")
+                        running[pool.submit(_traced, name, func)] = name
+                        del pending[name]
+            if not running:
+                if pending and error is None:
+                    raise ValueError(f"Circular task dependencies: {', '.join(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    logger.debug(f"Finished task {name}")
+                except BaseException as e:
+                    logger.debug(f"Task {name} failed: {e!r}")
+                    if error is None:
+                        error = e
+    if error is not None:
+        raise error
+    return results
+
+
+@contextmanager
+def progress(sources: Dict[str, Callable[[], str]], interval: float=0.5):
+    """
+    Shows a single status line for several operations running in the background.
+
+    Nothing is shown if stderr is not a terminal.
+
+    Parameters
+    ----------
+    sources :
+        Mapping of label to a function returning the current status text.
+    interval :
+        Seconds between updates.
+    """
+    if not sys.stderr.isatty():
+        yield
+        return
+    width = shutil.get_terminal_size().columns - 1
+    stop = threading.Event()
+    def show():
+        while not stop.wait(interval):
+            line = '   '.join(f"{label}: {status()}" for label, status in sources.items())
+            click.echo('\r' + line[:width].ljust(width), nl=False, err=True)
+        click.echo('\r' + ' ' * width + '\r', nl=False, err=True)
+    thread = threading.Thread(target=show, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
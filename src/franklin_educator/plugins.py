@@ -0,0 +1,80 @@
+from importlib import metadata
+from typing import List, Dict, Optional
+
+import click
+
+from franklin import utils
+
+
+def entry_points(group: str) -> Dict[str, metadata.EntryPoint]:
+    """
+    Entry points registered for a plugin group.
+
+    Parameters
+    ----------
+    group :
+        Entry point group, e.g. 'franklin.git.plugins'.
+
+    Returns
+    -------
+    :
+        Mapping of entry point name to entry point (not loaded).
+    """
+    eps = metadata.entry_points()
+    if hasattr(eps, 'select'):
+        selected = eps.select(group=group)
+    else:
+        # Python 3.9 returns a dict of groups
+        selected = eps.get(group, [])
+    return {ep.name: ep for ep in selected}
+
+
+class LazyPluginGroup(utils.AliasedGroup):
+    """
+    Command group with plugin commands loaded from entry points on demand.
+
+    Installed distributions are only scanned when a command is not
+    found among the group's own commands (or when commands are listed),
+    and only the plugin actually invoked is imported.
+    """
+
+    def __init__(self, *args, plugin_group: str=None, **kwargs) -> None:
+        """
+        Parameters
+        ----------
+        plugin_group :
+            Entry point group with plugin commands.
+        """
+        super().__init__(*args, **kwargs)
+        self.plugin_group = plugin_group
+        self._plugins = None
+
+    def _plugin_entry_points(self) -> Dict[str, metadata.EntryPoint]:
+        if self._plugins is None:
+            self._plugins = entry_points(self.plugin_group) if self.plugin_group else {}
+        return self._plugins
+
+    def _load(self, name: str) -> None:
+        ep = self._plugin_entry_points()[name]
+        try:
+            command = ep.load()
+        except Exception as e:
+            # a broken plugin should not break the other commands (e is
+            # deleted when the except block ends, so only the message is kept)
+            message = f"Plugin {ep.value} could not be loaded: {e}"
+            @click.command(name)
+            def command():
+                raise click.ClickException(message)
+        self.add_command(command, name)
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self._plugin_entry_points()))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands:
+            plugins = self._plugin_entry_points()
+            matches = [cmd_name] if cmd_name in plugins else \
+                [name for name in plugins if name.startswith(cmd_name)]
+            if len(matches) == 1 and matches[0] not in self.commands:
+                self._load(matches[0])
+        return super().get_command(ctx, cmd_name)
@@ -0,0 +1,37 @@
+import os
+from typing import Dict, Any
+
+from franklin.logger import logger
+
+# Per-exercise settings file at the root of an exercise repository
+SETTINGS_FILE = 'franklin.yml'
+
+
+def load(repo_local_path: str) -> Dict[str, Any]:
+    """
+    Reads the settings file of an exercise repository.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Settings, empty if there is no settings file.
+    """
+    path = os.path.join(repo_local_path, SETTINGS_FILE)
+    text = None
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            text = f.read()
+    if not text:
+        return {}
+    import yaml
+    try:
+        settings = yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        logger.debug(f"Ignoring invalid {SETTINGS_FILE}: {e}")
+        return {}
+    return settings if isinstance(settings, dict) else {}
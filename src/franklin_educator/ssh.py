@@ -0,0 +1,101 @@
+import os
+import time
+import shlex
+from typing import List
+
+from franklin import config as cfg
+from franklin import utils
+from franklin.logger import logger
+
+from . import backend
+from .cache import cache_dir
+
+# Seconds a successful connection check is trusted
+SSH_CHECK_TTL = 15 * 60
+
+# Seconds an idle shared SSH connection is kept open
+SSH_CONTROL_PERSIST = 10 * 60
+
+
+def multiplexing_supported() -> bool:
+    """
+    Checks if SSH connection sharing can be used.
+
+    Returns
+    -------
+    :
+        False on Windows, where OpenSSH does not support ControlMaster.
+    """
+    return utils.system() != 'Windows'
+
+
+def ssh_options() -> List[str]:
+    """
+    Options making ssh share one connection to GitLab between commands.
+
+    Returns
+    -------
+    :
+        List of ssh command line options.
+    """
+    options = ['-o', 'StrictHostKeyChecking=accept-new']
+    if multiplexing_supported():
+        # %C is a hash of the connection, which keeps the socket path short
+        options += ['-o', 'ControlMaster=auto',
+                    '-o', 'ControlPath=~/.ssh/franklin-%C',
+                    '-o', f'ControlPersist={SSH_CONTROL_PERSIST}']
+    return options
+
+
+def enable_multiplexing() -> None:
+    """
+    Makes all git processes started by franklin share SSH connections.
+
+    Does nothing if the user has configured git's ssh command.
+    """
+    if not multiplexing_supported():
+        return
+    if os.environ.get('GIT_SSH_COMMAND') or os.environ.get('GIT_SSH'):
+        return
+    os.makedirs(os.path.expanduser('~/.ssh'), mode=0o700, exist_ok=True)
+    backend.extra_env['GIT_SSH_COMMAND'] = ' '.join(['ssh'] + [shlex.quote(o) for o in ssh_options()])
+
+
+def _stamp_path():
+    return cache_dir('ssh') / f'{cfg.gitlab_domain}.ok'
+
+
+def connection_ok() -> bool:
+    """
+    Checks if the connection to GitLab was verified recently.
+
+    Returns
+    -------
+    :
+        True if a check succeeded within SSH_CHECK_TTL seconds.
+    """
+    try:
+        return time.time() - os.path.getmtime(_stamp_path()) < SSH_CHECK_TTL
+    except OSError:
+        return False
+
+
+def check_connection() -> bool:
+    """
+    Checks that ssh authentication with GitLab works.
+
+    The connection opened by the check is kept open and shared by
+    the git commands that follow.
+
+    Returns
+    -------
+    :
+        True if GitLab accepted the connection.
+    """
+    result = backend.run(['ssh', *ssh_options(), '-T', f'git@{cfg.gitlab_domain}'], check=False)
+    output = (result.stdout + result.stderr).decode(errors='replace')
+    logger.debug(output)
+    if 'Welcome to GitLab' not in output:
+        return False
+    _stamp_path().touch()
+    return True
@@ -0,0 +1,156 @@
+from typing import Dict, Any, Optional
+
+from franklin import utils
+
+from . import cache
+from . import containers
+from .backend import GitBackend
+from .mirrors import course_and_repo
+
+
+def _git_version(repo: GitBackend) -> tuple:
+    version = repo.git('version').split()[2]
+    return tuple(int(x) for x in version.split('.')[:2] if x.isdigit())
+
+
+def _status_options(repo: GitBackend) -> list:
+    # The untracked cache is stored in the index and lets git skip
+    # directories that have not changed. The builtin file system monitor
+    # exists on macOS and Windows from git 2.37; older git would take
+    # core.fsmonitor=true to be the path of a hook.
+    options = ['-c', 'core.untrackedCache=true']
+    if utils.system() in ('Darwin', 'Windows') and _git_version(repo) >= (2, 37):
+        options += ['-c', 'core.fsmonitor=true']
+    return options
+
+
+def _commit_time(repo: GitBackend, rev: str) -> Optional[int]:
+    commit = repo.cat_file.read(rev)
+    if commit is None:
+        return None
+    for line in commit.split(b'\n'):
+        if line.startswith(b'committer '):
+            return int(line.split()[-2])
+        if not line:
+            break
+    return None
+
+
+def repo_status(repo_local_path: str, check_image: bool=True) -> Dict[str, Any]:
+    """
+    Status of a local exercise repository.
+
+    The working tree and branch are read with a single call to 
+    ``git status --porcelain=v2 --branch -z``.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    check_image :
+        Also check if the local Docker image for the exercise is older 
+        than the latest commit on GitLab.
+
+    Returns
+    -------
+    :
+        Dictionary with branch, upstream, ahead, behind, modified, untracked,
+        conflicted and image.
+    """
+    status = dict(branch=None, upstream=None, ahead=0, behind=0, 
+                  modified=[], untracked=[], conflicted=[], image=None)
+    with GitBackend(repo_local_path) as repo:
+        records = repo.records(*_status_options(repo), 'status', '--porcelain=v2', '--branch', '-z')
+        for record in records:
+            if record.startswith('# branch.head '):
+                status['branch'] = record.split(' ', 2)[2]
+            elif record.startswith('# branch.upstream '):
+                status['upstream'] = record.split(' ', 2)[2]
+            elif record.startswith('# branch.ab '):
+                ahead, behind = record.split(' ')[2:4]
+                status['ahead'], status['behind'] = int(ahead), -int(behind)
+            elif record.startswith('1 '):
+                status['modified'].append(record.split(' ', 8)[8])
+            elif record.startswith('2 '):
+                status['modified'].append(record.split(' ', 9)[9])
+                # the original path of a rename is a record of its own
+                next(records, None)
+            elif record.startswith('u '):
+                status['conflicted'].append(record.split(' ', 10)[10])
+            elif record.startswith('? '):
+                status['untracked'].append(record[2:])
+
+        if check_image:
+            status['image'] = _image_status(repo, status['upstream'] or 'HEAD')
+    return status
+
+
+def has_changes_to_upload(repo_local_path: str) -> bool:
+    """
+    Checks, without using the network, if git up has anything to upload.
+
+    Reading the status stops at the first changed tracked file. 
+    Untracked files are not considered, as they are never uploaded.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        True if tracked files are changed, there are commits that are 
+        not pushed, or the branch has no upstream.
+    """
+    ahead = None
+    with GitBackend(repo_local_path) as repo:
+        records = repo.records(*_status_options(repo), 'status', '--porcelain=v2', 
+                               '--branch', '--untracked-files=no', '-z')
+        for record in records:
+            if record.startswith('# branch.ab '):
+                ahead = int(record.split(' ')[2])
+            elif not record.startswith('# '):
+                records.close()
+                return True
+    return ahead is None or ahead > 0
+
+
+def commits_ahead(repo_local_path: str) -> Optional[int]:
+    """
+    Counts local commits that are not on the upstream branch, without
+    using the network.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Number of commits, or None if the branch has no upstream.
+    """
+    output = GitBackend(repo_local_path).git('rev-list', '--count', '@{upstream}..HEAD', check=False)
+    return int(output) if output.strip().isdigit() else None
+
+
+def _image_status(repo: GitBackend, rev: str) -> Optional[Dict[str, Any]]:
+    # The image is built on GitLab from the latest commit, so it is stale
+    # if it is older than that commit. Only cached data is used.
+    url = repo.config_get('remote.origin.url')
+    if not url:
+        return None
+    course, repo_name = course_and_repo(url)
+    image_url = None
+    for (c, exercise), image in cache.registry_listing(offline=True).items():
+        if c == course and exercise.split('/')[-1] == repo_name:
+            image_url = image
+    if image_url is None:
+        return None
+    created = containers.image_created(image_url)
+    committed = _commit_time(repo, rev)
+    stale = None
+    if created is not None and committed is not None:
+        stale = created < committed
+    return dict(url=image_url, pulled=created is not None, stale=stale)
@@ -0,0 +1,176 @@
+import re
+import os
+import subprocess
+from typing import List, Dict, Any
+
+from franklin.logger import logger
+
+from . import backend
+from . import network
+from . import partial
+from .backend import GitBackend
+
+# Object count in the progress git fetch --progress writes to stderr (in
+# the C locale), e.g.
+# "Receiving objects: 100% (12/12), 3.10 KiB | 3.10 MiB/s, done." or, if the
+# pack arrived too fast for progress, "remote: Total 12 (delta 3), ..."
+_OBJECTS = re.compile(r'(?:Receiving objects: 100% \(|Unpacking objects: 100% \(|Total )(\d+)[/ ]')
+
+# Message git merge prints (in the C locale) before the local files it
+# would overwrite
+_OVERWRITTEN = re.compile(r'would be overwritten by merge:$')
+
+
+def _c_locale() -> Dict[str, str]:
+    # git messages are parsed, so they must not be translated
+    env = {key: value for key, value in os.environ.items() if key != 'LANGUAGE'}
+    env['LC_ALL'] = 'C'
+    return env
+
+
+def fetch(repo_local_path: str) -> Dict[str, int]:
+    """
+    Fetches from the upstream remote.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Dictionary with the number of objects ('objects') and the bytes
+        added to the object database ('bytes').
+    """
+    size_before = partial.objects_size(repo_local_path)
+    result = network.call(backend.run, ['git', '-C', repo_local_path, 'fetch', '--progress'],
+                          env=_c_locale())
+    objects = 0
+    for line in re.split(r'[\r\n]', result.stderr.decode(errors='replace')):
+        m = _OBJECTS.search(line)
+        if m:
+            objects = int(m.group(1))
+    transferred = max(0, partial.objects_size(repo_local_path) - size_before)
+    logger.debug(f"Fetched {objects} objects ({transferred} bytes) into {repo_local_path}")
+    return dict(objects=objects, bytes=transferred)
+
+
+def _overwritten_paths(output: str) -> List[str]:
+    # files listed (tab indented) after git says local changes would be overwritten
+    paths, listing = [], False
+    for line in output.splitlines():
+        if _OVERWRITTEN.search(line):
+            listing = True
+        elif listing and line.startswith('\t'):
+            paths.append(line.strip())
+        else:
+            listing = False
+    return paths
+
+
+def _merge(repo: GitBackend, *args: str) -> Dict[str, Any]:
+    # Runs git merge and collects the conflicted paths from the index
+    result = backend.run(['git', '-C', repo.repo_local_path, 'merge', *args], check=False,
+                         env=_c_locale())
+    if result.returncode == 0:
+        return dict(conflicts=[])
+    output = (result.stdout + result.stderr).decode(errors='replace')
+    if not os.path.exists(os.path.join(repo.git_dir, 'MERGE_HEAD')):
+        overwritten = _overwritten_paths(output)
+        if overwritten:
+            return dict(state='blocked', conflicts=overwritten)
+        raise subprocess.CalledProcessError(result.returncode, result.args,
+                                            output=result.stdout + result.stderr)
+    return dict(state='conflicted', conflicts=conflicted_paths(repo.repo_local_path))
+
+
+def conflicted_paths(repo_local_path: str) -> List[str]:
+    """
+    Paths with unresolved merge conflicts.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Paths relative to the repository.
+    """
+    return list(GitBackend(repo_local_path).records('diff', '--name-only', '--diff-filter=U', '-z'))
+
+
+def blocking_paths(repo_local_path: str) -> List[str]:
+    """
+    Local changes that prevent merging the upstream branch, without 
+    using the network.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+
+    Returns
+    -------
+    :
+        Changed or untracked files that are also changed on the 
+        remote-tracking branch.
+    """
+    repo = GitBackend(repo_local_path)
+    upstream = set(repo.records('diff', '--name-only', '-z', 'HEAD', '@{upstream}'))
+    local = set(repo.records('diff', '--name-only', '-z', 'HEAD'))
+    local.update(repo.records('ls-files', '--others', '--exclude-standard', '-z'))
+    return sorted(upstream & local)
+
+
+def pull(repo_local_path: str, fetch_first: bool=True) -> Dict[str, Any]:
+    """
+    Brings a local repository up to date with its upstream branch.
+
+    The remote is fetched once. If the local branch has no commits of
+    its own it is fast-forwarded, and only if the histories have
+    diverged is a three-way merge made.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    fetch_first :
+        Fetch before merging. If False, the remote-tracking branch is
+        merged as it is.
+
+    Returns
+    -------
+    :
+        Dictionary with the state ('up-to-date', 'ahead', 'fast-forward',
+        'merged', 'conflicted' or 'blocked' when uncommitted changes
+        would be overwritten), the conflicting paths ('conflicts') and
+        the objects and bytes fetched.
+    """
+    repo = GitBackend(repo_local_path)
+    result = dict(state='up-to-date', conflicts=[], objects=0, bytes=0)
+    if fetch_first:
+        result.update(fetch(repo_local_path))
+
+    # shallow clones need the merge base before anything can be merged
+    partial.ensure_merge_base(repo_local_path)
+
+    try:
+        head, upstream = repo.git('rev-parse', 'HEAD', '@{upstream}').split()
+    except subprocess.CalledProcessError:
+        # no commits yet or no upstream branch, so there is nothing to merge
+        return result
+    if head == upstream:
+        return result
+    base = repo.git('merge-base', head, upstream, check=False).strip()
+    if base == upstream:
+        result['state'] = 'ahead'
+    elif base == head:
+        result['state'] = 'fast-forward'
+        result.update(_merge(repo, '--ff-only', upstream))
+    else:
+        result['state'] = 'merged'
+        result.update(_merge(repo, '--no-edit', upstream))
+    return result
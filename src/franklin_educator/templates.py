@@ -0,0 +1,189 @@
+import re
+from typing import Tuple, List, Iterator, Optional, Any
+
+from . import backend
+
+# Packaged template for new exercise repositories
+TEMPLATE = 'data/repo_templates/exercise'
+
+
+def valid_repo_name(name: str) -> bool:
+    """
+    Checks if a name can be used for an exercise repository.
+
+    Parameters
+    ----------
+    name :
+        Repository name.
+
+    Returns
+    -------
+    :
+        True if the name starts with a letter and only contains letters,
+        numbers, underscores and dashes.
+    """
+    return bool(name) and name[0].isalpha() and re.match(r'^[\w-]+$', name) is not None
+
+
+def template_files(template: Any=None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Files in a repository template, read directly from the package resources.
+
+    Parameters
+    ----------
+    template :
+        Template directory as a traversable resource or path. Defaults to
+        the packaged exercise template.
+
+    Yields
+    ------
+    :
+        Path relative to the template (using forward slashes) and file contents.
+    """
+    if template is None:
+        import importlib_resources
+        template = importlib_resources.files('franklin_educator').joinpath(TEMPLATE)
+    if not template.is_dir():
+        raise FileNotFoundError(f"Repository template not found: {template}")
+    def walk(node, prefix):
+        for child in sorted(node.iterdir(), key=lambda c: c.name):
+            if child.is_dir():
+                yield from walk(child, prefix + child.name + '/')
+            elif child.is_file():
+                yield prefix + child.name, child.read_bytes()
+    yield from walk(template, '')
+
+
+def _quote(path: str) -> str:
+    # C-style quoting accepted by fast-import for any path
+    escaped = path.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{escaped}"'
+
+
+def _data(content: bytes) -> bytes:
+    return b'data %d\n' % len(content) + content + b'\n'
+
+
+def fast_import_stream(files: Iterator[Tuple[str, bytes]], ident: str,
+                       branch: str='main', message: str='Initial commit') -> bytes:
+    """
+    Builds a git fast-import stream with a single commit of the given files.
+
+    Parameters
+    ----------
+    files :
+        Relative paths and contents.
+    ident :
+        Committer identity as printed by ``git var GIT_COMMITTER_IDENT``.
+    branch :
+        Branch the commit is made on.
+    message :
+        Commit message.
+
+    Returns
+    -------
+    :
+        Input for ``git fast-import``.
+    """
+    parts = [f'commit refs/heads/{branch}\n'.encode(),
+             f'author {ident}\ncommitter {ident}\n'.encode(),
+             _data(message.encode())]
+    for path, content in files:
+        parts.append(f'M 100644 inline {_quote(path)}\n'.encode())
+        parts.append(_data(content))
+    parts.append(b'done\n')
+    return b''.join(parts)
+
+
+def build_template_repository(path: str, template: Any=None, branch: str='main',
+                              message: str='Initial commit') -> None:
+    """
+    Creates a bare repository with the template as its only commit.
+
+    The commit is written by ``git fast-import`` straight from the
+    template files, so nothing is copied to a working tree.
+
+    Parameters
+    ----------
+    path :
+        Path of the new bare repository.
+    template :
+        Template directory. Defaults to the packaged exercise template.
+    branch :
+        Branch the commit is made on.
+    message :
+        Commit message.
+    """
+    backend.run(['git', 'init', '-q', '--bare', f'--initial-branch={branch}', path])
+    ident = backend.run(['git', 'var', 'GIT_COMMITTER_IDENT'], cwd=path).stdout.decode().strip()
+    stream = fast_import_stream(template_files(template), ident, branch, message)
+    backend.run(['git', '-C', path, 'fast-import', '--quiet', '--done'], input=stream)
+
+
+def push_new_repository(template_repo: str, clone_url: str, branch: str='main') -> None:
+    """
+    Pushes the template commit to a new remote repository.
+
+    Pushing to a repository with other history fails, so existing work 
+    is never overwritten.
+
+    Parameters
+    ----------
+    template_repo :
+        Repository made by build_template_repository.
+    clone_url :
+        Url of the remote repository.
+    branch :
+        Branch to push.
+    """
+    backend.run(['git', '-C', template_repo, 'push', '--quiet', clone_url, f'{branch}:{branch}'])
+
+
+def read_manifest(path: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    Reads a manifest listing exercises to create.
+
+    The manifest is a YAML file with a default course and a list of
+    exercises, each either a name or a mapping with a name and
+    optionally a course and a title::
+
+        course: mycourse
+        exercises:
+          - exercise1
+          - name: exercise2
+            course: othercourse
+            title: Second exercise
+
+    Parameters
+    ----------
+    path :
+        Path to the manifest.
+
+    Returns
+    -------
+    :
+        List of (course, repository name, title), with None for titles not given.
+    """
+    import yaml
+    with open(path) as f:
+        manifest = yaml.safe_load(f) or {}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('exercises'), list):
+        raise ValueError(f"{path} must have a list of exercises")
+    default_course = manifest.get('course')
+    exercises, seen = [], set()
+    for entry in manifest['exercises']:
+        title = None
+        if isinstance(entry, dict):
+            name, course = entry.get('name'), entry.get('course', default_course)
+            title = entry.get('title')
+        else:
+            name, course = str(entry), default_course
+        if not course:
+            raise ValueError(f"No course given for exercise {name} in {path}")
+        if not valid_repo_name(name):
+            raise ValueError(f"Invalid repository name in {path}: {name}")
+        if (course, name) in seen:
+            raise ValueError(f"Exercise {course}/{name} is listed twice in {path}")
+        seen.add((course, name))
+        exercises.append((course, name, title))
+    return exercises
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+import functools
+import subprocess
+from contextlib import contextmanager
+from typing import List, Dict, Callable, Any
+
+import click
+
+from franklin.logger import logger
+
+# Completed events: external processes and phases of commands
+_events = []
+
+# Start times of processes that have not finished, keyed by process handle
+_started = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+
+def _now() -> float:
+    return time.perf_counter() - _origin
+
+
+def started(proc: subprocess.Popen) -> None:
+    """
+    Records the start of an external process.
+
+    Parameters
+    ----------
+    proc :
+        Process handle.
+    """
+    with _lock:
+        _started[proc] = _now()
+
+
+def finished(proc: subprocess.Popen, output_size: int=0) -> None:
+    """
+    Records the end of an external process.
+
+    Parameters
+    ----------
+    proc :
+        Process handle of a process that has exited.
+    output_size :
+        Bytes of output read from the process.
+    """
+    end = _now()
+    with _lock:
+        start = _started.pop(proc, None)
+        if start is None:
+            return
+        args = proc.args if isinstance(proc.args, list) else [proc.args]
+        _events.append(dict(kind='process', name=' '.join(map(str, args)),
+                            start=start, end=end, thread=threading.get_ident(),
+                            returncode=proc.returncode, output_size=output_size))
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Records the duration of a phase of a command.
+
+    Parameters
+    ----------
+    name :
+        Name of the phase.
+    """
+    start = _now()
+    try:
+        yield
+    finally:
+        with _lock:
+            _events.append(dict(kind='phase', name=name, start=start, end=_now(),
+                                thread=threading.get_ident()))
+
+
+def events() -> List[Dict[str, Any]]:
+    """
+    Events recorded so far.
+
+    Returns
+    -------
+    :
+        List of events with kind, name, start and end (seconds), thread and,
+        for processes, returncode and output_size.
+    """
+    with _lock:
+        return list(_events)
+
+
+def _short_name(command: str) -> str:
+    # "git -C /path/to/repo -c key=value fetch --prune" -> "git fetch"
+    words = command.split()
+    if not words:
+        return command
+    program = os.path.basename(words[0])
+    rest = words[1:]
+    if program == 'git':
+        while rest[:1] in (['-C'], ['-c']):
+            rest = rest[2:]
+    rest = [w for w in rest if not w.startswith('-')]
+    return ' '.join([program] + rest[:1])
+
+
+def summary() -> str:
+    """
+    Compact timing summary of the recorded events.
+
+    Returns
+    -------
+    :
+        One line with total process time per command and the duration of each phase.
+    """
+    recorded = events()
+    by_command = {}
+    for event in recorded:
+        if event['kind'] == 'process':
+            name = _short_name(event['name'])
+            n, total = by_command.get(name, (0, 0.0))
+            by_command[name] = (n + 1, total + event['end'] - event['start'])
+    processes = ', '.join(f"{name} {total:.2f}s" + (f" ({n}x)" if n > 1 else '')
+                          for name, (n, total) in sorted(by_command.items(), key=lambda x: -x[1][1]))
+    phases = ', '.join(f"{e['name']} {e['end'] - e['start']:.2f}s"
+                       for e in recorded if e['kind'] == 'phase')
+    n_processes = sum(n for n, _ in by_command.values())
+    return f"Timing: {n_processes} processes [{processes}] phases [{phases}]"
+
+
+def chrome_trace() -> Dict[str, Any]:
+    """
+    Recorded events in Chrome trace format.
+
+    The result can be loaded in chrome://tracing, Perfetto or speedscope.
+
+    Returns
+    -------
+    :
+        Trace as a JSON serializable dictionary.
+    """
+    pid = os.getpid()
+    trace_events = []
+    for event in events():
+        args = {k: event[k] for k in ('returncode', 'output_size') if k in event}
+        trace_events.append(dict(name=event['name'], cat=event['kind'], ph='X', pid=pid,
+                                 tid=event['thread'], ts=event['start'] * 1e6,
+                                 dur=(event['end'] - event['start']) * 1e6, args=args))
+    return dict(traceEvents=trace_events, displayTimeUnit='ms')
+
+
+def profiled(func: Callable) -> Callable:
+    """
+    Decorator for commands adding a --profile option.
+
+    The command is recorded as a phase, a timing summary is written to the
+    log when it ends (also if it fails, so crash reports include it), and
+    with --profile a Chrome trace is written to the file given.
+
+    Parameters
+    ----------
+    func :
+        Command function.
+
+    Returns
+    -------
+    :
+        Decorated function.
+    """
+    @click.option('--profile', 'profile_path', default=None, metavar='FILE',
+                  help='Write a Chrome trace (JSON) of the command to FILE.')
+    @functools.wraps(func)
+    def wrapper(*args, profile_path=None, **kwargs):
+        try:
+            with phase(click.get_current_context().command_path):
+                return func(*args, **kwargs)
+        finally:
+            logger.debug(summary())
+            if profile_path:
+                with open(profile_path, 'w') as f:
+                    json.dump(chrome_trace(), f)
+    return wrapper
@@ -0,0 +1,267 @@
+import os
+import sys
+import time
+import random
+import hashlib
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from franklin.logger import logger
+
+from . import autosave
+from . import backend
+from . import network
+from .cache import cache_dir, read_json, write_json
+
+# git up --background commits locally and adds the repository to this queue,
+# which is a directory with one JSON file per repository. A detached worker
+# process (python -m franklin_educator.uploads) pushes the queued
+# repositories, retrying with exponential backoff, and removes the local
+# files once the push has gone through.
+
+# Seconds before the first retry, doubled for every failed attempt
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 30 * 60
+
+# Attempts before an upload is marked as failed
+MAX_ATTEMPTS = 10
+
+# Seconds between scans of the queue while the worker waits for a retry,
+# so repositories queued meanwhile do not wait for the retry
+SCAN_INTERVAL = 2
+
+_WORKER_LOCK = 'worker.pid'
+
+
+def queue_dir() -> Path:
+    """
+    Directory holding the upload queue.
+    """
+    return cache_dir('uploads')
+
+
+def _job_path(repo_local_path: str) -> Path:
+    key = hashlib.sha1(os.path.abspath(repo_local_path).encode()).hexdigest()[:16]
+    return queue_dir() / f'{key}.json'
+
+
+def jobs() -> List[Dict[str, Any]]:
+    """
+    Uploads in the queue.
+
+    Returns
+    -------
+    :
+        List of jobs, oldest first. Each has the path of the repository,
+        state ('pending' or 'failed'), attempts, last_error, queued and
+        next_attempt (unix times).
+    """
+    result = []
+    for path in queue_dir().glob('*.json'):
+        job = read_json(path)
+        if job is not None:
+            result.append(job)
+    return sorted(result, key=lambda job: job['queued'])
+
+
+def enqueue(repo_local_path: str, remove_tracked_files: bool, ignore: List[str]=()) -> None:
+    """
+    Adds a repository with local commits to the upload queue and makes
+    sure the worker is running.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    remove_tracked_files :
+        Remove the local files once the push has gone through.
+    ignore :
+        Paths whose unstaged changes do not prevent removal (see
+        cleanup.worktree_state).
+    """
+    job = dict(path=os.path.abspath(repo_local_path), remove_tracked_files=remove_tracked_files,
+               ignore=list(ignore), state='pending', attempts=0, last_error=None,
+               queued=time.time(), next_attempt=time.time())
+    write_json(_job_path(repo_local_path), job)
+    start_worker()
+
+
+def retry_failed() -> int:
+    """
+    Puts failed uploads back in the queue.
+
+    Returns
+    -------
+    :
+        Number of uploads queued again.
+    """
+    n = 0
+    for job in jobs():
+        if job['state'] == 'failed':
+            job.update(state='pending', attempts=0, next_attempt=time.time())
+            write_json(_job_path(job['path']), job)
+            n += 1
+    if n:
+        start_worker()
+    return n
+
+
+def _pid_alive(pid: int) -> bool:
+    import psutil
+    return psutil.pid_exists(pid)
+
+
+def _acquire_lock() -> bool:
+    lock = queue_dir() / _WORKER_LOCK
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            try:
+                pid = int(lock.read_text())
+            except (OSError, ValueError):
+                pid = None
+            if pid is not None and _pid_alive(pid):
+                return False
+            # left behind by a worker that died
+            lock.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _release_lock() -> None:
+    (queue_dir() / _WORKER_LOCK).unlink(missing_ok=True)
+
+
+def worker_running() -> bool:
+    """
+    Checks if the upload worker is running.
+
+    Returns
+    -------
+    :
+        True if a live worker holds the lock.
+    """
+    try:
+        return _pid_alive(int((queue_dir() / _WORKER_LOCK).read_text()))
+    except (OSError, ValueError):
+        return False
+
+
+def start_worker() -> None:
+    """
+    Starts the worker as a detached process, unless it is already running.
+    """
+    if worker_running():
+        return
+    backend.spawn_detached([sys.executable, '-m', 'franklin_educator.uploads'], cwd=str(queue_dir()))
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def upload(job: Dict[str, Any]) -> Optional[str]:
+    """
+    Pushes a queued repository.
+
+    Parameters
+    ----------
+    job :
+        Job from the queue.
+
+    Returns
+    -------
+    :
+        None if the upload is done, otherwise the reason it is not.
+    """
+    # imported here, as git imports this module
+    from . import git
+    from . import mirrors
+    from .backend import GitBackend
+
+    path = job['path']
+    if not os.path.exists(os.path.join(path, '.git')):
+        return None
+    repo = GitBackend(path)
+    try:
+        if git.git_safe_pull(path, interactive=False):
+            return 'conflict'
+        network.call(repo.git, 'push')
+    except subprocess.CalledProcessError as e:
+        return e.output.decode(errors='replace').strip() or str(e)
+    logger.debug(f"Uploaded {path}")
+    autosave.finish(path)
+    mirrors.update_from_clone(path)
+    if job['remove_tracked_files']:
+        git._remove_local_files(path, dry_run=False, secho=git._echo(False),
+                                ignore=set(job['ignore']))
+    return None
+
+
+def _requeued(job: Dict[str, Any]) -> bool:
+    # git up may queue the repository again while the job is being pushed,
+    # which replaces the job file with a new job
+    current = read_json(_job_path(job['path']))
+    return current is None or current['queued'] != job['queued']
+
+
+def _process_due_jobs() -> Optional[float]:
+    # Runs the jobs that are due and returns the time the next pending
+    # job is due, or None if there are none.
+    next_due = None
+    for job in jobs():
+        if job['state'] != 'pending':
+            continue
+        if job['next_attempt'] <= time.time():
+            error = upload(job)
+            if _requeued(job):
+                # the new job is run on the next scan
+                continue
+            if error is None:
+                _job_path(job['path']).unlink(missing_ok=True)
+                continue
+            job['attempts'] += 1
+            job['last_error'] = error
+            if error == 'conflict' or job['attempts'] >= MAX_ATTEMPTS:
+                # conflicts need the user, so they are not retried
+                job['state'] = 'failed'
+            else:
+                job['next_attempt'] = time.time() + _backoff(job['attempts'])
+            write_json(_job_path(job['path']), job)
+            if job['state'] == 'failed':
+                continue
+        if next_due is None or job['next_attempt'] < next_due:
+            next_due = job['next_attempt']
+    return next_due
+
+
+def work() -> None:
+    """
+    Drains the upload queue. Returns when no uploads are pending.
+    """
+    # workers started on many machines at once (e.g. at the end of a lab)
+    # should not all push at the same moment
+    network.spread_start()
+    while _acquire_lock():
+        try:
+            while True:
+                next_due = _process_due_jobs()
+                if next_due is None:
+                    break
+                time.sleep(min(SCAN_INTERVAL, max(0.0, next_due - time.time())))
+        finally:
+            _release_lock()
+        # a job may have been queued after the last check but before the
+        # lock was released, when no new worker could be started
+        if not any(job['state'] == 'pending' for job in jobs()):
+            break
+
+
+if __name__ == '__main__':
+    work()
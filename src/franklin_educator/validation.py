@@ -0,0 +1,204 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Tuple, List, Dict, Any
+
+from franklin.logger import logger
+
+from . import settings
+from .backend import GitBackend
+from .cache import cache_dir, read_json, write_json
+
+# Seconds a single cell may run
+CELL_TIMEOUT = 120
+
+# Validation modes: skip validation, report failures, or refuse to push them
+MODES = ('off', 'warn', 'block')
+
+# Notebooks run in the local Python environment rather than the exercise
+# image, so these failures may only mean that the environment differs.
+# They are reported but never block an upload.
+ENVIRONMENT_ERRORS = ('ModuleNotFoundError', 'ImportError')
+
+# Results kept in the cache. The oldest are dropped first.
+CACHE_SIZE = 1000
+
+_cache_lock = threading.Lock()
+
+
+def mode(repo_local_path: str, override: str=None) -> Tuple[str, int]:
+    """
+    Validation mode and cell timeout for a repository.
+
+    Read from franklin.yml, e.g.::
+
+        validate: block
+        cell_timeout: 300
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    override :
+        Mode given on the command line, which takes precedence.
+
+    Returns
+    -------
+    :
+        Mode ('off', 'warn' or 'block') and cell timeout in seconds.
+    """
+    repo_settings = settings.load(repo_local_path)
+    value = override or repo_settings.get('validate', 'off')
+    if value is True:
+        value = 'warn'
+    elif value is False or value not in MODES:
+        value = 'off'
+    return value, int(repo_settings.get('cell_timeout', CELL_TIMEOUT))
+
+
+def _cache_path():
+    return cache_dir('validation') / 'results.json'
+
+
+def _execute(path: str, content: bytes, cwd: str, timeout: int) -> Dict[str, Any]:
+    # Runs in a worker process: executes a notebook in its own kernel.
+    start = time.perf_counter()
+    try:
+        import nbformat
+        from nbclient import NotebookClient
+        from nbclient.exceptions import CellExecutionError, CellTimeoutError, DeadKernelError
+    except ImportError as e:
+        return dict(ok=False, error=f"notebooks cannot be run here ({e})", environment=True,
+                    seconds=time.perf_counter() - start)
+    error, environment = None, False
+    try:
+        notebook = nbformat.reads(content.decode(), as_version=4)
+        kernel = notebook.metadata.get('kernelspec', {}).get('name', 'python3')
+        client = NotebookClient(notebook, timeout=timeout, kernel_name=kernel,
+                                resources={'metadata': {'path': cwd}})
+        client.execute()
+    except CellTimeoutError:
+        error = f"a cell ran for more than {timeout} seconds"
+    except CellExecutionError as e:
+        # the last line names the exception, e.g. "NameError: name 'x' is not defined"
+        text = re.sub(r'\x1b\[[0-9;]*m', '', str(e))
+        lines = [line for line in text.strip().splitlines() if line.strip()]
+        error = lines[-1] if lines else 'cell failed'
+        environment = e.ename in ENVIRONMENT_ERRORS
+    except DeadKernelError:
+        error, environment = "the kernel died", True
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        # e.g. NoSuchKernel for a kernel that is not installed, or a
+        # kernel that does not start
+        environment = True
+    return dict(ok=error is None, error=error, environment=environment,
+                seconds=time.perf_counter() - start)
+
+
+def _staged_notebooks(repo: GitBackend) -> Dict[str, str]:
+    # staged notebooks and their blob ids, which identify the content
+    paths = [p for p in repo.records('diff', '--cached', '--name-only', '--diff-filter=AM', '-z')
+             if p.endswith('.ipynb')]
+    if not paths:
+        return {}
+    blobs = {}
+    for record in repo.records('ls-files', '--stage', '-z', '--', *paths):
+        info, _, path = record.partition('\t')
+        blobs[path] = info.split()[1]
+    return blobs
+
+
+def validation_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for validating several repositories at the same time.
+
+    Passing the same pool to each validate_staged call limits the 
+    kernels running at once to the number of CPUs, however many 
+    repositories are validated concurrently.
+
+    Returns
+    -------
+    :
+        Process pool with one worker per CPU.
+    """
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+
+
+def validate_staged(repo_local_path: str, timeout: int=CELL_TIMEOUT,
+                    max_workers: int=None, pool: Executor=None) -> List[Dict[str, Any]]:
+    """
+    Executes the staged notebooks to check that they run.
+
+    Each notebook runs in its own process and kernel, in the local 
+    Python environment. Failures that may come from that environment
+    rather than the notebook (a kernel that is missing or dies, or a
+    failing import) are marked with environment set to True. Results
+    are cached by the git blob id of the notebook (and the timeout), so
+    a notebook is only run again when its content changes. Environment
+    failures are not cached, and only the CACHE_SIZE most recent
+    results are kept.
+
+    Parameters
+    ----------
+    repo_local_path :
+        Path to the local repository.
+    timeout :
+        Seconds a single cell may run.
+    max_workers :
+        Notebooks run at the same time. Defaults to the number of CPUs.
+    pool :
+        Process pool to run the notebooks in, shared with other calls 
+        (see validation_pool). Replaces max_workers.
+
+    Returns
+    -------
+    :
+        One dictionary per notebook with path, ok, error, environment,
+        seconds and cached (True if the result is from an earlier run).
+    """
+    with GitBackend(repo_local_path) as repo:
+        blobs = _staged_notebooks(repo)
+        if not blobs:
+            return []
+        with _cache_lock:
+            cached = read_json(_cache_path()) or {}
+        results, to_run = [], {}
+        for path, blob in blobs.items():
+            key = f'{blob}:{timeout}'
+            if key in cached:
+                result = {k: v for k, v in cached[key].items() if k != 'validated'}
+                results.append(dict(result, path=path, environment=False, cached=True))
+            else:
+                to_run[path] = (key, repo.cat_file.read(blob))
+
+    if to_run:
+        if pool is None:
+            workers = min(len(to_run), max_workers or os.cpu_count() or 1)
+            pool_context = ProcessPoolExecutor(max_workers=workers)
+        else:
+            pool_context = nullcontext(pool)
+        with pool_context as pool:
+            futures = {}
+            for path, (key, content) in to_run.items():
+                cwd = os.path.join(os.path.abspath(repo_local_path), os.path.dirname(path))
+                futures[path] = pool.submit(_execute, path, content, cwd, timeout)
+            new = {}
+            for path, future in futures.items():
+                result = future.result()
+                logger.debug(f"Validated {path}: {result}")
+                if not result['environment']:
+                    new[to_run[path][0]] = dict(result, validated=time.time())
+                results.append(dict(result, path=path, cached=False))
+        with _cache_lock:
+            cached = read_json(_cache_path()) or {}
+            cached.update(new)
+            if len(cached) > CACHE_SIZE:
+                newest = sorted(cached, key=lambda k: cached[k].get('validated', 0))[-CACHE_SIZE:]
+                cached = {k: cached[k] for k in newest}
+            write_json(_cache_path(), cached)
+
+    return sorted(results, key=lambda r: r['path'])
@@ -0,0 +1,272 @@
+import os
+import sys
+import time
+import socket
+import secrets
+import hashlib
+from pathlib import Path
+from urllib.parse import quote
+from typing import List, Dict, Any, Optional
+
+from franklin.logger import logger
+
+from . import backend
+from .cache import cache_dir, read_json, write_json
+
+# With exercise edit --warm, the Jupyter container is left running for a
+# while after the edit cycle, so the next cycle with the same image skips
+# container creation and the Jupyter server boot. Exercises edited this way
+# are cloned into a workspace directory managed by franklin, and the
+# container mounts that directory rather than the clone itself (mounts
+# cannot change once a container runs), so a fresh clone shows up in the
+# running container while no other files of the user are visible in it.
+# Every warm container has a JSON state file in the cache, and a detached
+# reaper process (python -m franklin_educator.warm NAME) removes it when it
+# has been idle for too long.
+
+# Minutes a warm container is kept after an edit cycle
+IDLE_MINUTES = 15
+
+# Warm containers kept at most; the ones idle the longest are removed first
+POOL_SIZE = 2
+
+# Where the workspace appears in the container
+WORK_DIR = '/home/jovyan/work'
+
+# Seconds to wait for the Jupyter server in a new container
+START_TIMEOUT = 120
+
+LABEL = 'franklin.warm'
+
+
+def workspace() -> Path:
+    """
+    Directory exercises edited in warm containers are cloned into, and 
+    the only directory mounted in them. Created if needed.
+    """
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        root = Path(os.environ['LOCALAPPDATA']) / 'franklin'
+    else:
+        root = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share')) / 'franklin'
+    path = root / 'workspace'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def state_dir() -> Path:
+    """
+    Directory with the state of warm containers.
+    """
+    return cache_dir('warm')
+
+
+def _state_path(name: str) -> Path:
+    return state_dir() / f'{name}.json'
+
+
+def containers() -> List[Dict[str, Any]]:
+    """
+    Warm containers known to franklin.
+
+    Returns
+    -------
+    :
+        List of container states with name, image, digest, mount, port,
+        token and idle_until (unix time, or None while in use).
+    """
+    result = []
+    for path in state_dir().glob('*.json'):
+        state = read_json(path)
+        if state is not None:
+            result.append(state)
+    return result
+
+
+def image_digest(image_url: str) -> Optional[str]:
+    """
+    Id of a local Docker image.
+
+    Parameters
+    ----------
+    image_url :
+        Image URL.
+
+    Returns
+    -------
+    :
+        Image id (sha256 digest of its configuration), or None if the
+        image is not available locally.
+    """
+    result = backend.run(['docker', 'image', 'inspect', '--format', '{{.Id}}', image_url], check=False)
+    if result.returncode:
+        return None
+    return result.stdout.decode().strip() or None
+
+
+def _container_name(digest: str, mount: str) -> str:
+    # one container per image and workspace
+    mount_key = hashlib.sha1(mount.encode()).hexdigest()[:8]
+    return f"franklin-warm-{digest.split(':')[-1][:12]}-{mount_key}"
+
+
+def _running(name: str) -> bool:
+    result = backend.run(['docker', 'inspect', '--format', '{{.State.Running}}', name], check=False)
+    return result.returncode == 0 and result.stdout.decode().strip() == 'true'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def remove(name: str) -> None:
+    """
+    Removes a warm container and its state.
+
+    Parameters
+    ----------
+    name :
+        Container name.
+    """
+    logger.debug(f"Removing warm container {name}")
+    backend.run(['docker', 'rm', '--force', name], check=False)
+    _state_path(name).unlink(missing_ok=True)
+
+
+def _wait_for_server(name: str, timeout: float=START_TIMEOUT, interval: float=0.5) -> bool:
+    # Jupyter logs "Jupyter Server ... is running at:" once it serves requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = backend.run(['docker', 'logs', name], check=False)
+        if result.returncode:
+            return False
+        if b'is running at' in result.stdout + result.stderr:
+            return True
+        time.sleep(interval)
+    return False
+
+
+def _start(name: str, image_url: str, digest: str, mount: str) -> Dict[str, Any]:
+    port, token = _free_port(), secrets.token_hex(16)
+    backend.run(['docker', 'run', '--detach', '--name', name, '--label', f'{LABEL}=1',
+                 '--publish', f'127.0.0.1:{port}:8888', '--volume', f'{mount}:{WORK_DIR}',
+                 image_url, 'jupyter', 'lab', '--no-browser', '--ip=0.0.0.0', '--port=8888',
+                 f'--ServerApp.token={token}', f'--ServerApp.root_dir={WORK_DIR}'])
+    if not _wait_for_server(name):
+        remove(name)
+        raise RuntimeError(f"Jupyter did not start in {image_url}")
+    return dict(name=name, image=image_url, digest=digest, mount=mount,
+                port=port, token=token, idle_until=None)
+
+
+def _evict(keep: str) -> None:
+    # removes the idle containers beyond the pool size, longest idle first
+    idle = sorted((state for state in containers()
+                   if state['idle_until'] is not None and state['name'] != keep),
+                  key=lambda state: state['idle_until'])
+    for state in idle[:max(0, len(idle) + 1 - POOL_SIZE)]:
+        remove(state['name'])
+
+
+def acquire(image_url: str) -> Dict[str, Any]:
+    """
+    Gets a running Jupyter container for an image, reusing a warm one if
+    there is one for the same image. The container mounts the workspace.
+
+    Parameters
+    ----------
+    image_url :
+        Image URL. The image must be available locally.
+
+    Returns
+    -------
+    :
+        Container state (see containers). The container is marked as in
+        use until it is released.
+    """
+    mount = str(workspace())
+    digest = image_digest(image_url)
+    if digest is None:
+        raise RuntimeError(f"Image {image_url} is not available locally")
+    name = _container_name(digest, mount)
+    state = read_json(_state_path(name))
+    if state is not None and _running(name):
+        logger.debug(f"Reusing warm container {name}")
+    else:
+        if state is not None:
+            remove(name)
+        _evict(keep=name)
+        logger.debug(f"Starting warm container {name}")
+        state = _start(name, image_url, digest, mount)
+    state['idle_until'] = None
+    write_json(_state_path(name), state)
+    return state
+
+
+def url(state: Dict[str, Any], repo_local_path: str) -> str:
+    """
+    Url of JupyterLab opened in an exercise repository.
+
+    Parameters
+    ----------
+    state :
+        Container state from acquire.
+    repo_local_path :
+        Path to the local repository, which must be in the workspace.
+
+    Returns
+    -------
+    :
+        Url with the access token.
+    """
+    relative = os.path.relpath(os.path.abspath(repo_local_path), state['mount'])
+    path = quote(Path(relative).as_posix())
+    return f"http://127.0.0.1:{state['port']}/lab/tree/{path}?token={state['token']}"
+
+
+def release(state: Dict[str, Any], idle_minutes: float=IDLE_MINUTES) -> None:
+    """
+    Marks a container as idle and starts the reaper that removes it
+    when it has not been used again within the idle period.
+
+    Parameters
+    ----------
+    state :
+        Container state from acquire.
+    idle_minutes :
+        Minutes to keep the container. With 0 it is removed right away.
+    """
+    if idle_minutes <= 0:
+        remove(state['name'])
+        return
+    state['idle_until'] = time.time() + idle_minutes * 60
+    write_json(_state_path(state['name']), state)
+    backend.spawn_detached([sys.executable, '-m', 'franklin_educator.warm', state['name']],
+                           cwd=str(state_dir()))
+
+
+def reap(name: str) -> None:
+    """
+    Waits until a container has been idle for its idle period and removes
+    it. Returns early if the container is in use or removed.
+
+    Parameters
+    ----------
+    name :
+        Container name.
+    """
+    while True:
+        state = read_json(_state_path(name))
+        if state is None or state['idle_until'] is None:
+            # removed, or in use (the next release starts a new reaper)
+            return
+        remaining = state['idle_until'] - time.time()
+        if remaining <= 0:
+            remove(name)
+            return
+        time.sleep(remaining)
+
+
+if __name__ == '__main__':
+    reap(sys.argv[1])
@@ -0,0 +1,289 @@
+"""
+Offline benchmark of the down/edit/up cycle.
+
+Local bare repositories stand in for GitLab (git@<domain>:<group>/...
+urls are rewritten to file:// urls), the registry listing and exercise
+selection are stubbed, and docker and jupyter are replaced by fakes. The
+real franklin_educator.git functions are then run without any prompts,
+reporting per phase the wall time, the processes spawned, the bytes
+written to disk by franklin and the git processes it waited for, and the
+change in disk usage of the sandbox.
+
+Run from the repository root (POSIX only, since the fake docker is a
+shell script):
+
+    python -m test.benchmark --sizes 10 100 1000 10000
+"""
+import os
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import psutil
+
+from franklin import config as cfg
+from franklin import gitlab
+from franklin import jupyter
+from franklin import docker
+from franklin import utils
+
+from franklin_educator import api
+from franklin_educator import autosave
+from franklin_educator import backend
+from franklin_educator import git
+from franklin_educator import warm
+
+COURSE = 'benchcourse'
+IMAGE = 'registry.example.org/bench/image:main'
+
+# Containers are files in $FAKE_DOCKER_STATE holding the time their
+# Jupyter server is up, one second after they are started.
+FAKE_DOCKER = '''#!/bin/sh
+case "$1" in
+  pull) echo "layer1: Pull complete"; echo "Status: Image is up to date for $2" ;;
+  image) if [ "$4" = "{{.Id}}" ]; then echo "sha256:0123456789abcdef"; 
+         else echo "2000-01-01T00:00:00.000000000Z"; fi ;;
+  run) while [ "$1" != "--name" ]; do shift; done
+       echo $(( $(date +%s) + 1 )) > "$FAKE_DOCKER_STATE/$2"; echo "$2" ;;
+  inspect) [ -f "$FAKE_DOCKER_STATE/$4" ] || exit 1; echo true ;;
+  logs) [ -f "$FAKE_DOCKER_STATE/$2" ] || exit 1
+        [ "$(date +%s)" -ge "$(cat "$FAKE_DOCKER_STATE/$2")" ] && echo "Jupyter Server is running at:" ;;
+  rm) rm -f "$FAKE_DOCKER_STATE/$3" ;;
+esac
+exit 0
+'''
+
+
+def tree_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class Bench():
+    """
+    Sandbox with fake remotes, caches and tools.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.remotes = os.path.join(root, 'remotes')
+        self.work = os.path.join(root, 'work')
+        os.makedirs(self.work)
+        bin_dir = os.path.join(root, 'bin')
+        os.makedirs(bin_dir)
+        with open(os.path.join(bin_dir, 'docker'), 'w') as f:
+            f.write(FAKE_DOCKER)
+        os.chmod(os.path.join(bin_dir, 'docker'), 0o755)
+        os.makedirs(os.path.join(root, 'containers'))
+
+        os.environ.update({
+            'PATH': bin_dir + os.pathsep + os.environ['PATH'],
+            'XDG_CACHE_HOME': os.path.join(root, 'cache'),
+            'XDG_DATA_HOME': os.path.join(root, 'data'),
+            'GIT_CONFIG_GLOBAL': os.path.join(root, 'gitconfig'),
+            'GIT_CONFIG_NOSYSTEM': '1',
+            'GIT_AUTHOR_NAME': 'bench', 'GIT_AUTHOR_EMAIL': 'bench@example.org',
+            'GIT_COMMITTER_NAME': 'bench', 'GIT_COMMITTER_EMAIL': 'bench@example.org',
+            'DEVEL': '1',
+            'FAKE_DOCKER_STATE': os.path.join(root, 'containers'),
+            # one client, so no start delay is needed
+            'FRANKLIN_NETWORK_JITTER': '0',
+        })
+        subprocess.run(['git', 'config', '--global',
+                        f'url.file://{self.remotes}/.insteadOf',
+                        f'git@{cfg.gitlab_domain}:{cfg.gitlab_group}/'], check=True)
+        subprocess.run(['git', 'config', '--global', 'uploadpack.allowFilter', 'true'], check=True)
+
+        # nothing may reach the network
+        cfg.gitlab_api_url = 'http://127.0.0.1:9'
+        self.exercise = None
+        api.registry_listing = lambda pages=None: {(COURSE, self.exercise): IMAGE}
+        gitlab.select_exercise = lambda listing: ((COURSE, COURSE), (self.exercise, self.exercise))
+        utils.check_internet_connection = lambda: None
+        utils.check_free_disk_space = lambda: None
+        docker.failsafe_start_docker_desktop = lambda: None
+        jupyter.launch_jupyter = lambda image_url, cwd=None: self.edit(cwd)
+
+    def make_remote(self, name: str, n_files: int, binaries: bool) -> None:
+        """
+        Creates a bare remote with a synthetic exercise.
+        """
+        remote = os.path.join(self.remotes, COURSE, f'{name}.git')
+        subprocess.run(['git', 'init', '-q', '--bare', remote], check=True)
+        # GitLab accepts push options such as ci.skip
+        subprocess.run(['git', '-C', remote, 'config', 'receive.advertisePushOptions', 'true'], check=True)
+        seed = os.path.join(self.root, 'seed', name)
+        subprocess.run(['git', 'clone', '-q', remote, seed], check=True, stderr=subprocess.DEVNULL)
+        rng = random.Random(n_files)
+        for i in range(n_files):
+            subdir = os.path.join(seed, f'dir{i % 20}')
+            os.makedirs(subdir, exist_ok=True)
+            with open(os.path.join(subdir, f'file{i}.py'), 'w') as f:
+                f.write(''.join(rng.choice('abcdefgh \n') for _ in range(500)))
+        if binaries:
+            os.makedirs(os.path.join(seed, 'data'), exist_ok=True)
+            for i in range(2):
+                with open(os.path.join(seed, 'data', f'data{i}.bin'), 'wb') as f:
+                    f.write(os.urandom(20 * 1024**2))
+        subprocess.run(['git', '-C', seed, 'add', '.'], check=True)
+        subprocess.run(['git', '-C', seed, 'commit', '-qm', 'Initial commit'], check=True)
+        subprocess.run(['git', '-C', seed, 'push', '-q', 'origin', 'HEAD'], check=True)
+        self.exercise = name
+        self.seed = seed
+
+    def edit(self, repo_local_path: str) -> None:
+        """
+        Fake Jupyter session changing a tenth of the files.
+        """
+        path = os.path.join(self.work, os.path.basename(repo_local_path))
+        files = subprocess.run(['git', '-C', path, 'ls-files'], capture_output=True,
+                               text=True, check=True).stdout.split()
+        for name in files[::10]:
+            with open(os.path.join(path, name), 'a') as f:
+                f.write('edited\n')
+
+    def upstream_change(self) -> None:
+        """
+        Pushes a commit to the remote from another clone.
+        """
+        subprocess.run(['git', '-C', self.seed, 'pull', '-q', '--ff-only'], check=True)
+        with open(os.path.join(self.seed, 'upstream.txt'), 'a') as f:
+            f.write('change\n')
+        subprocess.run(['git', '-C', self.seed, 'add', '.'], check=True)
+        subprocess.run(['git', '-C', self.seed, 'commit', '-qm', 'Upstream change'], check=True)
+        subprocess.run(['git', '-C', self.seed, 'push', '-q', 'origin', 'HEAD'], check=True)
+
+
+def bytes_written() -> Optional[int]:
+    # Bytes this process has caused to be written to storage. On Linux the
+    # counters of child processes are added to the parent's when they are
+    # waited for, so this covers the git processes too (but not detached
+    # ones, such as the upload worker). None where psutil has no counters.
+    if not hasattr(psutil.Process, 'io_counters'):
+        return None
+    return psutil.Process().io_counters().write_bytes
+
+
+@contextmanager
+def measure(results: List[Dict[str, Any]], root: str, **labels: Any):
+    spawned = backend.spawned()
+    size = tree_size(root)
+    written = bytes_written()
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    results.append(dict(labels,
+                        seconds=seconds,
+                        processes=backend.spawned() - spawned,
+                        written=None if written is None else bytes_written() - written,
+                        disk_delta=tree_size(root) - size))
+
+
+def run_benchmark(sizes: List[int], binaries: List[bool],
+                  partial_clone: bool=False) -> List[Dict[str, Any]]:
+    """
+    Runs the down/edit/up phases for synthetic exercises.
+
+    Parameters
+    ----------
+    sizes :
+        Numbers of files in the synthetic exercises.
+    binaries :
+        For each size, whether to run with and/or without large binary files.
+    partial_clone :
+        Use partial clones.
+
+    Returns
+    -------
+    :
+        One dictionary per phase and exercise.
+    """
+    results = []
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp(prefix='franklin-bench-')
+    try:
+        bench = Bench(root)
+        os.chdir(bench.work)
+        for n_files in sizes:
+            for with_binaries in binaries:
+                name = f'ex{n_files}{"b" if with_binaries else ""}'
+                bench.make_remote(name, n_files, with_binaries)
+                path = os.path.join(bench.work, name)
+                labels = dict(files=n_files, binaries=with_binaries)
+
+                with measure(results, root, phase='down (cold)', **labels):
+                    git.git_down(refresh=True, partial_clone=partial_clone)
+                with measure(results, root, phase='edit', **labels):
+                    bench.edit(path)
+                with measure(results, root, phase='up', **labels):
+                    git.git_up(path, remove_tracked_files=True, message='bench')
+                with measure(results, root, phase='down (warm)', **labels):
+                    git.git_down(refresh=True, partial_clone=partial_clone)
+                bench.upstream_change()
+                with measure(results, root, phase='safe pull', **labels):
+                    git.git_safe_pull(path, interactive=False)
+                with measure(results, root, phase='up (clean)', **labels):
+                    git.git_up(path, remove_tracked_files=True, message='bench')
+
+                # a session with autosave, where most changes are in a 
+                # checkpoint before git up
+                git.git_down(refresh=True, partial_clone=partial_clone)
+                bench.edit(path)
+                with measure(results, root, phase='checkpoint', **labels):
+                    autosave.checkpoint(path)
+                with measure(results, root, phase='up (autosaved)', **labels):
+                    git.git_up(path, remove_tracked_files=True, message='bench')
+
+        # Jupyter container for two edit cycles in a row with --warm
+        labels = dict(files=0, binaries=False)
+        with measure(results, root, phase='container (cold)', **labels):
+            container = warm.acquire(IMAGE)
+        warm.release(container, idle_minutes=0.1)
+        with measure(results, root, phase='container (warm)', **labels):
+            container = warm.acquire(IMAGE)
+        warm.remove(container['name'])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'files':>6} {'bin':>4} {'phase':<16} {'seconds':>8} {'procs':>6} "
+          f"{'written MB':>10} {'disk +MB':>9}")
+    for r in results:
+        written = 'n/a' if r['written'] is None else f"{r['written'] / 1024**2:.2f}"
+        print(f"{r['files']:>6} {'yes' if r['binaries'] else 'no':>4} {r['phase']:<16} "
+              f"{r['seconds']:>8.3f} {r['processes']:>6} {written:>10} {r['disk_delta'] / 1024**2:>9.2f}")
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--binaries', choices=['with', 'without', 'both'], default='both')
+    parser.add_argument('--partial', action='store_true', help='Use partial clones.')
+    parser.add_argument('--json', metavar='FILE', help='Also write results to a JSON file.')
+    args = parser.parse_args(argv)
+
+    binaries = {'with': [True], 'without': [False], 'both': [False, True]}[args.binaries]
+    results = run_benchmark(args.sizes, binaries, args.partial)
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
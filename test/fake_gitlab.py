@@ -0,0 +1,77 @@
+"""
+A GitLab API stand-in serving paginated listings over HTTP.
+
+Listings are served with the pagination headers GitLab sends (X-Total,
+X-Total-Pages, X-Next-Page) and an ETag, and conditional requests are
+answered with 304 Not Modified.
+"""
+import json
+import math
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Any
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self.server.requests.append((self.command, self.path, {}))
+        self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((self.command, url.path, query))
+        path = url.path.removeprefix('/api/v4/')
+        if path not in self.server.listings:
+            self.send_error(404)
+            return
+        items = self.server.listings[path]
+        per_page = int(query.get('per_page', 20))
+        page = int(query.get('page', 1))
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        body = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+        etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        headers = {'X-Total': str(len(items)), 'X-Total-Pages': str(total_pages),
+                   'X-Page': str(page), 'X-Next-Page': str(page + 1) if page < total_pages else ''}
+        if self.server.etags:
+            headers['ETag'] = etag
+        if self.server.etags and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            body = b''
+        else:
+            self.send_response(200)
+            headers['Content-Type'] = 'application/json'
+            headers['Content-Length'] = str(len(body))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGitLab(ThreadingHTTPServer):
+    """
+    Serves listings (a mapping of API path to items) on a free local port.
+    """
+
+    def __init__(self, listings: Dict[str, List[Any]], etags: bool=True) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.listings = listings
+        self.etags = etags
+        self.requests = []
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    @property
+    def api_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/api/v4'
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,170 @@
+"""
+Simulated lab start: many clients cloning the same exercise at once.
+
+A local bare repository stands in for GitLab, reached over a fake ssh
+that serves a limited number of sessions at a time (turning the rest
+away as an overloaded sshd does) and drops a share of connections at
+random. Each client is a separate process running either a plain git
+clone or franklin_educator.network.clone, and the success rate and
+latency percentiles are reported for both.
+
+Run from the repository root (POSIX only):
+
+    python -m test.load --clients 50 --capacity 8 --failure-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import subprocess
+from typing import List, Dict, Any
+
+FAKE_SSH = '''#!{python}
+import os, sys, time, random, subprocess
+if random.random() < float(os.environ['FAKE_SSH_FAILURE_RATE']):
+    sys.stderr.write('Connection reset by peer\\r\\n')
+    sys.exit(255)
+slots = os.environ['FAKE_SSH_SLOTS']
+for i in range(int(os.environ['FAKE_SSH_CAPACITY'])):
+    slot = os.path.join(slots, str(i))
+    try:
+        os.mkdir(slot)
+        break
+    except FileExistsError:
+        pass
+else:
+    sys.stderr.write('kex_exchange_identification: Connection closed by remote host\\r\\n')
+    sys.exit(255)
+try:
+    time.sleep(float(os.environ['FAKE_SSH_LATENCY']))
+    sys.exit(subprocess.call(['sh', '-c', sys.argv[-1]]))
+finally:
+    os.rmdir(slot)
+'''
+
+
+def make_remote(root: str, n_files: int) -> str:
+    remote = os.path.join(root, 'remote.git')
+    seed = os.path.join(root, 'seed')
+    subprocess.run(['git', 'init', '-q', '--bare', remote], check=True)
+    subprocess.run(['git', 'init', '-q', seed], check=True)
+    rng = random.Random(n_files)
+    for i in range(n_files):
+        with open(os.path.join(seed, f'file{i}.py'), 'w') as f:
+            f.write(''.join(rng.choice('abcdefgh \n') for _ in range(2000)))
+    subprocess.run(['git', '-C', seed, 'add', '.'], check=True)
+    subprocess.run(['git', '-C', seed, 'commit', '-qm', 'Initial commit'], check=True)
+    subprocess.run(['git', '-C', seed, 'push', '-q', remote, 'HEAD:main'], check=True)
+    subprocess.run(['git', '-C', remote, 'symbolic-ref', 'HEAD', 'refs/heads/main'], check=True)
+    return remote
+
+
+def client(mode: str, clone_url: str, path: str) -> None:
+    # runs in a client process and prints its result as JSON
+    start = time.perf_counter()
+    try:
+        if mode == 'plain':
+            subprocess.run(['git', 'clone', '--quiet', clone_url, path], check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        else:
+            from franklin_educator import network
+            network.clone(clone_url, path)
+        ok = os.path.exists(os.path.join(path, 'file0.py'))
+    except subprocess.CalledProcessError:
+        ok = False
+    print(json.dumps(dict(ok=ok, seconds=time.perf_counter() - start)))
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def run_load(mode: str, clients: int, root: str, clone_url: str, env: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Starts all clients at once and waits for them.
+
+    Returns
+    -------
+    :
+        Mode, clients, successes, success rate, median and 95th
+        percentile seconds of the successful clones, and wall time.
+    """
+    work = os.path.join(root, mode)
+    os.makedirs(work)
+    start = time.perf_counter()
+    procs = [subprocess.Popen([sys.executable, '-m', 'test.load', '--client', mode, clone_url,
+                               os.path.join(work, f'client{i}')],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+             for i in range(clients)]
+    results = []
+    for proc in procs:
+        stdout, _ = proc.communicate()
+        try:
+            results.append(json.loads(stdout.decode().strip().splitlines()[-1]))
+        except (ValueError, IndexError):
+            results.append(dict(ok=False, seconds=float('nan')))
+    wall = time.perf_counter() - start
+    times = [r['seconds'] for r in results if r['ok']]
+    return dict(mode=mode, clients=clients, ok=len(times), success=len(times) / clients,
+                p50=percentile(times, 50), p95=percentile(times, 95), wall=wall)
+
+
+def main(argv: List[str]=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--capacity', type=int, default=8, help='Sessions the fake server serves at a time.')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='Share of connections dropped.')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds added to every session.')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--jitter', type=float, default=None, help='Start jitter of the franklin clients (off by default, as for interactive commands).')
+    parser.add_argument('--modes', nargs='+', default=['plain', 'franklin'], choices=['plain', 'franklin'])
+    parser.add_argument('--client', nargs=3, metavar=('MODE', 'URL', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.client:
+        client(*args.client)
+        return
+
+    root = tempfile.mkdtemp(prefix='franklin-load-')
+    # commits in the seed repository need an identity, which may not be configured
+    os.environ.update({
+        'GIT_AUTHOR_NAME': 'load', 'GIT_AUTHOR_EMAIL': 'load@example.org',
+        'GIT_COMMITTER_NAME': 'load', 'GIT_COMMITTER_EMAIL': 'load@example.org',
+    })
+    try:
+        remote = make_remote(root, args.files)
+        fake_ssh = os.path.join(root, 'fake-ssh')
+        with open(fake_ssh, 'w') as f:
+            f.write(FAKE_SSH.format(python=sys.executable))
+        os.chmod(fake_ssh, 0o755)
+        os.makedirs(os.path.join(root, 'slots'))
+        env = dict(os.environ,
+                   GIT_SSH_COMMAND=fake_ssh, GIT_SSH_VARIANT='simple',
+                   FAKE_SSH_SLOTS=os.path.join(root, 'slots'),
+                   FAKE_SSH_CAPACITY=str(args.capacity),
+                   FAKE_SSH_FAILURE_RATE=str(args.failure_rate),
+                   FAKE_SSH_LATENCY=str(args.latency),
+                   XDG_CACHE_HOME=os.path.join(root, 'cache'),
+                   PYTHONPATH=os.pathsep.join(os.path.abspath(p) for p in
+                                              os.environ.get('PYTHONPATH', '').split(os.pathsep) + ['.'] if p))
+        if args.jitter is not None:
+            env['FRANKLIN_NETWORK_JITTER'] = str(args.jitter)
+
+        print(f"{'mode':<10} {'clients':>7} {'ok':>4} {'success':>8} {'p50 s':>7} {'p95 s':>7} {'wall s':>7}")
+        for mode in args.modes:
+            r = run_load(mode, args.clients, root, f'ssh://fakehost{remote}', env)
+            print(f"{r['mode']:<10} {r['clients']:>7} {r['ok']:>4} {r['success']:>8.0%} "
+                  f"{r['p50']:>7.2f} {r['p95']:>7.2f} {r['wall']:>7.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Temporary git remotes and clones for the tests.
+
+Local bare repositories stand in for GitLab, and the caches, the git
+config and the git identity are confined to a temporary directory.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from unittest import mock
+from typing import Dict
+
+
+def git(path: str, *args: str) -> str:
+    return subprocess.run(['git', '-C', path, *args], check=True,
+                          capture_output=True, text=True).stdout
+
+
+class SandboxTestCase(unittest.TestCase):
+    """
+    Test case running in a temporary directory with its own cache and git config.
+    """
+
+    def setUp(self) -> None:
+        self.root = tempfile.mkdtemp(prefix='franklin-test-')
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        env = mock.patch.dict(os.environ, {
+            'XDG_CACHE_HOME': os.path.join(self.root, 'cache'),
+            'XDG_DATA_HOME': os.path.join(self.root, 'data'),
+            'GIT_CONFIG_GLOBAL': os.path.join(self.root, 'gitconfig'),
+            'GIT_CONFIG_NOSYSTEM': '1',
+            'GIT_AUTHOR_NAME': 'test', 'GIT_AUTHOR_EMAIL': 'test@example.org',
+            'GIT_COMMITTER_NAME': 'test', 'GIT_COMMITTER_EMAIL': 'test@example.org',
+            'FRANKLIN_NETWORK_JITTER': '0',
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        open(os.environ['GIT_CONFIG_GLOBAL'], 'w').close()
+
+    def fake_command(self, name: str, script: str) -> None:
+        """
+        Puts a shell script first on the PATH in place of a command.
+        """
+        bin_dir = os.path.join(self.root, 'bin')
+        if not os.path.isdir(bin_dir):
+            os.makedirs(bin_dir)
+            env = mock.patch.dict(os.environ, {'PATH': bin_dir + os.pathsep + os.environ['PATH']})
+            env.start()
+            self.addCleanup(env.stop)
+        with open(os.path.join(bin_dir, name), 'w') as f:
+            f.write(script)
+        os.chmod(os.path.join(bin_dir, name), 0o755)
+
+    def make_remote(self, name: str, files: Dict[str, str]) -> str:
+        """
+        Creates a bare repository with one commit holding the files.
+        """
+        remote = os.path.join(self.root, 'remotes', f'{name}.git')
+        subprocess.run(['git', 'init', '-q', '--bare', '--initial-branch=main', remote], check=True)
+        # GitLab accepts push options such as ci.skip
+        git(remote, 'config', 'receive.advertisePushOptions', 'true')
+        seed = os.path.join(self.root, 'seed', name)
+        subprocess.run(['git', 'init', '-q', '--initial-branch=main', seed], check=True)
+        self.write(seed, files)
+        self.commit(seed, 'Initial commit')
+        git(seed, 'push', '-q', remote, 'main')
+        return remote
+
+    def exercise_remote(self, course: str, exercise: str, files: Dict[str, str]) -> str:
+        """
+        Creates a bare repository reached through the exercise url (see
+        franklin_educator.git.exercise_url) of an exercise.
+        """
+        from franklin import config as cfg
+        git(self.root, 'config', '--global', f'url.file://{self.root}/remotes/.insteadOf',
+            f'git@{cfg.gitlab_domain}:{cfg.gitlab_group}/')
+        return self.make_remote(f'{course}/{exercise}', files)
+
+    def clone(self, remote: str, name: str) -> str:
+        path = os.path.join(self.root, 'work', name)
+        subprocess.run(['git', 'clone', '-q', remote, path], check=True)
+        return path
+
+    def write(self, path: str, files: Dict[str, str]) -> None:
+        for name, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(path, name)), exist_ok=True)
+            with open(os.path.join(path, name), 'w') as f:
+                f.write(content)
+
+    def commit(self, path: str, message: str) -> str:
+        git(path, 'add', '-A')
+        git(path, 'commit', '-q', '-m', message)
+        return git(path, 'rev-parse', 'HEAD').strip()
+
+    def upstream_change(self, remote: str, files: Dict[str, str]) -> str:
+        """
+        Pushes a commit to the remote from another clone.
+        """
+        other = os.path.join(self.root, 'other', os.path.basename(remote))
+        if not os.path.exists(other):
+            subprocess.run(['git', 'clone', '-q', remote, other], check=True)
+        git(other, 'pull', '-q', '--ff-only')
+        self.write(other, files)
+        commit = self.commit(other, 'Upstream change')
+        git(other, 'push', '-q', 'origin', 'HEAD')
+        return commit
@@ -0,0 +1,77 @@
+import os
+import time
+
+from franklin_educator import autosave
+
+from .sandbox import SandboxTestCase, git
+
+
+class TestAutosave(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n'})
+        self.path = self.clone(self.remote, 'exercise')
+        self.head = git(self.path, 'rev-parse', 'HEAD').strip()
+        # records the push options of every push
+        hook = os.path.join(self.remote, 'hooks', 'pre-receive')
+        with open(hook, 'w') as f:
+            f.write('#!/bin/sh\necho "$GIT_PUSH_OPTION_0" >> push-options\n')
+        os.chmod(hook, 0o755)
+
+    def push_options(self):
+        with open(os.path.join(self.remote, 'push-options')) as f:
+            return f.read().split()
+
+    def test_checkpoint(self):
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+
+        commit = autosave.checkpoint(self.path)
+
+        self.assertEqual(git(self.path, 'rev-parse', autosave.checkpoint_ref('main')).strip(), commit)
+        self.assertEqual(git(self.path, 'rev-parse', f'{commit}^').strip(), self.head)
+        # the branch itself is left alone
+        self.assertEqual(git(self.path, 'rev-parse', 'HEAD').strip(), self.head)
+        self.assertIsNone(autosave.checkpoint(self.path))
+
+    def test_checkpoints_stack(self):
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+        first = autosave.checkpoint(self.path)
+        self.write(self.path, {'notes.txt': 'even more notes\n'})
+
+        second = autosave.checkpoint(self.path)
+
+        self.assertEqual(git(self.path, 'rev-parse', f'{second}^').strip(), first)
+
+    def test_push_and_finish(self):
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+        commit = autosave.checkpoint(self.path)
+
+        autosave.push(self.path)
+
+        self.assertEqual(git(self.remote, 'rev-parse', 'franklin-autosave/main').strip(), commit)
+        self.assertEqual(self.push_options(), ['ci.skip'])
+
+        git(self.path, 'fetch', '-q')
+        autosave.finish(self.path)
+
+        self.assertEqual(git(self.remote, 'branch', '--list', 'franklin-autosave/*'), '')
+        self.assertEqual(git(self.path, 'for-each-ref', 'refs/franklin/'), '')
+        self.assertEqual(self.push_options(), ['ci.skip', 'ci.skip'])
+
+    def test_watching(self):
+        session = autosave.Autosave(self.path, debounce=0.2, max_delay=5)
+        session.start()
+        try:
+            # let the watcher start before changing files
+            time.sleep(0.5)
+            self.write(self.path, {'notes.txt': 'more notes\n'})
+            deadline = time.time() + 10
+            while session.checkpoints == 0 and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            session.stop()
+
+        self.assertEqual(session.checkpoints, 1)
+        tree = git(self.path, 'ls-tree', autosave.checkpoint_ref('main'), 'notes.txt').split()[2]
+        self.assertEqual(git(self.path, 'cat-file', 'blob', tree), 'more notes\n')
@@ -0,0 +1,75 @@
+import os
+import subprocess
+from unittest import mock
+
+from franklin_educator import git
+from franklin_educator import cache
+from franklin_educator import validation
+
+from .sandbox import SandboxTestCase, git as run_git
+
+
+class TestBulk(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remotes = {name: self.exercise_remote('course', name, {'notes.txt': f'{name}\n'})
+                        for name in ('ex1', 'ex2', 'ex3')}
+        self.directory = os.path.join(self.root, 'course')
+        os.makedirs(self.directory)
+        listing = {('course', name): f'registry.example.org/grp/course/{name}:main' 
+                   for name in self.remotes}
+        listing[('other', 'ex4')] = 'registry.example.org/grp/other/ex4:main'
+        patcher = mock.patch.object(cache, 'registry_listing', return_value=listing)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_down_all(self):
+        results = git.git_down_all('course', self.directory, max_workers=2)
+
+        self.assertEqual(results, dict(ex1='cloned', ex2='cloned', ex3='cloned'))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['ex1', 'ex2', 'ex3'])
+
+        self.upstream_change(self.remotes['ex2'], {'new.txt': 'new\n'})
+        results = git.git_down_all('course', self.directory, max_workers=2)
+
+        self.assertEqual(results, dict(ex1='updated', ex2='updated', ex3='updated'))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'ex2', 'new.txt')))
+
+    def test_up_all(self):
+        git.git_down_all('course', self.directory)
+        # repositories that are not exercises are left alone
+        subprocess.run(['git', 'init', '-q', os.path.join(self.directory, 'notes')], check=True)
+        self.write(os.path.join(self.directory, 'ex1'), {'notes.txt': 'changed\n'})
+        self.write(os.path.join(self.directory, 'ex3'), {'notes.txt': 'changed\n'})
+
+        results = git.git_up_all(self.directory, remove_tracked_files=False, 
+                                 message='Update {repo}', max_workers=2)
+
+        self.assertEqual(results, dict(ex1='pushed', ex2='unchanged', ex3='pushed'))
+        self.assertEqual(run_git(self.remotes['ex3'], 'log', '-1', '--format=%s', 'main'), 'Update ex3\n')
+
+    def test_up_all_shares_validation_pool(self):
+        git.git_down_all('course', self.directory)
+        for name in self.remotes:
+            self.write(os.path.join(self.directory, name), {'notes.txt': 'changed\n'})
+
+        with mock.patch.object(validation, 'validate_staged', 
+                               wraps=validation.validate_staged) as validate_staged:
+            git.git_up_all(self.directory, remove_tracked_files=False, message='Update', 
+                           max_workers=3, validate='warn')
+
+        pools = {id(call.kwargs['pool']) for call in validate_staged.call_args_list}
+        self.assertEqual(validate_staged.call_count, 3)
+        self.assertEqual(len(pools), 1)
+
+    def test_find_exercise_repositories(self):
+        git.git_down_all('course', self.directory)
+        nested = os.path.join(self.root, 'nested')
+        os.makedirs(nested)
+        os.rename(os.path.join(self.directory, 'ex1'), os.path.join(nested, 'ex1'))
+
+        self.assertEqual(git.find_exercise_repositories(self.root, max_depth=2),
+                         [os.path.join(self.directory, 'ex2'), os.path.join(self.directory, 'ex3'),
+                          os.path.join(nested, 'ex1')])
+        self.assertEqual(git.find_exercise_repositories(self.root, max_depth=1), [])
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from franklin import config as cfg
+
+from franklin_educator import cache
+
+from .fake_gitlab import FakeGitLab
+from .sandbox import SandboxTestCase
+
+REGISTRY = 'groups/grp/registry/repositories'
+
+
+def repository(course, exercise):
+    return dict(path=f'grp/{course}/{exercise}',
+                location=f'registry.example.org/grp/{course}/{exercise}:main')
+
+
+class TestRegistryCache(SandboxTestCase):
+
+    def serve(self, etags=True):
+        items = [repository('course', f'exercise{i}') for i in range(150)]
+        server = FakeGitLab({REGISTRY: items}, etags=etags)
+        self.addCleanup(server.close)
+        patcher = mock.patch.multiple(cfg, gitlab_api_url=server.api_url, gitlab_group='grp')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return server, items
+
+    def revalidate(self):
+        # what a stale entry triggers in the background
+        path = cache.cache_dir('listings') / 'registry-grp.json'
+        cache._revalidate(path, REGISTRY, mock.Mock(side_effect=AssertionError('refetched')),
+                          cache.read_json(path))
+
+    def test_unchanged_listing(self):
+        server, _ = self.serve()
+        self.assertEqual(len(cache.registry_listing()), 150)
+        server.requests.clear()
+
+        self.revalidate()
+
+        # one conditional request per page
+        self.assertEqual(sorted(query['page'] for _, _, query in server.requests), ['1', '2'])
+
+    def test_change_on_later_page(self):
+        server, items = self.serve()
+        cache.registry_listing()
+        items[120] = repository('course', 'renamed')
+
+        with self.assertRaisesRegex(AssertionError, 'refetched'):
+            self.revalidate()
+
+    def test_item_added(self):
+        server, items = self.serve()
+        cache.registry_listing()
+        items.append(repository('course', 'new'))
+
+        with self.assertRaisesRegex(AssertionError, 'refetched'):
+            self.revalidate()
+
+    def test_no_validators(self):
+        server, _ = self.serve(etags=False)
+        cache.registry_listing()
+
+        # fetched again once stale, without extra requests for validators
+        self.assertEqual([(method, query['page']) for method, _, query in server.requests],
+                         [('GET', '1'), ('GET', '2')])
+        with self.assertRaisesRegex(AssertionError, 'refetched'):
+            self.revalidate()
+
+    def test_fresh_entry_makes_no_requests(self):
+        server, _ = self.serve()
+        listing = cache.registry_listing()
+        server.requests.clear()
+
+        self.assertEqual(cache.registry_listing(), listing)
+        self.assertEqual(server.requests, [])
@@ -0,0 +1,51 @@
+import os
+
+from franklin_educator import cleanup
+
+from .sandbox import SandboxTestCase
+
+
+class TestCleanup(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n', 'data/a/b.csv': 'b\n',
+                                                    'data/c.csv': 'c\n'})
+        self.path = self.clone(self.remote, 'exercise')
+
+    def test_worktree_state(self):
+        self.assertEqual(cleanup.worktree_state(self.path), 'clean')
+        self.write(self.path, {'scratch.txt': 'scratch\n'})
+        self.assertEqual(cleanup.worktree_state(self.path), 'untracked')
+        self.write(self.path, {'notes.txt': 'changed\n'})
+        self.assertEqual(cleanup.worktree_state(self.path), 'modified')
+        # e.g. notebook outputs that are deliberately not committed
+        self.assertEqual(cleanup.worktree_state(self.path, ignore={'notes.txt'}), 'untracked')
+
+    def test_remove_tracked_files(self):
+        removed = cleanup.remove_tracked_files(self.path)
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIn(os.path.join(self.path, 'data', 'a'), removed)
+        self.assertIn(self.path, removed)
+
+    def test_keeps_untracked_files(self):
+        self.write(self.path, {'data/a/scratch.txt': 'scratch\n'})
+
+        cleanup.remove_tracked_files(self.path)
+
+        self.assertEqual(cleanup.list_repository(self.path)[:-1], 
+                         [os.path.join(self.path, 'data'), os.path.join(self.path, 'data', 'a'),
+                          os.path.join(self.path, 'data', 'a', 'scratch.txt')])
+
+    def test_dry_run(self):
+        self.write(self.path, {'data/a/scratch.txt': 'scratch\n'})
+        before = sorted(cleanup.list_repository(self.path))
+
+        removed = cleanup.remove_tracked_files(self.path, dry_run=True)
+
+        self.assertEqual(sorted(cleanup.list_repository(self.path)), before)
+        self.assertEqual(sorted(removed), sorted([
+            os.path.join(self.path, name) for name in 
+            ('notes.txt', 'data/a/b.csv', 'data/c.csv', '.git')]))
+        self.assertEqual(cleanup.remove_tracked_files(self.path), removed)
@@ -0,0 +1,97 @@
+import os
+import subprocess
+
+from franklin_educator.backend import GitBackend, GitConfig, GitConfigError
+
+from .sandbox import SandboxTestCase, git
+
+# values that need quoting or escaping in a config file
+VALUES = [
+    'plain',
+    'two words',
+    ' leading and trailing ',
+    'hash # and semicolon ;',
+    'quote " and backslash \\',
+    'tab\tinside',
+    'C:\\Users\\student\\exercise',
+]
+
+
+class TestGitConfig(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, 'repo')
+        subprocess.run(['git', 'init', '-q', self.path], check=True)
+        self.config = GitConfig(os.path.join(self.path, '.git', 'config'))
+
+    def git_get(self, key):
+        return git(self.path, 'config', '--get', key).rstrip('\n')
+
+    def test_quoting_written_by_git(self):
+        for i, value in enumerate(VALUES):
+            git(self.path, 'config', f'franklin.value{i}', value)
+        for i, value in enumerate(VALUES):
+            self.assertEqual(self.config.get(f'franklin.value{i}'), value)
+
+    def test_quoting_read_by_git(self):
+        self.config.update({f'franklin.value{i}': value for i, value in enumerate(VALUES)})
+        for i, value in enumerate(VALUES):
+            self.assertEqual(self.git_get(f'franklin.value{i}'), value)
+            self.assertEqual(self.config.get(f'franklin.value{i}'), value)
+
+    def test_comments_and_bare_keys(self):
+        with open(self.config.path, 'a') as f:
+            f.write('# comment\n[Franklin]\n\tflag\n\tName = "quoted" value ; comment\n')
+        self.assertEqual(self.config.get('franklin.flag'), 'true')
+        self.assertEqual(self.config.get('franklin.name'), 'quoted value')
+        self.assertEqual(self.config.get('franklin.name'), self.git_get('franklin.name'))
+
+    def test_subsections(self):
+        git(self.path, 'config', 'branch.feature/x.remote', 'origin')
+        git(self.path, 'config', 'remote.say "hi".url', 'url')
+        with open(self.config.path, 'a') as f:
+            # legacy syntax, where the subsection is case insensitive
+            f.write('[Legacy.Sub]\n\tkey = old\n')
+
+        self.assertEqual(self.config.get('branch.feature/x.remote'), 'origin')
+        self.assertEqual(self.config.get('remote.say "hi".url'), 'url')
+        self.assertEqual(self.config.get('legacy.sub.key'), 'old')
+        # subsections are otherwise case sensitive
+        self.assertIsNone(self.config.get('branch.Feature/X.remote'))
+
+        self.config.update({'branch.feature/x.merge': 'refs/heads/main',
+                            'remote.back\\slash "q".url': 'other'})
+        self.assertEqual(self.git_get('branch.feature/x.merge'), 'refs/heads/main')
+        self.assertEqual(self.git_get('remote.back\\slash "q".url'), 'other')
+
+    def test_update(self):
+        self.assertEqual(self.config.update({'core.autocrlf': 'false', 'franklin.new': 'yes'}), 2)
+        self.assertEqual(self.config.update({'core.autocrlf': 'false'}), 0)
+        self.assertEqual(self.config.update({'core.autocrlf': 'true'}), 1)
+        self.assertEqual(git(self.path, 'config', '--get-all', 'core.autocrlf'), 'true\n')
+        self.assertEqual(self.git_get('franklin.new'), 'yes')
+
+    def test_includes(self):
+        included = os.path.join(self.root, 'included')
+        with open(included, 'w') as f:
+            f.write('[franklin]\n\tvalue = included\n')
+        git(self.path, 'config', 'include.path', included)
+
+        # values may come from the included file, so git reads them
+        with self.assertRaises(GitConfigError):
+            self.config.get('franklin.value')
+        self.assertEqual(GitBackend(self.path).config_get('franklin.value'), 'included')
+
+        # writes go to the repository's own file, as with git config
+        self.config.update({'franklin.local': 'yes'})
+        self.assertEqual(self.git_get('franklin.local'), 'yes')
+        with open(included) as f:
+            self.assertNotIn('local', f.read())
+
+    def test_unsupported(self):
+        with open(self.config.path, 'a') as f:
+            f.write('[franklin]\n\tvalue = continued \\\n\tline\n')
+        with self.assertRaises(GitConfigError):
+            self.config.get('franklin.value')
+        self.assertEqual(GitBackend(self.path).config_get('franklin.value'), self.git_get('franklin.value'))
@@ -0,0 +1,78 @@
+import os
+import time
+from unittest import mock
+
+from franklin_educator import containers
+
+from .sandbox import SandboxTestCase
+
+# A docker command line stand-in. Pulls stop half way until
+# $FAKE_DOCKER_STATE/go exists, and images named "missing" fail to pull.
+FAKE_DOCKER = '''#!/bin/sh
+case "$1" in
+  info) [ -f "$FAKE_DOCKER_STATE/down" ] && exit 1; exit 0 ;;
+  pull) echo "${2##*:}: Pulling from grp/course/exercise"
+        echo "a1b2c3: Pulling fs layer"; echo "d4e5f6: Already exists"
+        while [ ! -f "$FAKE_DOCKER_STATE/go" ]; do sleep 0.05; done
+        if [ "$2" = missing ]; then echo "Error response from daemon: manifest unknown"; exit 1; fi
+        echo "a1b2c3: Pull complete"; echo "Digest: sha256:0123456789abcdef"
+        echo "Status: Downloaded newer image for $2" ;;
+  image) [ "$5" = missing ] && exit 1; echo "2025-03-01T10:11:12.123456789Z" ;;
+esac
+exit 0
+'''
+
+IMAGE = 'registry.example.org/grp/course/exercise:main'
+
+
+class TestContainers(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.root, 'docker')
+        os.makedirs(self.state)
+        self.fake_command('docker', FAKE_DOCKER)
+        env = mock.patch.dict(os.environ, {'FAKE_DOCKER_STATE': self.state})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def go(self):
+        open(os.path.join(self.state, 'go'), 'w').close()
+
+    def wait_for_layers(self, pull):
+        deadline = time.monotonic() + 10
+        while len(pull.layers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_pull(self):
+        pull = containers.ImagePull(IMAGE)
+        self.wait_for_layers(pull)
+
+        self.assertEqual(pull.status(), '1/2 layers')
+
+        self.go()
+        self.assertTrue(pull.wait())
+        self.assertEqual(pull.status(), 'done')
+        self.assertEqual(pull.layers, {'a1b2c3': 'Pull complete', 'd4e5f6': 'Already exists'})
+
+    def test_failed_pull(self):
+        self.go()
+        pull = containers.ImagePull('missing')
+
+        self.assertFalse(pull.wait())
+        self.assertEqual(pull.status(), 'failed')
+
+    def test_image_created(self):
+        self.assertEqual(containers.image_created(IMAGE), 1740823872.0)
+        self.assertIsNone(containers.image_created('missing'))
+
+    def test_docker_ready(self):
+        self.assertTrue(containers.docker_ready())
+        open(os.path.join(self.state, 'down'), 'w').close()
+        self.assertFalse(containers.docker_ready())
+        self.assertFalse(containers.wait_for_docker(timeout=0.2, interval=0.05))
+
+    def test_no_docker(self):
+        with mock.patch.dict(os.environ, {'PATH': os.path.join(self.root, 'empty')}):
+            self.assertFalse(containers.docker_ready())
+            self.assertIsNone(containers.image_created(IMAGE))
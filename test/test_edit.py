@@ -0,0 +1,91 @@
+import os
+from unittest import mock
+
+from click.testing import CliRunner
+
+from franklin import gitlab
+from franklin import jupyter
+
+from franklin_educator import git
+
+from .sandbox import SandboxTestCase, git as run_git
+
+IMAGE = 'registry.example.org/grp/course/exercise:main'
+
+
+class TestEditCycle(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.exercise_remote('course', 'exercise', {'notes.txt': 'notes\n'})
+        self.work = os.path.join(self.root, 'work')
+        os.makedirs(self.work)
+        cwd = os.getcwd()
+        os.chdir(self.work)
+        self.addCleanup(os.chdir, cwd)
+        image_pull = mock.Mock(**{'wait.return_value': True, 'status.return_value': 'done'})
+        for target, name, value in ((git, 'check_ssh_set_up', True),
+                                    (git.ssh, 'enable_multiplexing', None),
+                                    (git.containers, 'wait_for_docker', True),
+                                    (git.containers, 'ImagePull', image_pull),
+                                    (gitlab, 'launch_mergetool', None)):
+            patcher = mock.patch.object(target, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def edit(self, exercise='exercise', launch_jupyter=None, input=None):
+        with mock.patch.object(git, 'select_exercise', return_value=('course', exercise, IMAGE)), \
+                mock.patch.object(jupyter, 'launch_jupyter', side_effect=launch_jupyter):
+            return CliRunner().invoke(git.edit_cycle, [], input=input)
+
+    def test_cycle(self):
+        def launch_jupyter(image_url, cwd=None):
+            self.write(cwd, {'notes.txt': 'edited\n'})
+
+        result = self.edit(launch_jupyter=launch_jupyter, input='Edit notes\n')
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(run_git(self.remote, 'show', 'main:notes.txt'), 'edited\n')
+        self.assertFalse(os.path.exists(os.path.join(self.work, 'exercise')))
+
+    def test_clone_fails(self):
+        result = self.edit(exercise='missing')
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Failed to update the local repository', result.output)
+        self.assertIn('does not appear to be a git repository', result.output)
+
+    def test_pull_fails(self):
+        self.clone(self.remote, 'exercise')
+        run_git(os.path.join(self.work, 'exercise'), 'remote', 'set-url', 'origin',
+                os.path.join(self.root, 'missing.git'))
+
+        result = self.edit(input='y\n')
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('does not appear to be a git repository', result.output)
+
+    def test_conflict_on_upload(self):
+        def launch_jupyter(image_url, cwd=None):
+            self.write(cwd, {'notes.txt': 'edited\n'})
+            self.upstream_change(self.remote, {'notes.txt': 'edited upstream\n'})
+
+        result = self.edit(launch_jupyter=launch_jupyter, input='Edit notes\n')
+
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('notes.txt', result.output)
+        self.assertIn('merge conflict', result.output)
+        gitlab.launch_mergetool.assert_called_once()
+
+    def test_validation_blocks_upload(self):
+        def launch_jupyter(image_url, cwd=None):
+            self.write(cwd, {'notes.txt': 'edited\n', 'franklin.yml': 'validate: block\n'})
+
+        with mock.patch.object(git.validation, 'validate_staged', 
+                               return_value=[dict(path='exercise.ipynb', ok=False, error='NameError',
+                                                  environment=False, seconds=0, cached=False)]):
+            result = self.edit(launch_jupyter=launch_jupyter)
+
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('Your changes were not uploaded', result.output)
+        self.assertTrue(os.path.exists(os.path.join(self.work, 'exercise', 'notes.txt')))
@@ -0,0 +1,38 @@
+import os
+
+from franklin_educator import git
+
+from .sandbox import SandboxTestCase, git as run_git
+
+
+class TestGitUp(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n'})
+        self.path = self.clone(self.remote, 'exercise')
+
+    def test_pushes_local_commit(self):
+        # a commit that only exists locally, e.g. from git up --background
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+        commit = self.commit(self.path, 'Local commit')
+
+        outcome = git.git_up(self.path, remove_tracked_files=True, message='update')
+
+        self.assertEqual(outcome, 'pushed')
+        self.assertEqual(run_git(self.remote, 'rev-parse', 'main').strip(), commit)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_keeps_clone_with_local_commit(self):
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+        self.commit(self.path, 'Local commit')
+
+        git._remove_local_files(self.path, dry_run=False, secho=git._echo(False))
+
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'notes.txt')))
+
+    def test_unchanged(self):
+        outcome = git.git_up(self.path, remove_tracked_files=True, message='update')
+
+        self.assertEqual(outcome, 'unchanged')
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,91 @@
+from unittest import mock
+
+from franklin_educator import index
+
+from .sandbox import SandboxTestCase
+
+
+def project(course, name, title, last_activity):
+    return dict(course=course, name=name, title=title, last_activity=last_activity)
+
+
+class TestIndex(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.images = {('stats', 'regression'): 'registry/stats/regression:main',
+                       ('stats', 'linear-models'): 'registry/stats/linear-models:main',
+                       ('genomics', 'regression'): 'registry/genomics/regression:main',
+                       ('genomics', 'alignment'): 'registry/genomics/alignment:main'}
+        self.projects = [project('stats', 'linear-models', 'Linear regression in practice', '2026-01-02T00:00:00Z'),
+                         project('genomics', 'alignment', 'Sequence alignment', '2026-01-03T00:00:00Z'),
+                         project('stats', 'regression', 'Regression', '2026-01-01T00:00:00Z')]
+        for name, value in (('registry_listing', lambda refresh=False: dict(self.images)),
+                            ('course_names', lambda refresh=False: dict(stats='Statistics', genomics='Genomics'))):
+            patcher = mock.patch.object(index.cache, name, side_effect=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(index.api, 'projects', side_effect=lambda since: list(self.projects))
+        self.api_projects = patcher.start()
+        self.addCleanup(patcher.stop)
+        index.ensure()
+
+    def search(self, query):
+        return [(row['course'], row['exercise']) for row in index.search(query)]
+
+    def test_exercises(self):
+        rows = index.exercises()
+
+        # most recently active first
+        self.assertEqual([(row['course'], row['exercise']) for row in rows][:3],
+                         [('genomics', 'alignment'), ('stats', 'linear-models'), ('stats', 'regression')])
+        self.assertEqual(rows[0]['course_name'], 'Genomics')
+        self.assertEqual(index.images(), self.images)
+        self.assertEqual(index.courses(), dict(stats='Statistics', genomics='Genomics'))
+
+    def test_lookup(self):
+        self.assertEqual(len(index.lookup('regression')), 2)
+        self.assertEqual([row['course'] for row in index.lookup('Genomics/Regression')], ['genomics'])
+        self.assertEqual(index.lookup('stats/alignment'), [])
+
+    def test_search(self):
+        # the exact name ranks first, then whole words before parts of words
+        self.assertEqual(self.search('regression')[:2], [('stats', 'regression'), ('genomics', 'regression')])
+        self.assertEqual(self.search('regression')[2], ('stats', 'linear-models'))
+        self.assertEqual(self.search('regres'),
+                         [('stats', 'linear-models'), ('stats', 'regression'), ('genomics', 'regression')])
+        # every word must match, and equal scores keep the most recently active first
+        self.assertEqual(self.search('statistics regression'),
+                         [('stats', 'linear-models'), ('stats', 'regression')])
+        self.assertEqual(self.search('sequence'), [('genomics', 'alignment')])
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('proteomics'), [])
+
+    def test_misspelled(self):
+        self.assertEqual(self.search('alignmnet'), [('genomics', 'alignment')])
+        self.assertEqual(self.search('sequense aligment'), [('genomics', 'alignment')])
+
+    def test_incremental_update(self):
+        self.api_projects.assert_called_once_with(None)
+        del self.images[('genomics', 'alignment')]
+        self.projects = [project('stats', 'regression', 'Least squares', '2026-02-01T00:00:00Z')]
+
+        index.update()
+
+        self.api_projects.assert_called_with('2026-01-03T00:00:00Z')
+        # exercises without an image are left out
+        self.assertNotIn(('genomics', 'alignment'), index.images())
+        self.assertEqual(self.search('least squares'), [('stats', 'regression')])
+        self.assertEqual(index.exercises()[0]['exercise'], 'regression')
+
+    def test_ensure(self):
+        with mock.patch.object(index, 'update') as update, \
+                mock.patch.object(index, '_update_in_background') as background:
+            index.ensure()
+            update.assert_not_called()
+            background.assert_not_called()
+            with mock.patch.object(index.time, 'time', return_value=index.time.time() + index.INDEX_TTL + 1):
+                index.ensure()
+            background.assert_called_once_with()
+            index.ensure(refresh=True)
+            update.assert_called_once_with()
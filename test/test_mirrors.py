@@ -0,0 +1,50 @@
+import os
+
+from franklin_educator import mirrors
+
+from .sandbox import SandboxTestCase, git
+
+
+class TestMirrors(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n'})
+        self.path = self.clone(self.remote, 'exercise')
+
+    def test_mirror_has_only_pushed_commits(self):
+        pushed = git(self.path, 'rev-parse', 'HEAD').strip()
+        self.write(self.path, {'notes.txt': 'local notes\n'})
+        self.commit(self.path, 'Never pushed')
+
+        mirrors.update_from_clone(self.path)
+
+        mirror = str(mirrors.mirror_path(self.remote))
+        self.assertEqual(git(mirror, 'rev-parse', 'main').strip(), pushed)
+        self.assertEqual(git(mirror, 'symbolic-ref', 'HEAD').strip(), 'refs/heads/main')
+
+    def test_clone_from_mirror_after_upstream_change(self):
+        self.write(self.path, {'notes.txt': 'local notes\n'})
+        self.commit(self.path, 'Never pushed')
+        mirrors.update_from_clone(self.path)
+        upstream = self.upstream_change(self.remote, {'new.txt': 'new\n'})
+
+        other = os.path.join(self.root, 'work', 'other')
+        self.assertTrue(mirrors.clone(self.remote, other))
+
+        self.assertEqual(git(other, 'rev-parse', 'HEAD').strip(), upstream)
+        self.assertEqual(git(other, 'remote', 'get-url', 'origin').strip(), self.remote)
+
+    def test_falls_back_to_remote(self):
+        mirrors.update_from_clone(self.path)
+        # a mirror that cannot be fast-forwarded to the remote
+        mirror = str(mirrors.mirror_path(self.remote))
+        tree = git(mirror, 'rev-parse', 'main^{tree}').strip()
+        diverged = git(mirror, 'commit-tree', tree, '-m', 'Diverged').strip()
+        git(mirror, 'update-ref', 'refs/heads/main', diverged)
+        upstream = self.upstream_change(self.remote, {'new.txt': 'new\n'})
+
+        other = os.path.join(self.root, 'work', 'other')
+        self.assertFalse(mirrors.clone(self.remote, other))
+
+        self.assertEqual(git(other, 'rev-parse', 'HEAD').strip(), upstream)
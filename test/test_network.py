@@ -0,0 +1,60 @@
+import os
+import unittest
+import subprocess
+from unittest import mock
+
+from franklin_educator import network
+
+
+class TestStartJitter(unittest.TestCase):
+
+    def setUp(self):
+        env = mock.patch.dict(os.environ)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop('FRANKLIN_NETWORK_JITTER', None)
+        for patcher in (mock.patch.object(network, '_jittered', False),
+                        mock.patch.object(network, '_start_jitter', network.START_JITTER),
+                        mock.patch.object(network.time, 'sleep')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_off_by_default(self):
+        network.call(lambda: None)
+        network.time.sleep.assert_not_called()
+
+    def test_batch(self):
+        network.spread_start(jitter=0.5)
+        with mock.patch.object(network.random, 'uniform', return_value=0.3) as uniform:
+            network.call(lambda: None)
+            network.call(lambda: None)
+        uniform.assert_called_once_with(0, 0.5)
+        network.time.sleep.assert_called_once_with(0.3)
+
+    def test_environment_overrides(self):
+        os.environ['FRANKLIN_NETWORK_JITTER'] = '0'
+        network.spread_start()
+        network.call(lambda: None)
+        network.time.sleep.assert_not_called()
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(network.time, 'sleep')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def error(self, output):
+        return subprocess.CalledProcessError(128, ['git'], output=output)
+
+    def test_transient(self):
+        func = mock.Mock(side_effect=[self.error(b'kex_exchange_identification: Connection closed'), 'done'])
+        self.assertEqual(network.call(func, attempts=3), 'done')
+        self.assertEqual(func.call_count, 2)
+
+    def test_permanent(self):
+        func = mock.Mock(side_effect=self.error(b'Permission denied (publickey).\nConnection closed'))
+        with self.assertRaises(subprocess.CalledProcessError):
+            network.call(func, attempts=3)
+        self.assertEqual(func.call_count, 1)
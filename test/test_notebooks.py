@@ -0,0 +1,81 @@
+import os
+import json
+
+from franklin_educator import notebooks
+
+from .sandbox import SandboxTestCase, git
+
+NOTEBOOK = dict(nbformat=4, nbformat_minor=5, metadata={}, cells=[
+    dict(cell_type='code', execution_count=3, metadata={}, source='1 + 1',
+         outputs=[dict(output_type='execute_result', execution_count=3, metadata={},
+                       data={'text/plain': '2'})]),
+])
+
+
+class TestCleanStaged(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'README.md': 'exercise\n'})
+        self.path = self.clone(self.remote, 'exercise')
+
+    def stage(self, files):
+        self.write(self.path, files)
+        git(self.path, 'add', '-A')
+
+    def staged_notebook(self, name='exercise.ipynb'):
+        return json.loads(git(self.path, 'show', f':{name}'))
+
+    def test_unchanged_by_default(self):
+        self.stage({'exercise.ipynb': json.dumps(NOTEBOOK)})
+
+        result = notebooks.clean_staged(self.path)
+
+        self.assertEqual(result['cleaned'], [])
+        self.assertEqual(self.staged_notebook(), NOTEBOOK)
+
+    def test_strip_execution_count_opt_in(self):
+        self.stage({'exercise.ipynb': json.dumps(NOTEBOOK),
+                    'franklin.yml': 'notebooks:\n  strip_execution_count: true\n'})
+
+        result = notebooks.clean_staged(self.path)
+
+        self.assertEqual(result['cleaned'], ['exercise.ipynb'])
+        cell, = self.staged_notebook()['cells']
+        self.assertIsNone(cell['execution_count'])
+        self.assertEqual(cell['outputs'][0]['data'], {'text/plain': '2'})
+
+    def test_strip_outputs_opt_in(self):
+        self.stage({'exercise.ipynb': json.dumps(NOTEBOOK),
+                    'solution.ipynb': json.dumps(NOTEBOOK),
+                    'franklin.yml': 'notebooks:\n  strip_outputs: true\n'
+                                    '  keep_outputs: [solution.ipynb]\n'})
+
+        notebooks.clean_staged(self.path)
+
+        self.assertEqual(self.staged_notebook()['cells'][0]['outputs'], [])
+        self.assertEqual(len(self.staged_notebook('solution.ipynb')['cells'][0]['outputs']), 1)
+        # the working tree keeps the outputs
+        with open(os.path.join(self.path, 'exercise.ipynb')) as f:
+            self.assertEqual(len(json.load(f)['cells'][0]['outputs']), 1)
+
+    def test_keeps_mode(self):
+        self.stage({'exercise.ipynb': json.dumps(NOTEBOOK),
+                    'franklin.yml': 'notebooks:\n  strip_execution_count: true\n'})
+        git(self.path, 'update-index', '--chmod=+x', 'exercise.ipynb')
+
+        notebooks.clean_staged(self.path)
+
+        mode = git(self.path, 'ls-files', '--stage', 'exercise.ipynb').split()[0]
+        self.assertEqual(mode, '100755')
+        self.assertIsNone(self.staged_notebook()['cells'][0]['execution_count'])
+
+    def test_large_files(self):
+        self.stage({'data.csv': 'x' * 100,
+                    'franklin.yml': 'max_file_size: 50\nlarge_files: skip\n'})
+
+        result = notebooks.clean_staged(self.path)
+
+        self.assertEqual(result['large'], ['data.csv'])
+        self.assertEqual(result['skipped'], ['data.csv'])
+        self.assertEqual(git(self.path, 'diff', '--cached', '--name-only').split(), ['franklin.yml'])
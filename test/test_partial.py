@@ -0,0 +1,67 @@
+import os
+import random
+import string
+
+from franklin_educator import partial
+from franklin_educator.backend import GitBackend
+
+from .sandbox import SandboxTestCase, git
+
+# large and incompressible, so a clone without it transfers much less
+_rng = random.Random(0)
+DATA = ''.join(_rng.choice(string.ascii_letters) for _ in range(200000))
+
+SETTINGS = 'clone:\n  partial: true\n  depth: 1\n  sparse: [exercise.ipynb]\n'
+
+
+class TestPartialClone(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'exercise.ipynb': '{}\n', 'data.csv': DATA,
+                                                    'franklin.yml': SETTINGS})
+        # as GitLab, the remote serves blob-filtered clones
+        git(self.remote, 'config', 'uploadpack.allowFilter', 'true')
+        self.upstream_change(self.remote, {'exercise.ipynb': '{"cells": []}\n'})
+        self.url = f'file://{self.remote}'
+        self.path = os.path.join(self.root, 'work', 'exercise')
+
+    def test_clone_settings(self):
+        self.assertIsNone(partial.clone_settings(self.url))
+        self.assertEqual(partial.clone_settings(self.url, force=True), partial.DEFAULT_CLONE_SETTINGS)
+
+        # a full clone records the settings the exercise declares
+        full = self.clone(self.remote, 'full')
+        partial.remember(self.url, full, full_clone_bytes=partial.objects_size(full))
+
+        self.assertEqual(partial.clone_settings(self.url),
+                         dict(partial=True, depth=1, sparse=['exercise.ipynb']))
+        self.assertGreater(partial._known()[self.url]['full_clone_bytes'], 100000)
+
+    def test_clone(self):
+        settings = dict(partial=True, depth=1, sparse=['exercise.ipynb'])
+
+        transferred = partial.clone(self.url, self.path, settings)
+
+        self.assertTrue(partial.is_partial(self.path))
+        self.assertEqual(sorted(os.listdir(self.path)), ['.git', 'exercise.ipynb', 'franklin.yml'])
+        self.assertEqual(git(self.path, 'rev-list', '--count', 'HEAD'), '1\n')
+        self.assertLess(transferred, 100000)
+        full = self.clone(self.remote, 'full')
+        self.assertFalse(partial.is_partial(full))
+
+    def test_ensure_merge_base(self):
+        partial.clone(self.url, self.path, dict(partial=True, depth=1, sparse=[]))
+        self.write(self.path, {'exercise.ipynb': '{"cells": [1]}\n'})
+        self.commit(self.path, 'Local change')
+        self.upstream_change(self.remote, {'data.csv': 'y'})
+        self.upstream_change(self.remote, {'data.csv': 'z'})
+        # a shallow fetch cuts the history above the local branch
+        git(self.path, 'fetch', '-q', '--depth=1')
+        self.assertEqual(GitBackend(self.path).returncode('merge-base', 'HEAD', '@{upstream}'), 1)
+
+        partial.ensure_merge_base(self.path)
+
+        self.assertEqual(git(self.path, 'merge-base', 'HEAD', '@{upstream}').strip(),
+                         git(self.path, 'rev-parse', 'HEAD^').strip())
+        self.assertFalse(os.path.exists(os.path.join(self.path, '.git', 'shallow')))
@@ -0,0 +1,24 @@
+import unittest
+from unittest import mock
+from importlib import metadata
+
+import click
+from click.testing import CliRunner
+
+from franklin_educator import plugins
+
+
+class TestLazyPluginGroup(unittest.TestCase):
+
+    def test_broken_plugin(self):
+        @click.group(cls=plugins.LazyPluginGroup, plugin_group='test.plugins')
+        def group():
+            pass
+
+        broken = metadata.EntryPoint('broken', 'no_such_module:command', 'test.plugins')
+        with mock.patch.object(plugins, 'entry_points', return_value={'broken': broken}):
+            result = CliRunner().invoke(group, ['broken'])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIsInstance(result.exception, SystemExit)
+        self.assertIn('Plugin no_such_module:command could not be loaded', result.output)
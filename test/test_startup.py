@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import unittest
+import subprocess
+
+# Seconds allowed for importing the plugin module and showing help. Override
+# with FRANKLIN_STARTUP_BUDGET on slow machines.
+STARTUP_BUDGET = float(os.environ.get('FRANKLIN_STARTUP_BUDGET', 0.5))
+
+# Modules that must only be imported by the commands that use them
+HEAVY_MODULES = [
+    'pkg_resources',
+    'pyperclip',
+    'webbrowser',
+    'importlib_resources',
+    'requests',
+    'yaml',
+    'franklin.docker',
+    'franklin.jupyter',
+    'franklin.gitlab',
+    'franklin.update',
+]
+
+
+def run_python(code):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], env=env,
+                            capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        _, result = run_python(
+            'import sys, franklin_educator.git; '
+            f'print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_help_within_budget(self):
+        code = ('from franklin_educator.git import git\n'
+                'try:\n'
+                '    git.main(["--help"], prog_name="franklin git")\n'
+                'except SystemExit:\n'
+                '    pass\n')
+        # best of a few runs, so a busy machine does not fail the test
+        timings = []
+        for _ in range(3):
+            seconds, result = run_python(code)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn('status', result.stdout)
+            timings.append(seconds)
+        self.assertLess(min(timings), STARTUP_BUDGET)
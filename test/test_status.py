@@ -0,0 +1,80 @@
+import subprocess
+from unittest import mock
+
+from franklin_educator import cache
+from franklin_educator import status
+
+from .sandbox import SandboxTestCase, git
+
+IMAGE = 'registry.example.org/grp/course/exercise:main'
+
+
+class TestStatus(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.exercise_remote('course', 'exercise', {'notes.txt': 'notes\n', 'old.txt': 'old\n'})
+        self.path = self.clone(self.remote, 'exercise')
+        # no image is known unless a test says so
+        patcher = mock.patch.object(cache, 'registry_listing', return_value={})
+        self.listing = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_clean(self):
+        result = status.repo_status(self.path)
+
+        self.assertEqual(result, dict(branch='main', upstream='origin/main', ahead=0, behind=0,
+                                      modified=[], untracked=[], conflicted=[], image=None))
+        self.assertFalse(status.has_changes_to_upload(self.path))
+        self.assertEqual(status.commits_ahead(self.path), 0)
+
+    def test_changes(self):
+        self.write(self.path, {'notes.txt': 'changed\n', 'new file.txt': 'new\n'})
+        git(self.path, 'mv', 'old.txt', 'renamed.txt')
+
+        result = status.repo_status(self.path)
+
+        self.assertEqual(sorted(result['modified']), ['notes.txt', 'renamed.txt'])
+        self.assertEqual(result['untracked'], ['new file.txt'])
+        self.assertTrue(status.has_changes_to_upload(self.path))
+
+    def test_untracked_files_are_not_uploaded(self):
+        self.write(self.path, {'scratch.txt': 'scratch\n'})
+        self.assertFalse(status.has_changes_to_upload(self.path))
+
+    def test_ahead_and_behind(self):
+        self.upstream_change(self.remote, {'notes.txt': 'upstream\n'})
+        git(self.path, 'fetch', '-q')
+        self.write(self.path, {'notes.txt': 'local\n'})
+        self.commit(self.path, 'Local change')
+
+        result = status.repo_status(self.path)
+
+        self.assertEqual((result['ahead'], result['behind']), (1, 1))
+        self.assertTrue(status.has_changes_to_upload(self.path))
+        self.assertEqual(status.commits_ahead(self.path), 1)
+
+        # the merge stops with a conflict
+        subprocess.run(['git', '-C', self.path, 'merge', '-q', '@{upstream}'], capture_output=True)
+        result = status.repo_status(self.path)
+        self.assertEqual(result['conflicted'], ['notes.txt'])
+
+    def test_no_upstream(self):
+        git(self.path, 'checkout', '-q', '-b', 'local')
+        self.assertIsNone(status.repo_status(self.path)['upstream'])
+        self.assertTrue(status.has_changes_to_upload(self.path))
+        self.assertIsNone(status.commits_ahead(self.path))
+
+    def test_image(self):
+        self.listing.return_value = {('course', 'exercise'): IMAGE}
+        committed = int(git(self.path, 'log', '-1', '--format=%ct'))
+
+        for created, stale in ((committed - 60, True), (committed + 60, False)):
+            with mock.patch.object(status.containers, 'image_created', return_value=created):
+                self.assertEqual(status.repo_status(self.path)['image'],
+                                 dict(url=IMAGE, pulled=True, stale=stale))
+
+        with mock.patch.object(status.containers, 'image_created', return_value=None):
+            self.assertEqual(status.repo_status(self.path)['image'],
+                             dict(url=IMAGE, pulled=False, stale=None))
+        self.listing.assert_called_with(offline=True)
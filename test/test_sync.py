@@ -0,0 +1,70 @@
+import os
+from unittest import mock
+
+from franklin_educator import sync
+
+from .sandbox import SandboxTestCase, git
+
+
+class TestPull(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n', 'other.txt': 'other\n'})
+        self.path = self.clone(self.remote, 'exercise')
+        # git messages in German, as for a user with a German locale
+        env = mock.patch.dict(os.environ, {'LANG': 'C.UTF-8', 'LANGUAGE': 'de'})
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop('LC_ALL', None)
+
+    def test_up_to_date(self):
+        self.assertEqual(sync.pull(self.path)['state'], 'up-to-date')
+
+    def test_ahead(self):
+        self.write(self.path, {'notes.txt': 'local\n'})
+        self.commit(self.path, 'Local change')
+        self.assertEqual(sync.pull(self.path)['state'], 'ahead')
+
+    def test_fast_forward(self):
+        upstream = self.upstream_change(self.remote, {'new.txt': 'new\n'})
+
+        result = sync.pull(self.path)
+
+        self.assertEqual(result['state'], 'fast-forward')
+        self.assertGreater(result['objects'], 0)
+        self.assertEqual(git(self.path, 'rev-parse', 'HEAD').strip(), upstream)
+
+    def test_merged(self):
+        self.upstream_change(self.remote, {'new.txt': 'new\n'})
+        self.write(self.path, {'notes.txt': 'local\n'})
+        self.commit(self.path, 'Local change')
+
+        result = sync.pull(self.path)
+
+        self.assertEqual(result['state'], 'merged')
+        self.assertEqual(result['conflicts'], [])
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'new.txt')))
+
+    def test_conflicted(self):
+        self.upstream_change(self.remote, {'notes.txt': 'upstream\n'})
+        self.write(self.path, {'notes.txt': 'local\n'})
+        self.commit(self.path, 'Local change')
+
+        result = sync.pull(self.path)
+
+        self.assertEqual(result['state'], 'conflicted')
+        self.assertEqual(result['conflicts'], ['notes.txt'])
+        self.assertEqual(sync.conflicted_paths(self.path), ['notes.txt'])
+
+    def test_blocked_by_local_changes(self):
+        self.upstream_change(self.remote, {'notes.txt': 'upstream\n'})
+        self.write(self.path, {'notes.txt': 'uncommitted\n'})
+
+        result = sync.pull(self.path)
+
+        self.assertEqual(result['state'], 'blocked')
+        self.assertEqual(result['conflicts'], ['notes.txt'])
+        self.assertEqual(sync.blocking_paths(self.path), ['notes.txt'])
+        with open(os.path.join(self.path, 'notes.txt')) as f:
+            self.assertEqual(f.read(), 'uncommitted\n')
@@ -0,0 +1,77 @@
+import os
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+from franklin_educator import git
+from franklin_educator import templates
+
+from .sandbox import SandboxTestCase, git as run_git
+
+FILES = {
+    'README.md': '# Exercise\n',
+    'exercise.ipynb': '{"cells": []}\n',
+    'data/with space "and quotes".csv': 'a,b\n',
+    'data/nested/.gitkeep': '',
+}
+
+
+class TestTemplateRepository(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.template = Path(self.root, 'template')
+        self.write(str(self.template), FILES)
+        self.repo = os.path.join(self.root, 'template.git')
+
+    def test_template_files(self):
+        files = dict(templates.template_files(self.template))
+        self.assertEqual(files, {path: content.encode() for path, content in FILES.items()})
+        with self.assertRaises(FileNotFoundError):
+            list(templates.template_files(Path(self.root, 'missing')))
+
+    def test_build(self):
+        templates.build_template_repository(self.repo, self.template, message='Start')
+
+        self.assertEqual(run_git(self.repo, 'log', '--format=%an %s', 'main'), 'test Start\n')
+        self.assertEqual(sorted(run_git(self.repo, 'ls-tree', '-r', '-z', '--name-only', 'main').split('\0')[:-1]),
+                         sorted(FILES))
+        for path, content in FILES.items():
+            self.assertEqual(run_git(self.repo, 'show', f'main:{path}'), content)
+
+    def test_push(self):
+        templates.build_template_repository(self.repo, self.template)
+        remote = os.path.join(self.root, 'remote.git')
+        subprocess.run(['git', 'init', '-q', '--bare', remote], check=True)
+
+        templates.push_new_repository(self.repo, remote)
+
+        self.assertEqual(run_git(remote, 'rev-parse', 'main'), run_git(self.repo, 'rev-parse', 'main'))
+        # a repository with other history is never overwritten
+        other = os.path.join(self.root, 'other.git')
+        templates.build_template_repository(other, self.template, message='Other')
+        with self.assertRaises(subprocess.CalledProcessError):
+            templates.push_new_repository(other, remote)
+
+    def test_read_manifest(self):
+        manifest = os.path.join(self.root, 'manifest.yml')
+        self.write(self.root, {'manifest.yml': 'course: mycourse\nexercises:\n  - exercise1\n'
+                                               '  - name: exercise2\n    course: other\n    title: Second\n'})
+        self.assertEqual(templates.read_manifest(manifest),
+                         [('mycourse', 'exercise1', None), ('other', 'exercise2', 'Second')])
+
+    def test_valid_repo_name(self):
+        self.assertTrue(templates.valid_repo_name('exercise_1-a'))
+        for name in ('', '1exercise', 'two words', 'a/b'):
+            self.assertFalse(templates.valid_repo_name(name))
+
+
+class TestCreateRepository(SandboxTestCase):
+
+    def test_no_project_without_template(self):
+        missing = FileNotFoundError('Repository template not found')
+        with mock.patch.object(templates, 'template_files', side_effect=missing), \
+                mock.patch.object(git.api, 'create_project') as create_project:
+            with self.assertRaises(FileNotFoundError):
+                git.create_repository_from_template('mycourse', 'exercise1', 'Exercise 1')
+        create_project.assert_not_called()
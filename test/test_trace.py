@@ -0,0 +1,71 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+import click
+from click.testing import CliRunner
+
+from franklin_educator import backend
+from franklin_educator import trace
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(trace, '_events', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_processes_and_phases(self):
+        with trace.phase('clone'):
+            backend.run(['git', '-C', '.', '-c', 'core.pager=cat', 'version'])
+            backend.run(['git', 'version', '--build-options'])
+        backend.run(['git', 'no-such-command'], check=False)
+
+        processes = [e for e in trace.events() if e['kind'] == 'process']
+        phase, = [e for e in trace.events() if e['kind'] == 'phase']
+        self.assertEqual(len(processes), 3)
+        self.assertEqual(processes[0]['name'], 'git -C . -c core.pager=cat version')
+        self.assertGreater(processes[0]['output_size'], 0)
+        self.assertNotEqual(processes[2]['returncode'], 0)
+        self.assertEqual(phase['name'], 'clone')
+        self.assertLessEqual(phase['start'], processes[0]['start'])
+        self.assertGreaterEqual(phase['end'], processes[1]['end'])
+
+        summary = trace.summary()
+        self.assertTrue(summary.startswith('Timing: 3 processes ['))
+        self.assertIn('git version', summary)
+        self.assertIn('(2x)', summary)
+        self.assertIn('phases [clone ', summary)
+
+    def test_short_name(self):
+        self.assertEqual(trace._short_name('git -C /repo -c a=b fetch --prune origin'), 'git fetch')
+        self.assertEqual(trace._short_name('/usr/bin/docker pull image'), 'docker pull')
+
+    def test_chrome_trace(self):
+        with trace.phase('up'):
+            backend.run(['git', 'version'])
+
+        events = trace.chrome_trace()['traceEvents']
+
+        self.assertEqual([(e['name'], e['cat'], e['ph']) for e in events],
+                         [('git version', 'process', 'X'), ('up', 'phase', 'X')])
+        self.assertEqual(events[0]['args']['returncode'], 0)
+        self.assertEqual(events[1]['pid'], os.getpid())
+        self.assertGreaterEqual(events[1]['dur'], events[0]['dur'])
+
+    def test_profiled(self):
+        @click.command('cmd')
+        @trace.profiled
+        def cmd():
+            backend.run(['git', 'version'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'trace.json')
+            result = CliRunner().invoke(cmd, ['--profile', path])
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(path) as f:
+                names = [e['name'] for e in json.load(f)['traceEvents']]
+        self.assertEqual(names, ['git version', 'cmd'])
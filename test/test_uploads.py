@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+from unittest import mock
+
+from franklin_educator import uploads
+from franklin_educator.cache import write_json
+
+from .sandbox import SandboxTestCase, git
+
+
+class TestUploads(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(uploads, 'start_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.remote = self.make_remote('exercise', {'notes.txt': 'notes\n'})
+        self.path = self.clone(self.remote, 'exercise')
+        self.write(self.path, {'notes.txt': 'more notes\n'})
+        self.commit_id = self.commit(self.path, 'Local commit')
+
+    def test_upload_and_remove(self):
+        uploads.enqueue(self.path, remove_tracked_files=True)
+        self.assertEqual(len(uploads.jobs()), 1)
+
+        self.assertIsNone(uploads._process_due_jobs())
+
+        self.assertEqual(uploads.jobs(), [])
+        self.assertEqual(git(self.remote, 'rev-parse', 'main').strip(), self.commit_id)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_failed_push_is_retried_later(self):
+        git(self.path, 'remote', 'set-url', 'origin', os.path.join(self.root, 'missing.git'))
+        uploads.enqueue(self.path, remove_tracked_files=True)
+
+        next_due = uploads._process_due_jobs()
+
+        job, = uploads.jobs()
+        self.assertEqual(job['state'], 'pending')
+        self.assertEqual(job['attempts'], 1)
+        self.assertGreater(next_due, time.time())
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_job_queued_during_retry_wait(self):
+        # a job waiting for a retry long from now
+        waiting = dict(path=os.path.join(self.root, 'waiting'), remove_tracked_files=False,
+                       ignore=[], state='pending', attempts=1, last_error='error',
+                       queued=time.time(), next_attempt=time.time() + 3600)
+        write_json(uploads._job_path(waiting['path']), waiting)
+
+        with mock.patch.object(uploads, 'SCAN_INTERVAL', 0.05):
+            worker = threading.Thread(target=uploads.work, daemon=True)
+            worker.start()
+            uploads.enqueue(self.path, remove_tracked_files=False)
+            deadline = time.time() + 30
+            while len(uploads.jobs()) > 1 and time.time() < deadline:
+                time.sleep(0.05)
+            # let the worker exit
+            waiting['state'] = 'failed'
+            write_json(uploads._job_path(waiting['path']), waiting)
+            worker.join(timeout=30)
+
+        self.assertEqual(git(self.remote, 'rev-parse', 'main').strip(), self.commit_id)
+        self.assertFalse(worker.is_alive())
+
+    def test_job_queued_during_upload(self):
+        uploads.enqueue(self.path, remove_tracked_files=False)
+        upload = uploads.upload
+        def queue_again(job):
+            error = upload(job)
+            self.write(self.path, {'notes.txt': 'even more notes\n'})
+            self.commit(self.path, 'Another local commit')
+            uploads.enqueue(self.path, remove_tracked_files=True)
+            return error
+
+        with mock.patch.object(uploads, 'upload', side_effect=queue_again):
+            uploads._process_due_jobs()
+
+        job, = uploads.jobs()
+        self.assertEqual((job['state'], job['attempts'], job['remove_tracked_files']), 
+                         ('pending', 0, True))
+        self.assertEqual(git(self.remote, 'rev-parse', 'main').strip(), self.commit_id)
+
+    def test_conflict_fails_without_retry(self):
+        self.upstream_change(self.remote, {'notes.txt': 'upstream notes\n'})
+        uploads.enqueue(self.path, remove_tracked_files=True)
+
+        self.assertIsNone(uploads._process_due_jobs())
+
+        job, = uploads.jobs()
+        self.assertEqual((job['state'], job['last_error']), ('failed', 'conflict'))
+        self.assertTrue(os.path.exists(self.path))
+
+        self.assertEqual(uploads.retry_failed(), 1)
+        job, = uploads.jobs()
+        self.assertEqual((job['state'], job['attempts']), ('pending', 0))
+
+    def test_worker_lock(self):
+        self.assertTrue(uploads._acquire_lock())
+        self.assertTrue(uploads.worker_running())
+        self.assertFalse(uploads._acquire_lock())
+        uploads._release_lock()
+        self.assertFalse(uploads.worker_running())
+
+        # a lock left behind by a worker that died is taken over
+        (uploads.queue_dir() / uploads._WORKER_LOCK).write_text('999999999')
+        self.assertFalse(uploads.worker_running())
+        self.assertTrue(uploads._acquire_lock())
+        uploads._release_lock()
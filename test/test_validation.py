@@ -0,0 +1,90 @@
+import json
+from unittest import mock
+
+from click.testing import CliRunner
+
+from franklin_educator import git
+from franklin_educator import validation
+
+from .sandbox import SandboxTestCase, git as run_git
+
+
+def notebook(source, kernel='python3'):
+    return json.dumps(dict(
+        nbformat=4, nbformat_minor=5,
+        metadata=dict(kernelspec=dict(name=kernel, display_name=kernel, language='python')),
+        cells=[dict(cell_type='code', execution_count=None, metadata={}, outputs=[], source=source)]))
+
+
+class TestValidation(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.remote = self.make_remote('exercise', {'exercise.ipynb': notebook('x = 1')})
+        self.path = self.clone(self.remote, 'exercise')
+
+    def validate(self, files):
+        self.write(self.path, files)
+        run_git(self.path, 'add', '-A')
+        return {result['path']: result for result in validation.validate_staged(self.path, timeout=60)}
+
+    def test_results(self):
+        results = self.validate({'ok.ipynb': notebook('x = 1'),
+                                 'broken.ipynb': notebook('undefined_name'),
+                                 'imports.ipynb': notebook('import package_not_installed_here'),
+                                 'kernel.ipynb': notebook('x = 1', kernel='no-such-kernel')})
+
+        self.assertTrue(results['ok.ipynb']['ok'])
+        self.assertFalse(results['broken.ipynb']['ok'])
+        self.assertIn('NameError', results['broken.ipynb']['error'])
+        self.assertFalse(results['broken.ipynb']['environment'])
+        # may only fail because the notebook is not run in the exercise image
+        for path in ('imports.ipynb', 'kernel.ipynb'):
+            self.assertFalse(results[path]['ok'])
+            self.assertTrue(results[path]['environment'])
+
+        # results are cached by content, except for environment failures
+        results = validation.validate_staged(self.path, timeout=60)
+        self.assertEqual({r['path'] for r in results if r['cached']}, {'ok.ipynb', 'broken.ipynb'})
+
+    def test_cache_size(self):
+        with mock.patch.object(validation, 'CACHE_SIZE', 2):
+            self.validate({'a.ipynb': notebook('a = 1')})
+            self.validate({'b.ipynb': notebook('b = 1')})
+            self.validate({'c.ipynb': notebook('c = 1')})
+
+            with open(validation._cache_path()) as f:
+                self.assertEqual(len(json.load(f)), 2)
+            results = validation.validate_staged(self.path, timeout=60)
+            self.assertEqual({r['path'] for r in results if not r['cached']}, {'a.ipynb'})
+
+    def test_shared_pool(self):
+        with validation.validation_pool() as pool:
+            self.write(self.path, {'ok.ipynb': notebook('x = 2')})
+            run_git(self.path, 'add', '-A')
+            first, = validation.validate_staged(self.path, timeout=60, pool=pool)
+            self.write(self.path, {'ok.ipynb': notebook('x = 3')})
+            run_git(self.path, 'add', '-A')
+            # the pool is left running for the next repository
+            second, = validation.validate_staged(self.path, timeout=60, pool=pool)
+        self.assertTrue(first['ok'] and second['ok'])
+
+    def up(self):
+        return git.git_up(self.path, remove_tracked_files=False, message='update', validate='block')
+
+    def test_block(self):
+        self.write(self.path, {'exercise.ipynb': notebook('undefined_name')})
+        self.assertEqual(self.up(), 'failed')
+
+    def test_block_exit_status(self):
+        self.write(self.path, {'exercise.ipynb': notebook('undefined_name')})
+        with mock.patch.object(git, 'check_ssh_set_up', return_value=True):
+            result = CliRunner().invoke(git.up, ['-d', self.path, '--no-remove', '-m', 'update',
+                                                 '--validate', 'block'])
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIsInstance(result.exception, SystemExit)
+        self.assertEqual(run_git(self.remote, 'rev-list', '--count', 'main'), '1\n')
+
+    def test_block_ignores_environment(self):
+        self.write(self.path, {'exercise.ipynb': notebook('import package_not_installed_here')})
+        self.assertEqual(self.up(), 'pushed')
@@ -0,0 +1,93 @@
+import os
+from unittest import mock
+
+from franklin_educator import warm
+
+from .sandbox import SandboxTestCase
+
+# A docker command line stand-in. Containers are files in
+# $FAKE_DOCKER_STATE, and every call is logged to $FAKE_DOCKER_STATE/calls.
+FAKE_DOCKER = '''#!/bin/sh
+echo "$@" >> "$FAKE_DOCKER_STATE/calls"
+case "$1" in
+  image) echo "sha256:0123456789abcdef" ;;
+  run) while [ "$1" != "--name" ]; do shift; done
+       touch "$FAKE_DOCKER_STATE/$2"; echo "$2" ;;
+  inspect) [ -f "$FAKE_DOCKER_STATE/$4" ] || exit 1; echo true ;;
+  logs) [ -f "$FAKE_DOCKER_STATE/$2" ] || exit 1; echo "Jupyter Server is running at:" ;;
+  rm) rm -f "$FAKE_DOCKER_STATE/$3" ;;
+esac
+exit 0
+'''
+
+IMAGE = 'registry.example.org/grp/course/exercise:main'
+
+
+class TestWarm(SandboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.containers = os.path.join(self.root, 'containers')
+        os.makedirs(self.containers)
+        self.fake_command('docker', FAKE_DOCKER)
+        env = mock.patch.dict(os.environ, {'FAKE_DOCKER_STATE': self.containers})
+        env.start()
+        self.addCleanup(env.stop)
+        # no reaper processes
+        patcher = mock.patch.object(warm.backend, 'spawn_detached')
+        self.spawn_detached = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def runs(self):
+        with open(os.path.join(self.containers, 'calls')) as f:
+            return [line.split() for line in f if line.startswith('run ')]
+
+    def test_mounts_workspace(self):
+        workspace = warm.workspace()
+        self.assertEqual(str(workspace), os.path.join(self.root, 'data', 'franklin', 'workspace'))
+
+        state = warm.acquire(IMAGE)
+
+        run, = self.runs()
+        self.assertEqual(run[run.index('--volume') + 1], f'{workspace}:{warm.WORK_DIR}')
+        self.assertEqual(state['mount'], str(workspace))
+        self.assertIsNone(state['idle_until'])
+        self.assertIn('/lab/tree/exercise?token=', warm.url(state, os.path.join(workspace, 'exercise')))
+
+    def test_reuse(self):
+        state = warm.acquire(IMAGE)
+        warm.release(state)
+        self.spawn_detached.assert_called_once()
+        self.assertIsNotNone(warm.containers()[0]['idle_until'])
+
+        again = warm.acquire(IMAGE)
+
+        self.assertEqual(len(self.runs()), 1)
+        self.assertEqual(again['name'], state['name'])
+        self.assertEqual(again['token'], state['token'])
+
+    def test_restart_when_gone(self):
+        state = warm.acquire(IMAGE)
+        warm.release(state)
+        os.remove(os.path.join(self.containers, state['name']))
+
+        warm.acquire(IMAGE)
+
+        self.assertEqual(len(self.runs()), 2)
+
+    def test_release_without_idle_time(self):
+        state = warm.acquire(IMAGE)
+
+        warm.release(state, idle_minutes=0)
+
+        self.assertEqual(warm.containers(), [])
+        self.assertFalse(os.path.exists(os.path.join(self.containers, state['name'])))
+        self.spawn_detached.assert_not_called()
+
+    def test_reap(self):
+        state = warm.acquire(IMAGE)
+        warm.release(state, idle_minutes=0.001)
+
+        warm.reap(state['name'])
+
+        self.assertEqual(warm.containers(), [])